@@ -0,0 +1,58 @@
+"""Compare the compiled row decoder against BigQueryClient._transform_row.
+
+Usage: python benchmarks/bench_decoder.py [rows]
+"""
+from __future__ import print_function
+
+import sys
+import timeit
+
+from bigquery.client import BigQueryClient
+from bigquery.decoder import compile_row_decoder
+
+SCHEMA = [
+    {'name': 'id', 'type': 'INTEGER', 'mode': 'NULLABLE'},
+    {'name': 'name', 'type': 'STRING', 'mode': 'NULLABLE'},
+    {'name': 'score', 'type': 'FLOAT', 'mode': 'NULLABLE'},
+    {'name': 'active', 'type': 'BOOLEAN', 'mode': 'NULLABLE'},
+    {'name': 'created', 'type': 'TIMESTAMP', 'mode': 'NULLABLE'},
+    {'name': 'tags', 'type': 'RECORD', 'mode': 'REPEATED',
+     'fields': [{'name': 'key', 'type': 'STRING', 'mode': 'NULLABLE'},
+                {'name': 'weight', 'type': 'INTEGER', 'mode': 'NULLABLE'}]},
+] + [{'name': 'col%d' % i, 'type': ('INTEGER', 'FLOAT', 'STRING')[i % 3],
+      'mode': 'NULLABLE'} for i in range(20)]
+
+
+def make_row(i):
+    cells = [{'v': str(i)}, {'v': 'name-%d' % i}, {'v': '%d.5' % i},
+             {'v': 'true' if i % 2 else 'false'},
+             {'v': '1.371145650319132E9'},
+             {'v': [{'v': {'f': [{'v': 'k'}, {'v': '1'}]}}]}]
+    cells += [{'v': None if (i + j) % 7 == 0 else str(j)} for j in range(20)]
+    return {'f': cells}
+
+
+def main(num_rows):
+    rows = [make_row(i) for i in range(num_rows)]
+    client = BigQueryClient(None, 'project')
+
+    def per_cell():
+        return [client._transform_row(row, SCHEMA) for row in rows]
+
+    def compiled():
+        decode = compile_row_decoder(SCHEMA)
+        return [decode(row) for row in rows]
+
+    assert per_cell() == compiled()
+
+    before = min(timeit.repeat(per_cell, number=1, repeat=3))
+    after = min(timeit.repeat(compiled, number=1, repeat=3))
+
+    print('rows:             %d' % num_rows)
+    print('_transform_row:   %.3fs' % before)
+    print('compiled decoder: %.3fs' % after)
+    print('speedup:          %.1fx' % (before / after))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,48 @@
+"""Compare row, columnar and NumPy frame decoding of a numeric result.
+
+Usage: python benchmarks/bench_frame.py [rows]
+"""
+from __future__ import print_function
+
+import sys
+import timeit
+
+from bigquery.decoder import compile_row_decoder, decode_columns, decode_frame
+
+PAGE_SIZE = 10000
+
+SCHEMA = [{'name': 'col%d' % i,
+           'type': ('INTEGER', 'FLOAT', 'TIMESTAMP', 'BOOLEAN')[i % 4],
+           'mode': 'NULLABLE'} for i in range(16)]
+
+VALUES = {'INTEGER': '123456', 'FLOAT': '3.14159', 'BOOLEAN': 'true',
+          'TIMESTAMP': '1.371145650319132E9'}
+
+
+def make_pages(num_rows):
+    row = {'f': [{'v': VALUES[field['type']]} for field in SCHEMA]}
+    rows = [row] * num_rows
+    return [rows[i:i + PAGE_SIZE] for i in range(0, num_rows, PAGE_SIZE)]
+
+
+def main(num_rows):
+    pages = make_pages(num_rows)
+
+    def rows():
+        decode = compile_row_decoder(SCHEMA)
+        return [decode(row) for page in pages for row in page]
+
+    timings = [
+        ('compiled row decoder', rows),
+        ('decode_columns', lambda: decode_columns(SCHEMA, pages)),
+        ('decode_frame', lambda: decode_frame(SCHEMA, pages)),
+    ]
+
+    print('rows: %d' % num_rows)
+    for name, func in timings:
+        best = min(timeit.repeat(func, number=1, repeat=3))
+        print('%-22s %.3fs' % (name, best))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
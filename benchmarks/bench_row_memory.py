@@ -0,0 +1,36 @@
+"""Compare the memory taken by decoded rows of each row type.
+
+Usage: python benchmarks/bench_row_memory.py [rows]
+"""
+from __future__ import print_function
+
+import sys
+import tracemalloc
+
+from bigquery.decoder import (ROW_TYPE_DICT, ROW_TYPE_RECORD, ROW_TYPE_TUPLE,
+                              compile_row_decoder)
+
+SCHEMA = [{'name': 'column_%d' % i,
+           'type': ('INTEGER', 'FLOAT', 'STRING', 'BOOLEAN')[i % 4],
+           'mode': 'NULLABLE'} for i in range(20)]
+
+VALUES = {'INTEGER': '123456789', 'FLOAT': '3.14159', 'BOOLEAN': 'true',
+          'STRING': 'value'}
+
+
+def main(num_rows):
+    row = {'f': [{'v': VALUES[field['type']]} for field in SCHEMA]}
+
+    print('rows: %d' % num_rows)
+    for row_type in (ROW_TYPE_DICT, ROW_TYPE_TUPLE, ROW_TYPE_RECORD):
+        decode = compile_row_decoder(SCHEMA, row_type)
+        tracemalloc.start()
+        rows = [decode(row) for _ in range(num_rows)]
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print('%-8s %8.1f MB' % (row_type, current / 1024.0 / 1024.0))
+        del rows
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
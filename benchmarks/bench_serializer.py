@@ -0,0 +1,85 @@
+"""Compare streaming ingestion through StreamingInserter and push_rows with
+request bodies encoded by the standard library, by the fastest installed
+serializer, and with rows pre-serialized as they are queued.
+
+Usage: python benchmarks/bench_serializer.py [rows]
+"""
+from __future__ import print_function
+
+import sys
+import timeit
+
+from bigquery.client import BigQueryClient
+from bigquery.serializer import Serializer, SerializerModel
+from bigquery.streaming import StreamingInserter
+
+ROW = {'id': 123456789, 'name': 'BigQuery-Python', 'score': 3.14159,
+       'active': True, 'tags': ['a', 'b', 'c'], 'ts': '2016-04-28 12:00:00'}
+
+
+class _Request(object):
+
+    def __init__(self, model, body):
+        self.model = model
+        self.body = body
+
+    def execute(self):
+        # Encode the body as googleapiclient would before sending it.
+        self.model.request({}, {}, {}, self.body)
+        return {}
+
+
+class _TableData(object):
+
+    def __init__(self, model):
+        self.model = model
+
+    def insertAll(self, projectId, datasetId, tableId, body):
+        return _Request(self.model, body)
+
+
+class _Service(object):
+
+    def __init__(self, model):
+        self.table_data = _TableData(model)
+
+    def tabledata(self):
+        return self.table_data
+
+
+def make_rows(num_rows):
+    return [dict(ROW, id=index) for index in range(num_rows)]
+
+
+def ingest(rows, serializer, preserialize):
+    # Inserters pre-serialize rows with the serializer of their client,
+    # which only has one if it is given the model of its service.
+    model = SerializerModel(serializer)
+    client = BigQueryClient(_Service(model), 'project',
+                            model=model if preserialize else None)
+    with StreamingInserter(client, 'dataset', 'table',
+                           insert_id_key='id') as inserter:
+        inserter.insert_rows(rows)
+
+
+def main(num_rows):
+    rows = make_rows(num_rows)
+    stdlib = Serializer('json')
+    fastest = Serializer()
+
+    timings = [
+        ('json', lambda: ingest(rows, stdlib, False)),
+        ('json, pre-serialized', lambda: ingest(rows, stdlib, True)),
+        (fastest.library, lambda: ingest(rows, fastest, False)),
+        ('%s, pre-serialized' % fastest.library,
+         lambda: ingest(rows, fastest, True)),
+    ]
+
+    print('rows: %d' % num_rows)
+    for name, func in timings:
+        best = min(timeit.repeat(func, number=1, repeat=3))
+        print('%-26s %.3fs' % (name, best))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
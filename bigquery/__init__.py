@@ -2,7 +2,7 @@ from __future__ import absolute_import
 
 from .version import __version__
 
-from .client import get_client
+from .client import get_client, make_insert_ids
 from .client import (
     BIGQUERY_SCOPE,
     BIGQUERY_SCOPE_READ_ONLY,
@@ -15,7 +15,30 @@ from .client import (
     JOB_WRITE_APPEND,
     JOB_WRITE_EMPTY,
     JOB_ENCODING_UTF_8,
-    JOB_ENCODING_ISO_8859_1
+    JOB_ENCODING_ISO_8859_1,
+    JOB_PRIORITY_INTERACTIVE,
+    JOB_PRIORITY_BATCH,
+    ROW_TYPE_DICT,
+    ROW_TYPE_TUPLE,
+    ROW_TYPE_RECORD,
+    ROW_TYPE_LAZY,
+    WAIT_ALL_COMPLETED,
+    WAIT_FIRST_COMPLETED,
+    WAIT_FIRST_EXCEPTION
 )
 
+from .batch import MetadataBatch
+from .cache import QueryCache, SingleFlight
+from .jobs import BigQueryJobFuture
+from .scheduler import JobScheduler
 from .schema_builder import schema_from_record
+from .serializer import JsonFragment, Serializer
+from .spool import InsertSpool
+from .streaming import (
+    BackgroundInserter,
+    RoutingInserter,
+    StreamingInserter,
+    QUEUE_BLOCK,
+    QUEUE_DROP_OLDEST,
+    QUEUE_RAISE
+)
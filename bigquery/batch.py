@@ -0,0 +1,212 @@
+from __future__ import absolute_import
+
+from concurrent.futures import Future
+from logging import getLogger
+
+from googleapiclient.errors import HttpError
+
+__all__ = ['MetadataBatch']
+
+logger = getLogger(__name__)
+
+
+class MetadataBatch(object):
+    """Collect table and dataset metadata calls and send them together as
+    HTTP batch requests.
+
+    Every call returns a ``concurrent.futures.Future`` right away. The calls
+    are sent by `execute`, or when the batch is used as a context manager
+    and the ``with`` block ends, using as few batch requests as the API's
+    limit of requests per batch allows. Results follow the semantics of the
+    ``BigQueryClient`` methods of the same name, missing tables and datasets
+    giving None, False or an empty dict rather than an exception.
+
+    Parameters
+    ----------
+    client : BigQueryClient
+        The client to send the requests with
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._calls = []
+
+    def __len__(self):
+        return len(self._calls)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+        else:
+            for _, _, future in self._calls:
+                future.cancel()
+            self._calls = []
+
+    def check_dataset(self, dataset_id):
+        """Check to see if a dataset exists, see
+        ``BigQueryClient.check_dataset``.
+
+        Returns
+        -------
+        Future
+            A future for a bool
+        """
+
+        return self._add(self._datasets_get(dataset_id),
+                         lambda response: bool(response))
+
+    def get_dataset(self, dataset_id):
+        """Retrieve a dataset, see ``BigQueryClient.get_dataset``.
+
+        Returns
+        -------
+        Future
+            A future for the dataset object, or an empty dict
+        """
+
+        return self._add(self._datasets_get(dataset_id),
+                         lambda response: response)
+
+    def check_table(self, dataset, table):
+        """Check to see if a table exists, see
+        ``BigQueryClient.check_table``.
+
+        Returns
+        -------
+        Future
+            A future for a bool
+        """
+
+        return self._add(self._tables_get(dataset, table),
+                         lambda response: bool(response))
+
+    def get_table(self, dataset, table):
+        """Retrieve a table, see ``BigQueryClient.get_table``.
+
+        Returns
+        -------
+        Future
+            A future for the table object, or an empty dict
+        """
+
+        return self._add(self._tables_get(dataset, table),
+                         lambda response: response)
+
+    def get_table_schema(self, dataset, table):
+        """Return the table schema, see
+        ``BigQueryClient.get_table_schema``.
+
+        Returns
+        -------
+        Future
+            A future for the schema fields, or None if the table does not
+            exist. It raises other ``HttpError`` exceptions.
+        """
+
+        def schema(response, exception):
+            if exception is None:
+                return response['schema']['fields']
+            if int(exception.resp['status']) == 404:
+                logger.warning('Table %s.%s does not exist', dataset, table)
+                return None
+            raise exception
+
+        return self._add(self._tables_get(dataset, table), schema, raw=True)
+
+    def delete_table(self, dataset, table):
+        """Delete a table from the dataset, see
+        ``BigQueryClient.delete_table``.
+
+        Returns
+        -------
+        Future
+            A future for a bool indicating if the table was deleted, or the
+            response if the client's ``swallow_results`` is False
+        """
+
+        swallow_results = self.client.swallow_results
+
+        def deleted(response, exception):
+            if exception is None:
+                return True if swallow_results else response
+
+            logger.error(('Cannot delete table {0}.{1}\n'
+                          'Http Error: {2}').format(dataset, table,
+                                                    exception.content))
+            return False if swallow_results else {}
+
+        request = self.client.bigquery.tables().delete(
+            projectId=self.client.project_id, datasetId=dataset,
+            tableId=table)
+        return self._add(request, deleted, raw=True)
+
+    def execute(self):
+        """Send the calls collected so far and resolve their futures.
+
+        Raises
+        ------
+        Exception
+            Errors sending a batch request, which are also set on the
+            futures of its calls
+        """
+
+        calls = [call for call in self._calls
+                 if call[2].set_running_or_notify_cancel()]
+        self._calls = []
+        if not calls:
+            return
+
+        try:
+            results = self.client._execute_batch(
+                [request for request, _, _ in calls])
+        except Exception as e:
+            for _, _, future in calls:
+                future.set_exception(e)
+            raise
+
+        for (_, handler, future), (response, exception) in zip(calls,
+                                                               results):
+            try:
+                future.set_result(handler(response, exception))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _add(self, request, handler, raw=False):
+        """Queue a request. `handler` gets the response and the exception of
+        the request if `raw` is set, otherwise the response or an empty dict
+        if the request failed with an ``HttpError``.
+        """
+
+        if not raw:
+            handler = _swallow_http_errors(handler)
+
+        future = Future()
+        self._calls.append((request, handler, future))
+        return future
+
+    def _datasets_get(self, dataset_id):
+        return self.client.bigquery.datasets().get(
+            projectId=self.client.project_id, datasetId=dataset_id)
+
+    def _tables_get(self, dataset, table):
+        return self.client.bigquery.tables().get(
+            projectId=self.client.project_id, datasetId=dataset,
+            tableId=table)
+
+
+def _swallow_http_errors(handler):
+    """Wrap a response handler so that failed requests give an empty dict,
+    like ``BigQueryClient.get_table`` and ``get_dataset``.
+    """
+
+    def handle(response, exception):
+        if isinstance(exception, HttpError):
+            response = {}
+        elif exception is not None:
+            raise exception
+        return handler(response)
+
+    return handle
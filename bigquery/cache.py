@@ -0,0 +1,252 @@
+from __future__ import absolute_import
+
+import json
+import re
+import sys
+import threading
+from collections import OrderedDict
+from time import time
+
+import six
+
+__all__ = ['QueryCache', 'SingleFlight', 'normalize_query']
+
+# Quoted string literals and identifiers, and line comments along with the
+# newline ending them, whose contents must not be touched when normalizing
+# whitespace.
+_VERBATIM = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`|"""
+                       r"""(?:--|#)[^\n]*\n?)""", re.DOTALL)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_query(query):
+    """Collapse insignificant whitespace in a query so that formatting
+    differences do not produce different cache keys. Quoted strings and
+    identifiers are left as they are, and so are ``--`` and ``#`` comments,
+    whose ending newline is significant.
+
+    Parameters
+    ----------
+    query : str
+        BigQuery query string
+
+    Returns
+    -------
+    str
+        The normalized query
+    """
+
+    parts = _VERBATIM.split(query)
+    for index in range(0, len(parts), 2):
+        parts[index] = _WHITESPACE.sub(' ', parts[index])
+    return ''.join(parts).strip()
+
+
+class QueryCache(object):
+    """Local cache of decoded query results.
+
+    Entries expire `ttl` seconds after they were stored, and the least
+    recently used entries are evicted once the approximate size of all
+    cached rows exceeds `max_bytes`. The cache is safe to share between
+    threads.
+
+    Every caller gets a new list, but the rows themselves are shared with
+    the cache and with other callers, so they must not be modified. The
+    ``ROW_TYPE_TUPLE``, ``ROW_TYPE_RECORD`` and ``ROW_TYPE_LAZY`` row types
+    give read-only rows.
+
+    Parameters
+    ----------
+    ttl : float, optional
+        Seconds after which a cached result expires (default 300).
+    max_bytes : int, optional
+        Approximate upper bound on the size of the cached results, in bytes
+        (default 64MB).
+
+    Attributes
+    ----------
+    hits : int
+        Number of lookups answered from the cache.
+    misses : int
+        Number of lookups that were not cached or had expired.
+    size : int
+        Approximate size of the cached results, in bytes.
+    """
+
+    def __init__(self, ttl=300, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query_data, row_type=None):
+        """Return the cache key of a query job request. The key covers every
+        property of the request, with the query normalized, except for
+        ``timeoutMs`` and properties set to None.
+
+        Parameters
+        ----------
+        query_data : dict
+            query object as passed to ``BigQueryClient._submit_query_job``
+        row_type : str, optional
+            The row type the results are decoded into.
+
+        Returns
+        -------
+        tuple
+            A hashable key
+        """
+
+        request = dict((name, value) for name, value in query_data.items()
+                       if name != 'timeoutMs' and value is not None)
+        request['query'] = normalize_query(query_data['query'])
+        return (json.dumps(request, sort_keys=True, default=str), row_type)
+
+    @staticmethod
+    def estimate_size(rows, sample=16):
+        """Return the approximate size, in bytes, of raw API rows,
+        extrapolated from the encoded size of at most `sample` rows spread
+        over the list.
+        """
+
+        if not rows:
+            return 0
+
+        sampled = rows[::max(len(rows) // sample, 1)][:sample]
+        return len(json.dumps(sampled)) * len(rows) // len(sampled)
+
+    def get(self, key):
+        """Return the cached value for `key`, or None if there is no
+        unexpired entry.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time():
+                self._remove(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            del self._entries[key]
+            self._entries[key] = entry
+            return entry[2]
+
+    def set(self, key, value, size):
+        """Store `value` under `key`.
+
+        Parameters
+        ----------
+        key : tuple
+            The cache key, see `make_key`
+        value : object
+            The value to cache
+        size : int
+            Approximate size of `value` in bytes. Values larger than
+            `max_bytes` are not cached.
+        """
+
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time() + self.ttl, size, value)
+            self.size += size
+
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+
+        with self._lock:
+            self._entries.clear()
+            self.size = self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+
+
+class SingleFlight(object):
+    """Coalesce concurrent calls that share a key.
+
+    The first caller for a key runs the function. Callers arriving with the
+    same key while it is still running wait for it and receive its result,
+    or its exception, instead of running the function again.
+
+    Attributes
+    ----------
+    shared : int
+        Number of calls answered by a call that was already in flight.
+    """
+
+    def __init__(self):
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        """Call ``func(*args, **kwargs)`` unless a call for `key` is already
+        in flight, in which case wait for that call and return its result.
+
+        Parameters
+        ----------
+        key : object
+            Hashable key identifying equivalent calls
+        func : function
+            The function to call
+
+        Returns
+        -------
+        object
+            The return value of `func`
+        """
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                six.reraise(*call.error)
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except Exception:
+            call.error = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+
+class _Call(object):
+    """The outcome of an in-flight `SingleFlight` call."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
@@ -1,18 +1,29 @@
 import calendar
+import copy
 import json
+import threading
+import uuid
 from logging import getLogger
 from collections import defaultdict
 from datetime import datetime, timedelta
 from hashlib import sha256
 from io import StringIO
+from random import uniform
 from time import sleep, time
 
 import six
+from bigquery.batch import MetadataBatch
+from bigquery.cache import QueryCache, SingleFlight
+from bigquery.concurrency import map_concurrently, prefetch_iterator
+from bigquery.decoder import (ROW_TYPE_DICT, ROW_TYPE_LAZY, ROW_TYPE_RECORD,
+                              ROW_TYPE_TUPLE, compile_row_decoder,
+                              decode_columns, decode_frame)
 from bigquery.errors import (BigQueryTimeoutException, JobExecutingException,
                              JobInsertException, UnfinishedQueryException)
+from bigquery.serializer import JsonFragment, Serializer, SerializerModel
 from googleapiclient.discovery import build, DISCOVERY_URI
 from googleapiclient.errors import HttpError
-from httplib2 import Http
+from httplib2 import Http, HttpLib2Error
 
 BIGQUERY_SCOPE = [
     'https://www.googleapis.com/auth/bigquery'
@@ -46,6 +57,34 @@ JOB_DESTINATION_FORMAT_NEWLINE_DELIMITED_JSON = \
     JOB_FORMAT_NEWLINE_DELIMITED_JSON
 JOB_DESTINATION_FORMAT_CSV = JOB_FORMAT_CSV
 
+# Limits of a single tabledata().insertAll request. push_rows splits larger
+# inserts into several requests. The byte budget is kept below the 10MB HTTP
+# request limit to leave room for the request envelope.
+INSERT_MAX_ROWS = 10000
+INSERT_MAX_BYTES = 9 * 1024 * 1024
+
+# Polling of wait_for_job: the first interval, the factor by which it grows
+# after every poll and the relative jitter applied to it.
+WAIT_INITIAL_INTERVAL = 0.5
+WAIT_BACKOFF_FACTOR = 2
+WAIT_JITTER = 0.2
+
+# return_when values of wait_for_jobs.
+WAIT_ALL_COMPLETED = 'ALL_COMPLETED'
+WAIT_FIRST_COMPLETED = 'FIRST_COMPLETED'
+WAIT_FIRST_EXCEPTION = 'FIRST_EXCEPTION'
+
+# Maximum number of requests in an HTTP batch request.
+BATCH_MAX_REQUESTS = 1000
+
+# Insert error reasons, and HTTP statuses of failed insertAll requests, after
+# which push_rows may retry a row. Rows reported as "stopped" were valid but
+# not inserted because another row of their request was invalid.
+INSERT_RETRY_REASONS = frozenset(
+    ['backendError', 'internalError', 'rateLimitExceeded', 'stopped',
+     'timeout'])
+INSERT_RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
 logger = getLogger(__name__)
 
 
@@ -53,7 +92,9 @@ def get_client(project_id=None, credentials=None,
                service_url=None, service_account=None,
                private_key=None, private_key_file=None,
                json_key=None, json_key_file=None,
-               readonly=True, swallow_results=True):
+               readonly=True, swallow_results=True, query_cache=None,
+               single_flight=False, spool=None, serializer=None,
+               gzip_threshold=None):
     """Return a singleton instance of BigQueryClient. Either
     AssertionCredentials or a service account and private key combination need
     to be provided in order to authenticate requests to BigQuery.
@@ -92,6 +133,25 @@ def get_client(project_id=None, credentials=None,
     swallow_results : bool
         If set to False, then return the actual response value instead of
         converting to boolean. Default True.
+    query_cache : bigquery.cache.QueryCache, optional
+        Cache for the results of `BigQueryClient.query`. Results are not
+        cached by default. Cached rows are shared between callers and must
+        not be modified.
+    single_flight : bool, optional
+        If True, identical queries submitted concurrently by several threads
+        run as a single job and share its results, rows included. Default
+        False.
+    spool : bigquery.spool.InsertSpool, optional
+        Spool for rows that `BigQueryClient.push_rows` could not insert
+        because of a transient error. Such rows are not kept by default.
+    serializer : bigquery.serializer.Serializer, optional
+        Encoder for request and response bodies, e.g. ``Serializer()`` to use
+        orjson or ujson when installed. googleapiclient's default JSON model
+        is used by default.
+    gzip_threshold : int, optional
+        Request bodies of at least this many bytes, such as large insertAll
+        requests, are sent gzip-compressed. Bodies are not compressed by
+        default. See `BigQueryClient.metrics` for the bytes saved.
 
     Returns
     -------
@@ -142,20 +202,69 @@ def get_client(project_id=None, credentials=None,
         if not project_id:
             project_id = json_key['project_id']
 
+    model = None
+    if serializer is not None or gzip_threshold is not None:
+        # One model is shared by the services of all worker clients, so that
+        # its counters cover every request.
+        model = SerializerModel(serializer or Serializer('json'),
+                                gzip_threshold=gzip_threshold)
+
     bq_service = _get_bq_service(credentials=credentials,
-                                 service_url=service_url)
+                                 service_url=service_url,
+                                 model=model)
+
+    def service_factory():
+        return _get_bq_service(credentials=credentials,
+                               service_url=service_url,
+                               model=model)
+
+    return BigQueryClient(bq_service, project_id, swallow_results,
+                          service_factory=service_factory,
+                          query_cache=query_cache,
+                          single_flight=single_flight,
+                          spool=spool,
+                          model=model)
+
+
+def make_insert_ids(rows, fields=None):
+    """Return a deterministic insertId for every row, derived from a hash of
+    its content. Sending a row again with the same insertId lets BigQuery
+    de-duplicate it, so rows that are identical (in `fields`) are treated as
+    duplicates.
+
+    Parameters
+    ----------
+    rows : list
+        A ``list`` of rows (``dict`` objects)
+    fields : list, optional
+        Names of the fields to hash. All fields are hashed by default.
+
+    Returns
+    -------
+    list
+        A hex digest for every row
+    """
 
-    return BigQueryClient(bq_service, project_id, swallow_results)
+    encode = json.JSONEncoder(sort_keys=True, separators=(',', ':'),
+                              default=str).encode
 
+    if fields:
+        rows = [[row.get(field) for field in fields] for row in rows]
 
-def _get_bq_service(credentials=None, service_url=None):
+    return [sha256(encode(row).encode('utf-8')).hexdigest() for row in rows]
+
+
+def _get_bq_service(credentials=None, service_url=None, model=None):
     """Construct an authorized BigQuery service object."""
 
     assert credentials, 'Must provide ServiceAccountCredentials'
 
     http = credentials.authorize(Http())
+    kwargs = {}
+    if model is not None:
+        kwargs['model'] = model
     service = build('bigquery', 'v2', http=http,
-                    discoveryServiceUrl=service_url)
+                    discoveryServiceUrl=service_url, **kwargs)
 
     return service
 
@@ -167,15 +276,119 @@ def _credentials():
     return ServiceAccountCredentials
 
 
+def _http_error_reason(exception):
+    """Return the reason of the first error of an ``HttpError``, if known."""
+
+    try:
+        error = json.loads(exception.content.decode('utf-8'))['error']
+        return error['errors'][0]['reason']
+    except (AttributeError, KeyError, IndexError, TypeError, ValueError):
+        return None
+
+
+def _is_transient_http_error(exception):
+    """Return True if a request that raised `exception` may succeed when it
+    is sent again, as after a server error or a rate limit.
+    """
+
+    if not isinstance(exception, HttpError):
+        return False
+
+    try:
+        status = int(exception.resp.status)
+    except (AttributeError, TypeError, ValueError):
+        status = None
+
+    return status in INSERT_RETRY_STATUSES or \
+        _http_error_reason(exception) in INSERT_RETRY_REASONS
+
+
 class BigQueryClient(object):
 
-    def __init__(self, bq_service, project_id, swallow_results=True):
+    def __init__(self, bq_service, project_id, swallow_results=True,
+                 service_factory=None, query_cache=None, single_flight=False,
+                 spool=None, model=None):
         self.bigquery = bq_service
         self.project_id = project_id
         self.swallow_results = swallow_results
+        self.service_factory = service_factory
+        self.query_cache = query_cache
+        self.single_flight = SingleFlight() if single_flight else None
+        self.spool = spool
+        self.model = model
+        # Rows can only be pre-serialized for services that splice them into
+        # request bodies, that is services built with a SerializerModel.
+        self.serializer = model.serializer \
+            if isinstance(model, SerializerModel) else None
         self.cache = {}
+        self._worker_clients = []
+        self._worker_clients_lock = threading.Lock()
+        self._job_poller = None
+        self._job_poller_lock = threading.Lock()
+
+    def metrics(self):
+        """Return counters of the request bodies sent by this client and its
+        worker clients.
+
+        Returns
+        -------
+        dict
+            ``requests`` and ``compressed_requests`` count the requests with
+            a body, ``body_bytes`` is the size of the encoded bodies,
+            ``sent_bytes`` their size on the wire and ``saved_bytes`` the
+            bytes saved by compression. All are zero unless the client was
+            created with a ``serializer`` or ``gzip_threshold``.
+        """
+
+        if self.model is None:
+            return {'requests': 0, 'compressed_requests': 0, 'body_bytes': 0,
+                    'sent_bytes': 0, 'saved_bytes': 0}
+
+        return self.model.metrics()
+
+    def _acquire_worker_clients(self, count):
+        """Return `count` clients that can each be used from their own
+        thread. The underlying httplib2 connections are not thread-safe, so
+        every worker client gets a separate service object from
+        `service_factory`. Without a factory a single worker, this client
+        itself, is returned whatever `count` is, so that callers do their
+        work sequentially.
+
+        Parameters
+        ----------
+        count : int
+            The number of worker clients needed
+
+        Returns
+        -------
+        list
+            ``BigQueryClient`` objects sharing this client's configuration
+        """
+
+        if self.service_factory is None:
+            return [self]
+
+        with self._worker_clients_lock:
+            workers = self._worker_clients[:count]
+            del self._worker_clients[:count]
+
+        while len(workers) < count:
+            worker = copy.copy(self)
+            worker.bigquery = self.service_factory()
+            workers.append(worker)
+
+        return workers
+
+    def _release_worker_clients(self, workers):
+        """Return worker clients to the pool for reuse by later calls."""
 
-    def _submit_query_job(self, query_data):
+        if self.service_factory is None:
+            return
+
+        with self._worker_clients_lock:
+            self._worker_clients.extend(workers)
+
+    def _submit_query_job(self, query_data, row_type=ROW_TYPE_DICT):
         """ Submit a query job to BigQuery.
 
             This is similar to BigQueryClient.query, but gives the user
@@ -190,6 +403,12 @@ class BigQueryClient(object):
         query_data
             query object as per "configuration.query" in
             https://cloud.google.com/bigquery/docs/reference/v2/jobs#configuration.query
+        row_type : str, optional
+            One of the ROW_TYPE_* constants. Rows are ``dict`` objects by
+            default; ``ROW_TYPE_TUPLE`` and ``ROW_TYPE_RECORD`` return more
+            compact tuples in schema order and ``ROW_TYPE_LAZY`` read-only
+            mappings that decode cells on first access (see
+            `bigquery.decoder.compile_row_decoder`).
 
         Returns
         -------
@@ -202,6 +421,61 @@ class BigQueryClient(object):
         ------
         BigQueryTimeoutException
             On timeout
+
+        Notes
+        -----
+        If the client has a `query_cache`, completed results are stored in
+        it and identical queries are answered from it until they expire,
+        unless ``useQueryCache`` is False. With `single_flight` set,
+        identical queries submitted concurrently from several threads run as
+        a single job whose results are shared. Dry runs are never cached or
+        shared. Every call returns a new list, but rows from the cache or
+        from a shared job are the same objects for every caller and must not
+        be modified.
+        """
+
+        use_cache = self.query_cache is not None and \
+            query_data.get('useQueryCache') is not False
+        if query_data.get('dryRun') or (not use_cache and
+                                        self.single_flight is None):
+            return self._run_query_job(query_data, row_type)
+
+        key = QueryCache.make_key(query_data, row_type)
+        cache_key = key if use_cache else None
+
+        if use_cache:
+            cached = self.query_cache.get(key)
+            if cached is not None:
+                logger.debug('Query results found in cache: %s' % query_data)
+                job_id, records = cached
+                return job_id, list(records)
+
+        if self.single_flight is None:
+            return self._run_query_job(query_data, row_type, cache_key)
+
+        job_id, records = self.single_flight.do(
+            key, self._run_query_job, query_data, row_type, cache_key)
+        return job_id, list(records)
+
+    def _run_query_job(self, query_data, row_type=ROW_TYPE_DICT,
+                       cache_key=None):
+        """Submit a query job to BigQuery and decode the rows of the reply.
+        See `_submit_query_job`.
+
+        Parameters
+        ----------
+        query_data
+            query object as per "configuration.query" in
+            https://cloud.google.com/bigquery/docs/reference/v2/jobs#configuration.query
+        row_type : str, optional
+            One of the ROW_TYPE_* constants.
+        cache_key : tuple, optional
+            Key to store the results under in `query_cache`, if any.
+
+        Returns
+        -------
+        tuple
+            job id and query results
         """
 
         logger.debug('Submitting query job: %s' % query_data)
@@ -227,7 +501,17 @@ class BigQueryClient(object):
             logger.error('BigQuery job %s timeout' % job_id)
             raise BigQueryTimeoutException()
 
-        return job_id, [self._transform_row(row, schema) for row in rows]
+        records = []
+        if rows:
+            decode = compile_row_decoder(schema, row_type)
+            records = [decode(row) for row in rows]
+
+        if self.query_cache is not None and cache_key is not None \
+                and job_complete:
+            self.query_cache.set(cache_key, (job_id, list(records)),
+                                 self.query_cache.estimate_size(rows))
+
+        return job_id, records
 
     def _insert_job(self, body_object):
         """ Submit a job to BigQuery
@@ -262,7 +546,8 @@ class BigQueryClient(object):
             body=body_object
         ).execute()
 
-    def query(self, query, max_results=None, timeout=0, dry_run=False, use_legacy_sql=None):
+    def query(self, query, max_results=None, timeout=0, dry_run=False,
+              use_legacy_sql=None, row_type=ROW_TYPE_DICT):
         """Submit a query to BigQuery.
 
         Parameters
@@ -280,7 +565,12 @@ class BigQueryClient(object):
             message it would if it wasn't a dry run.
         use_legacy_sql : bool, optional. Default True.
             If False, the query will use BigQuery's standard SQL (https://cloud.google.com/bigquery/sql-reference/)
-
+        row_type : str, optional
+            One of the ROW_TYPE_* constants. Rows are ``dict`` objects by
+            default; ``ROW_TYPE_TUPLE`` and ``ROW_TYPE_RECORD`` return more
+            compact tuples in schema order and ``ROW_TYPE_LAZY`` read-only
+            mappings that decode cells on first access (see
+            `bigquery.decoder.compile_row_decoder`).
 
         Returns
         -------
@@ -307,7 +597,7 @@ class BigQueryClient(object):
         if use_legacy_sql is not None:
             query_data['useLegacySql'] = use_legacy_sql
 
-        return self._submit_query_job(query_data)
+        return self._submit_query_job(query_data, row_type=row_type)
 
     def get_query_schema(self, job_id):
         """Retrieve the schema of a query by job id.
@@ -382,11 +672,187 @@ class BigQueryClient(object):
         return (query_reply.get('jobComplete', False),
                 int(query_reply.get('totalRows', 0)))
 
-    def get_query_rows(self, job_id, offset=None, limit=None, timeout=0):
+    def get_query_rows(self, job_id, offset=None, limit=None, timeout=0,
+                       prefetch=0, row_type=ROW_TYPE_DICT):
         """Retrieve a list of rows from a query table by job id.
         This method will append results from multiple pages together. If you
         want to manually page through results, you can use `get_query_results`
-        method directly.
+        method directly. To process rows without holding the whole result in
+        memory, use `iter_query_rows`.
+
+        Parameters
+        ----------
+        job_id : str
+            The job id that references a BigQuery query.
+        offset : int, optional
+            The offset of the rows to pull from BigQuery
+        limit : int, optional
+            The number of rows to retrieve from a query table.
+        timeout : float, optional
+            Timeout in seconds.
+        prefetch : int, optional
+            Number of pages to request ahead in a background thread while the
+            current page is being decoded. Default 0 fetches pages
+            sequentially. The thread uses a worker client of its own, so
+            pages are only prefetched by clients with a ``service_factory``.
+        row_type : str, optional
+            One of the ROW_TYPE_* constants. Rows are ``dict`` objects by
+            default; ``ROW_TYPE_TUPLE`` and ``ROW_TYPE_RECORD`` return more
+            compact tuples in schema order and ``ROW_TYPE_LAZY`` read-only
+            mappings that decode cells on first access (see
+            `bigquery.decoder.compile_row_decoder`).
+
+        Returns
+        -------
+        list
+            A ``list`` of ``dict`` objects that represent table rows.
+        """
+
+        return list(self.iter_query_rows(job_id, offset=offset, limit=limit,
+                                         timeout=timeout, prefetch=prefetch,
+                                         row_type=row_type))
+
+    def iter_query_rows(self, job_id, offset=None, limit=None, timeout=0,
+                        prefetch=0, row_type=ROW_TYPE_DICT):
+        """Iterate over the rows of a query table by job id. Pages are
+        requested and decoded one at a time as the iterator is consumed, so
+        only a single page of results is held in memory.
+
+        The first page is requested before this method returns, which means
+        an unfinished query raises immediately rather than on first
+        iteration.
+
+        Parameters
+        ----------
+        job_id : str
+            The job id that references a BigQuery query.
+        offset : int, optional
+            The offset of the rows to pull from BigQuery
+        limit : int, optional
+            The number of rows to retrieve from a query table.
+        timeout : float, optional
+            Timeout in seconds.
+        prefetch : int, optional
+            Number of pages to request ahead in a background thread while the
+            current page is being decoded. Default 0 fetches pages
+            sequentially. The thread uses a worker client of its own, so
+            pages are only prefetched by clients with a ``service_factory``.
+        row_type : str, optional
+            One of the ROW_TYPE_* constants. Rows are ``dict`` objects by
+            default; ``ROW_TYPE_TUPLE`` and ``ROW_TYPE_RECORD`` return more
+            compact tuples in schema order and ``ROW_TYPE_LAZY`` read-only
+            mappings that decode cells on first access (see
+            `bigquery.decoder.compile_row_decoder`).
+
+        Returns
+        -------
+        iterator
+            An iterator of ``dict`` objects that represent table rows.
+
+        Raises
+        ------
+        UnfinishedQueryException
+            If the query job has not completed yet
+        """
+
+        schema, pages = self._get_query_pages(job_id, offset=offset,
+                                              limit=limit, timeout=timeout,
+                                              prefetch=prefetch)
+        decode = compile_row_decoder(schema, row_type)
+
+        return (decode(row) for rows in pages for row in rows)
+
+    def get_query_columns(self, job_id, offset=None, limit=None, timeout=0,
+                          prefetch=0):
+        """Retrieve the results of a query by job id as one sequence of values
+        per column rather than one ``dict`` per row.
+
+        INTEGER, FLOAT, TIMESTAMP and BOOLEAN columns without nulls are
+        returned as typed ``array.array`` objects, everything else as
+        ``list`` objects.
+
+        Parameters
+        ----------
+        job_id : str
+            The job id that references a BigQuery query.
+        offset : int, optional
+            The offset of the rows to pull from BigQuery
+        limit : int, optional
+            The number of rows to retrieve from a query table.
+        timeout : float, optional
+            Timeout in seconds.
+        prefetch : int, optional
+            Number of pages to request ahead in a background thread while the
+            current page is being decoded. Default 0 fetches pages
+            sequentially. The thread uses a worker client of its own, so
+            pages are only prefetched by clients with a ``service_factory``.
+
+        Returns
+        -------
+        OrderedDict
+            Column names, in schema order, mapped to their values.
+
+        Raises
+        ------
+        UnfinishedQueryException
+            If the query job has not completed yet
+        """
+
+        schema, pages = self._get_query_pages(job_id, offset=offset,
+                                              limit=limit, timeout=timeout,
+                                              prefetch=prefetch)
+        return decode_columns(schema, pages)
+
+    def get_query_frame(self, job_id, offset=None, limit=None, timeout=0,
+                        prefetch=0):
+        """Retrieve the results of a query by job id as a
+        `bigquery.decoder.ResultFrame` of NumPy arrays, one per column.
+        Each page is converted column by column with vectorized casts, which
+        is much faster than row by row decoding for numeric results.
+        Requires NumPy.
+
+        Parameters
+        ----------
+        job_id : str
+            The job id that references a BigQuery query.
+        offset : int, optional
+            The offset of the rows to pull from BigQuery
+        limit : int, optional
+            The number of rows to retrieve from a query table.
+        timeout : float, optional
+            Timeout in seconds.
+        prefetch : int, optional
+            Number of pages to request ahead in a background thread while the
+            current page is being decoded. Default 0 fetches pages
+            sequentially. The thread uses a worker client of its own, so
+            pages are only prefetched by clients with a ``service_factory``.
+
+        Returns
+        -------
+        ResultFrame
+            The query results
+
+        Raises
+        ------
+        UnfinishedQueryException
+            If the query job has not completed yet
+        ImportError
+            If NumPy is not installed
+        """
+
+        schema, pages = self._get_query_pages(job_id, offset=offset,
+                                              limit=limit, timeout=timeout,
+                                              prefetch=prefetch)
+        return decode_frame(schema, pages)
+
+    def get_query_rows_parallel(self, job_id, offset=None, limit=None,
+                                timeout=0, workers=4, row_type=ROW_TYPE_DICT):
+        """Retrieve a list of rows from a query table by job id, downloading
+        separate ranges of the result concurrently.
+
+        The rows are split into `workers` contiguous index ranges which are
+        requested in parallel (using ``startIndex``), each from its own
+        connection, and joined back together in order.
 
         Parameters
         ----------
@@ -398,14 +864,99 @@ class BigQueryClient(object):
             The number of rows to retrieve from a query table.
         timeout : float, optional
             Timeout in seconds.
+        workers : int, optional
+            Number of ranges to download concurrently (default 4). Every
+            range needs its own connection, so clients without a
+            ``service_factory`` download the ranges one after another.
+        row_type : str, optional
+            One of the ROW_TYPE_* constants. Rows are ``dict`` objects by
+            default; ``ROW_TYPE_TUPLE`` and ``ROW_TYPE_RECORD`` return more
+            compact tuples in schema order and ``ROW_TYPE_LAZY`` read-only
+            mappings that decode cells on first access (see
+            `bigquery.decoder.compile_row_decoder`).
 
         Returns
         -------
         list
             A ``list`` of ``dict`` objects that represent table rows.
+
+        Raises
+        ------
+        UnfinishedQueryException
+            If the query job has not completed yet
+        """
+
+        query_reply = self.get_query_results(job_id, offset=0, limit=0,
+                                             timeout=timeout)
+        if not query_reply['jobComplete']:
+            logger.warning('BigQuery job %s not complete' % job_id)
+            raise UnfinishedQueryException()
+
+        decode = compile_row_decoder(query_reply["schema"]["fields"],
+                                     row_type)
+
+        start = offset or 0
+        end = int(query_reply.get('totalRows', 0))
+        if limit:
+            end = min(end, start + limit)
+        if end <= start:
+            return []
+
+        window = -(-(end - start) // max(workers, 1))
+        windows = [(index, min(window, end - index))
+                   for index in range(start, end, window)]
+
+        def fetch_window(worker, window):
+            window_offset, window_limit = window
+            window_reply = worker.get_query_results(
+                job_id, offset=window_offset, limit=window_limit,
+                timeout=timeout)
+            pages = worker._iter_query_pages(
+                job_id, window_reply, offset=window_offset,
+                limit=window_limit, timeout=timeout)
+            return [decode(row) for rows in pages for row in rows]
+
+        worker_clients = self._acquire_worker_clients(len(windows))
+        try:
+            results = map_concurrently(fetch_window, windows, worker_clients)
+        finally:
+            self._release_worker_clients(worker_clients)
+
+        records = []
+        for rows in results:
+            records.extend(rows)
+        return records
+
+    def _get_query_pages(self, job_id, offset=None, limit=None, timeout=0,
+                         prefetch=0):
+        """Request the first page of a query's results and return its schema
+        along with an iterator over the raw rows of every page.
+
+        Parameters
+        ----------
+        job_id : str
+            The job id that references a BigQuery query.
+        offset : int, optional
+            The offset of the rows to pull from BigQuery
+        limit : int, optional
+            The number of rows to retrieve from a query table.
+        timeout : float, optional
+            Timeout in seconds.
+        prefetch : int, optional
+            Number of pages to request ahead in a background thread, using a
+            worker client. Ignored without a ``service_factory``.
+
+        Returns
+        -------
+        tuple
+            (schema fields, iterator of ``list`` objects of raw rows)
+
+        Raises
+        ------
+        UnfinishedQueryException
+            If the query job has not completed yet
         """
 
-        # Get query results
         query_reply = self.get_query_results(job_id, offset=offset,
                                              limit=limit, timeout=timeout)
         if not query_reply['jobComplete']:
@@ -413,19 +964,59 @@ class BigQueryClient(object):
             raise UnfinishedQueryException()
 
         schema = query_reply["schema"]["fields"]
-        rows = query_reply.get('rows', [])
-        page_token = query_reply.get("pageToken")
-        records = [self._transform_row(row, schema) for row in rows]
+        if prefetch and self.service_factory is not None:
+            pages = prefetch_iterator(
+                self._iter_worker_query_pages(job_id, query_reply,
+                                              offset=offset, limit=limit,
+                                              timeout=timeout),
+                depth=prefetch)
+        else:
+            pages = self._iter_query_pages(job_id, query_reply,
+                                           offset=offset, limit=limit,
+                                           timeout=timeout)
+
+        return schema, pages
+
+    def _iter_worker_query_pages(self, job_id, query_reply, offset=None,
+                                 limit=None, timeout=0):
+        """Like `_iter_query_pages`, but request the following pages with a
+        worker client, which is released once the generator is closed. This
+        lets the pages be fetched from another thread while this client is
+        in use.
+        """
+
+        worker, = self._acquire_worker_clients(1)
+        try:
+            for rows in worker._iter_query_pages(job_id, query_reply,
+                                                 offset=offset, limit=limit,
+                                                 timeout=timeout):
+                yield rows
+        finally:
+            self._release_worker_clients([worker])
+
+    def _iter_query_pages(self, job_id, query_reply, offset=None, limit=None,
+                          timeout=0):
+        """Yield the raw rows of `query_reply` and of every following page,
+        stopping once `limit` rows have been yielded.
+        """
+
+        remaining = limit
+        while True:
+            rows = query_reply.get('rows', [])
+            if limit:
+                rows = rows[:remaining]
+                remaining -= len(rows)
+
+            if rows:
+                yield rows
+
+            page_token = query_reply.get("pageToken")
+            if not page_token or (limit and remaining <= 0):
+                return
 
-        # Append to records if there are multiple pages for query results
-        while page_token and (not limit or len(records) < limit):
             query_reply = self.get_query_results(
                 job_id, offset=offset, limit=limit, page_token=page_token,
                 timeout=timeout)
-            page_token = query_reply.get("pageToken")
-            rows = query_reply.get('rows', [])
-            records += [self._transform_row(row, schema) for row in rows]
-        return records[:limit] if limit else records
 
     def check_dataset(self, dataset_id):
         """Check to see if a dataset exists.
@@ -787,6 +1378,7 @@ class BigQueryClient(object):
             field_delimiter=None,
             quote=None,
             skip_leading_rows=None,
+            as_future=False
     ):
         """
         Imports data into a BigQuery table from cloud storage. Optional
@@ -830,10 +1422,13 @@ class BigQueryClient(object):
             Quote character for csv only
         skip_leading_rows : int, optional
             For csv only
+        as_future : bool, optional
+            Return a ``BigQueryJobFuture`` for the job instead of its
+            resource, see `job_future`. Requires a ``service_factory``.
 
         Returns
         -------
-        dict
+        dict or BigQueryJobFuture
             A BigQuery job response
 
         Raises
@@ -927,7 +1522,7 @@ class BigQueryClient(object):
         logger.debug("Creating load job %s" % body)
         job_resource = self._insert_job(body)
         self._raise_insert_exception_if_error(job_resource)
-        return job_resource
+        return self.job_future(job_resource) if as_future else job_resource
 
     def export_data_to_uris(
             self,
@@ -939,6 +1534,7 @@ class BigQueryClient(object):
             destination_format=None,
             print_header=None,
             field_delimiter=None,
+            as_future=False
     ):
         """
         Export data from a BigQuery table to cloud storage. Optional arguments
@@ -965,10 +1561,13 @@ class BigQueryClient(object):
             Whether or not to print the header
         field_delimiter : str, optional
             Character separating fields in delimited file
+        as_future : bool, optional
+            Return a ``BigQueryJobFuture`` for the job instead of its
+            resource, see `job_future`. Requires a ``service_factory``.
 
         Returns
         -------
-        dict
+        dict or BigQueryJobFuture
             A BigQuery job resource
 
         Raises
@@ -1021,7 +1620,7 @@ class BigQueryClient(object):
         logger.info("Creating export job %s" % body)
         job_resource = self._insert_job(body)
         self._raise_insert_exception_if_error(job_resource)
-        return job_resource
+        return self.job_future(job_resource) if as_future else job_resource
 
     def write_to_table(
             self,
@@ -1034,7 +1633,8 @@ class BigQueryClient(object):
             priority=None,
             create_disposition=None,
             write_disposition=None,
-            use_legacy_sql=None
+            use_legacy_sql=None,
+            as_future=False
     ):
         """
         Write query result to table. If dataset or table is not provided,
@@ -1065,11 +1665,13 @@ class BigQueryClient(object):
             One of the JOB_WRITE_* constants
         use_legacy_sql:
             If False, the query will use BigQuery's standard SQL (https://cloud.google.com/bigquery/sql-reference/)
-
+        as_future : bool, optional
+            Return a ``BigQueryJobFuture`` for the job instead of its
+            resource, see `job_future`. Requires a ``service_factory``.
 
         Returns
         -------
-        dict
+        dict or BigQueryJobFuture
             A BigQuery job resource
 
         Raises
@@ -1124,62 +1726,342 @@ class BigQueryClient(object):
         logger.info("Creating write to table job %s" % body)
         job_resource = self._insert_job(body)
         self._raise_insert_exception_if_error(job_resource)
-        return job_resource
+        return self.job_future(job_resource) if as_future else job_resource
 
-    def wait_for_job(self, job, interval=5, timeout=60):
+    def wait_for_job(self, job, interval=5, timeout=60,
+                     initial_interval=WAIT_INITIAL_INTERVAL):
         """
         Waits until the job indicated by job_resource is done or has failed
 
+        The job is polled right away, then after `initial_interval` seconds,
+        with the wait growing exponentially, with some jitter, up to
+        `interval` seconds. The last wait is shortened so that the job is
+        polled once more when `timeout` expires.
+
         Parameters
         ----------
         job : Union[dict, str]
             ``dict`` representing a BigQuery job resource, or a ``str``
             representing the BigQuery job id
         interval : float, optional
-            Polling interval in seconds, default = 5
+            Longest polling interval in seconds, default = 5
         timeout : float, optional
             Timeout in seconds, default = 60
+        initial_interval : float, optional
+            First polling interval in seconds, default = 0.5
 
         Returns
         -------
         dict
             Final state of the job resouce, as described here:
             https://developers.google.com/resources/api-libraries/documentation/bigquery/v2/python/latest/bigquery_v2.jobs.html#get
+            with an added ``pollStatistics`` dict holding the number of
+            ``polls``, the ``waitedSeconds`` spent sleeping between them,
+            and the ``wastedSeconds`` between the end of the job (or the
+            previous poll, if the job does not report its end time) and
+            the last poll.
 
         Raises
         ------
         Union[JobExecutingException, BigQueryTimeoutException]
             On http/auth failures or timeout
         """
-        complete = False
-        job_id = str(job if isinstance(job,
-                                       (six.binary_type, six.text_type, int))
-                     else job['jobReference']['jobId'])
-        job_resource = None
+        job_id = self._job_id(job)
 
         start_time = time()
-        elapsed_time = 0
-        while not (complete or elapsed_time > timeout):
-            sleep(interval)
+        delay = min(initial_interval, interval)
+        polls = 0
+        waited = 0.0
+        last_sleep = 0.0
+
+        while True:
             request = self.bigquery.jobs().get(projectId=self.project_id,
                                                jobId=job_id)
             job_resource = request.execute()
+            polls += 1
             self._raise_executing_exception_if_error(job_resource)
-            complete = job_resource.get('status').get('state') == u'DONE'
-            elapsed_time = time() - start_time
-
-        # raise exceptions if timeout
-        if not complete:
-            logger.error('BigQuery job %s timeout' % job_id)
-            raise BigQueryTimeoutException()
+            if job_resource.get('status').get('state') == u'DONE':
+                break
+
+            remaining = timeout - (time() - start_time)
+            if remaining <= 0:
+                logger.error('BigQuery job %s timeout' % job_id)
+                raise BigQueryTimeoutException()
+
+            last_sleep = min(
+                delay * uniform(1 - WAIT_JITTER, 1 + WAIT_JITTER),
+                interval, remaining)
+            sleep(last_sleep)
+            waited += last_sleep
+            delay *= WAIT_BACKOFF_FACTOR
+
+        end_time = job_resource.get('statistics', {}).get('endTime')
+        wasted = last_sleep
+        if end_time:
+            wasted = min(max(time() - int(end_time) / 1000.0, 0), last_sleep)
+
+        job_resource['pollStatistics'] = {
+            'polls': polls,
+            'waitedSeconds': waited,
+            'wastedSeconds': wasted
+        }
 
         return job_resource
 
+    def wait_for_jobs(self, jobs, timeout=60, return_when=WAIT_ALL_COMPLETED,
+                      interval=5, initial_interval=WAIT_INITIAL_INTERVAL):
+        """Wait for several jobs at once, like ``concurrent.futures.wait``.
+
+        Jobs are polled together, see `iter_completed_jobs`.
+
+        Parameters
+        ----------
+        jobs : list
+            BigQuery job resources (``dict``) or job ids (``str``)
+        timeout : float, optional
+            Timeout in seconds, default = 60
+        return_when : str, optional
+            ``WAIT_ALL_COMPLETED`` (the default) to wait for every job,
+            ``WAIT_FIRST_COMPLETED`` to return as soon as a job is done, or
+            ``WAIT_FIRST_EXCEPTION`` to return as soon as a job fails.
+        interval : float, optional
+            Longest polling interval in seconds, default = 5
+        initial_interval : float, optional
+            First polling interval in seconds, default = 0.5
+
+        Returns
+        -------
+        tuple
+            The final job resources of the jobs that are done, in the order
+            they completed, and the ids of the jobs still pending when
+            `timeout` expired or `return_when` was satisfied. Failed jobs are
+            done; their resource has an ``errorResult`` in its status. So are
+            jobs whose status could not be retrieved, see
+            `iter_completed_jobs`.
+
+        Raises
+        ------
+        ValueError
+            If `return_when` is not one of the WAIT_* constants
+        """
+
+        if return_when not in (WAIT_ALL_COMPLETED, WAIT_FIRST_COMPLETED,
+                               WAIT_FIRST_EXCEPTION):
+            raise ValueError('Invalid return_when: %s' % return_when)
+
+        job_ids = [self._job_id(job) for job in jobs]
+        done = []
+
+        try:
+            for job_resource in self.iter_completed_jobs(
+                    job_ids, interval=interval, timeout=timeout,
+                    initial_interval=initial_interval):
+                done.append(job_resource)
+                if return_when == WAIT_FIRST_COMPLETED:
+                    break
+                if return_when == WAIT_FIRST_EXCEPTION and \
+                        job_resource['status'].get('errorResult'):
+                    break
+        except BigQueryTimeoutException:
+            pass
+
+        completed = set(job_resource['jobReference']['jobId']
+                        for job_resource in done)
+        return done, [job_id for job_id in job_ids
+                      if job_id not in completed]
+
+    def iter_completed_jobs(self, jobs, interval=5, timeout=60,
+                            initial_interval=WAIT_INITIAL_INTERVAL):
+        """Yield the final job resources of several jobs as they complete.
+
+        All pending jobs are polled together, with their ``jobs().get``
+        calls sent as HTTP batch requests, and jobs are no longer polled once
+        they are done. The polling interval grows as in `wait_for_job`.
+
+        Parameters
+        ----------
+        jobs : list
+            BigQuery job resources (``dict``) or job ids (``str``)
+        interval : float, optional
+            Longest polling interval in seconds, default = 5
+        timeout : float, optional
+            Timeout in seconds, default = 60
+        initial_interval : float, optional
+            First polling interval in seconds, default = 0.5
+
+        Returns
+        -------
+        generator
+            Job resources (``dict``) in the order the jobs completed. Failed
+            jobs are yielded too, with an ``errorResult`` in their status.
+            Jobs whose ``jobs().get`` request failed with a permanent error,
+            such as a missing job, are yielded as done and no longer polled,
+            with an ``httperror`` errorResult. Requests that failed with a
+            server error or a rate limit are sent again in the next round.
+
+        Raises
+        ------
+        BigQueryTimeoutException
+            If jobs are still running when `timeout` expires
+        """
+
+        pending = [self._job_id(job) for job in jobs]
+        start_time = time()
+        delay = min(initial_interval, interval)
+
+        while pending:
+            requests = [self.bigquery.jobs().get(projectId=self.project_id,
+                                                 jobId=job_id)
+                        for job_id in pending]
+            responses = self._execute_batch(requests)
+
+            running = []
+            for job_id, (job_resource, exception) in zip(pending, responses):
+                if _is_transient_http_error(exception):
+                    logger.warning('Cannot get BigQuery job %s, retrying: %s'
+                                   % (job_id, exception))
+                    running.append(job_id)
+                    continue
+                if exception is not None:
+                    logger.error('Cannot get BigQuery job %s: %s'
+                                 % (job_id, exception))
+                    job_resource = {
+                        'jobReference': {'projectId': self.project_id,
+                                         'jobId': job_id},
+                        'status': {
+                            'state': u'DONE',
+                            'errorResult': {
+                                'reason': 'httperror',
+                                'message': str(exception)
+                            }
+                        }
+                    }
+                if job_resource.get('status', {}).get('state') == u'DONE':
+                    yield job_resource
+                else:
+                    running.append(job_id)
+            pending = running
+
+            if not pending:
+                return
+
+            remaining = timeout - (time() - start_time)
+            if remaining <= 0:
+                logger.error('BigQuery jobs %s timeout' % ', '.join(pending))
+                raise BigQueryTimeoutException()
+
+            sleep(min(delay * uniform(1 - WAIT_JITTER, 1 + WAIT_JITTER),
+                      interval, remaining))
+            delay *= WAIT_BACKOFF_FACTOR
+
+    def job_future(self, job):
+        """Return a future that completes when a job is done.
+
+        All futures of a client are resolved by one background thread, which
+        polls their jobs together with batched requests, so that many jobs
+        can be awaited without a thread or a polling loop for each.
+
+        Parameters
+        ----------
+        job : dict or str
+            A job resource, as returned by `write_to_table`, or a job id
+
+        Returns
+        -------
+        BigQueryJobFuture
+            A ``concurrent.futures.Future`` whose result is the final job
+            resource. ``result()`` raises ``JobExecutingException`` if the
+            job failed, and ``cancel()`` cancels the job.
+
+        Raises
+        ------
+        ValueError
+            If the client has no ``service_factory``, which the polling
+            thread needs for a connection of its own
+        """
+
+        from bigquery.jobs import JobPoller
+
+        with self._job_poller_lock:
+            if self._job_poller is None:
+                self._job_poller = JobPoller(self)
+            poller = self._job_poller
+
+        return poller.submit(job)
+
+    def batch(self):
+        """Return a batch collecting metadata calls, to be sent together as
+        HTTP batch requests when its ``with`` block ends.
+
+        Returns
+        -------
+        MetadataBatch
+            Provides ``check_dataset``, ``get_dataset``, ``check_table``,
+            ``get_table``, ``get_table_schema`` and ``delete_table``, which
+            return futures for the results of the client methods of the same
+            name.
+        """
+
+        return MetadataBatch(self)
+
+    def _execute_batch(self, requests):
+        """Execute API requests using as few HTTP batch requests as possible.
+
+        Parameters
+        ----------
+        requests : list
+            ``googleapiclient.http.HttpRequest`` objects of this client's
+            service
+
+        Returns
+        -------
+        list
+            A ``(response, exception)`` tuple for every request, in order.
+            exception is None unless the request failed.
+        """
+
+        results = [None] * len(requests)
+
+        def callback(request_id, response, exception):
+            results[int(request_id)] = (response, exception)
+
+        for start in range(0, len(requests), BATCH_MAX_REQUESTS):
+            batch = self.bigquery.new_batch_http_request(callback=callback)
+            for index in range(start, min(start + BATCH_MAX_REQUESTS,
+                                          len(requests))):
+                batch.add(requests[index], request_id=str(index))
+            batch.execute()
+
+        return results
+
+    def _job_id(self, job):
+        """Return the id of a job given as a job resource or an id."""
+
+        return str(job if isinstance(job,
+                                     (six.binary_type, six.text_type, int))
+                   else job['jobReference']['jobId'])
+
     def push_rows(self, dataset, table, rows, insert_id_key=None,
                   skip_invalid_rows=None, ignore_unknown_values=None,
-                  template_suffix=None):
+                  template_suffix=None, max_rows_per_request=INSERT_MAX_ROWS,
+                  max_bytes_per_request=INSERT_MAX_BYTES, workers=1,
+                  max_retries=0, retry_backoff=1.0, auto_insert_id=False):
         """Upload rows to BigQuery table.
 
+        Rows that do not fit in a single insertAll request are sent in
+        several requests, concurrently if `workers` is greater than one.
+        Their responses are merged into one, with the ``index`` of every
+        insert error referring to the position of the row in `rows`.
+        Rows whose insert failed with a transient error can be retried on
+        their own with `max_retries`.
+        If the client has a `spool`, rows that still fail with a transient
+        error, or all rows if BigQuery cannot be reached, are written to it
+        instead of being reported as insert errors. Rows are then given a
+        random insertId before they are first sent, unless they have one,
+        so that replaying rows that were inserted before a connection error
+        does not duplicate them. Pre-serialized rows should be given an
+        insertId for the same reason.
+
         Parameters
         ----------
         dataset : str
@@ -1187,7 +2069,9 @@ class BigQueryClient(object):
         table : str
             The name of the table to insert rows into
         rows : list
-            A ``list`` of rows (``dict`` objects) to add to the table
+            A ``list`` of rows (``dict`` objects) to add to the table. Rows
+            may also be pre-serialized with ``Serializer.insert_row``, in
+            which case `insert_id_key` and `auto_insert_id` do not apply.
         insert_id_key : str, optional
             Key for insertId in row
         skip_invalid_rows : bool, optional
@@ -1197,6 +2081,31 @@ class BigQueryClient(object):
         template_suffix : str, optional
             Inserts the rows into an {table}{template_suffix}.
             If table {table}{template_suffix} doesn't exist, create from {table}.
+        max_rows_per_request : int, optional
+            Maximum number of rows sent in one request.
+        max_bytes_per_request : int, optional
+            Approximate maximum size of the rows sent in one request, in
+            bytes. A row larger than this is sent on its own. Estimating the
+            size takes encoding every row, which None avoids for callers
+            that already know their rows fit in a request.
+        workers : int, optional
+            Number of requests sent in parallel when the rows are split
+            (default 1). Every request needs its own connection, so clients
+            without a ``service_factory``, which ``get_client`` sets up,
+            send the requests one after another.
+        max_retries : int, optional
+            Number of times rows that failed with a transient error (see
+            ``INSERT_RETRY_REASONS``) are sent again (default 0). Only those
+            rows are resent; rows with permanent errors such as ``invalid``
+            are reported in the result right away.
+        retry_backoff : float, optional
+            Seconds to wait before the first retry, doubled for every
+            following retry (default 1).
+        auto_insert_id : Union[bool, list], optional
+            True to give rows without `insert_id_key` an insertId derived
+            from a hash of their content (see `make_insert_ids`), or a list
+            of the fields to hash. This makes retries idempotent without
+            keeping track of ids.
 
         Returns
         -------
@@ -1209,25 +2118,326 @@ class BigQueryClient(object):
 
         rows_data = []
         for row in rows:
+            if isinstance(row, JsonFragment):
+                # Pre-serialized by Serializer.insert_row. Without a
+                # serializer the service cannot splice it into the body.
+                rows_data.append(row if self.serializer is not None
+                                 else row.decode())
+                continue
+
             each_row = {}
             each_row["json"] = row
             if insert_id_key in row:
                 each_row["insertId"] = row[insert_id_key]
             rows_data.append(each_row)
 
-        data = {
-            "kind": "bigquery#tableDataInsertAllRequest",
-            "rows": rows_data
-        }
+        if auto_insert_id:
+            fields = None if auto_insert_id is True else auto_insert_id
+            missing = [each_row for each_row in rows_data
+                       if not isinstance(each_row, JsonFragment) and
+                       "insertId" not in each_row]
+            insert_ids = make_insert_ids(
+                [each_row["json"] for each_row in missing], fields)
+            for each_row, insert_id in zip(missing, insert_ids):
+                each_row["insertId"] = insert_id
+
+        if self.spool is not None:
+            for each_row in rows_data:
+                if not isinstance(each_row, JsonFragment) and \
+                        "insertId" not in each_row:
+                    each_row["insertId"] = uuid.uuid4().hex
+
+        options = {}
 
         if skip_invalid_rows is not None:
-            data['skipInvalidRows'] = skip_invalid_rows
+            options['skipInvalidRows'] = skip_invalid_rows
 
         if ignore_unknown_values is not None:
-            data['ignoreUnknownValues'] = ignore_unknown_values
+            options['ignoreUnknownValues'] = ignore_unknown_values
 
         if template_suffix is not None:
-            data['templateSuffix'] = template_suffix
+            options['templateSuffix'] = template_suffix
+
+        chunks = self._split_insert_rows(
+            rows_data, max_rows_per_request, max_bytes_per_request)
+
+        if len(chunks) == 1 and not max_retries and self.spool is None:
+            return self._insert_all(table_data, dataset, table, chunks[0][1],
+                                    options)
+
+        try:
+            insert_errors = self._insert_rows_data(
+                table_data, dataset, table, rows_data, options, chunks=chunks,
+                max_rows=max_rows_per_request, max_bytes=max_bytes_per_request,
+                workers=workers, max_retries=max_retries,
+                retry_backoff=retry_backoff)
+        except (IOError, HttpLib2Error):
+            if self.spool is None:
+                raise
+            logger.exception('Problem with BigQuery insertAll, spooling %d '
+                             'rows' % len(rows_data))
+            self.spool.append(dataset, table, rows_data, options)
+            insert_errors = []
+
+        if self.spool is not None:
+            insert_errors = self._spool_failed_rows(
+                dataset, table, rows_data, options, insert_errors)
+
+        response = {'kind': 'bigquery#tableDataInsertAllResponse'}
+
+        if insert_errors:
+            response['insertErrors'] = insert_errors
+            logger.error('BigQuery insert errors: %s' % response)
+            if self.swallow_results:
+                return False
+            else:
+                return response
+
+        if self.swallow_results:
+            return True
+        else:
+            return response
+
+    def _insert_rows_data(self, table_data, dataset, table, rows_data,
+                          options, chunks=None, max_rows=INSERT_MAX_ROWS,
+                          max_bytes=INSERT_MAX_BYTES, workers=1,
+                          max_retries=0, retry_backoff=1.0):
+        """Insert rows with as many insertAll requests as needed, retrying
+        the rows that failed with a transient error.
+
+        Parameters
+        ----------
+        table_data : object
+            The tabledata resource of the BigQuery service
+        dataset : str
+            The dataset to upload to
+        table : str
+            The name of the table to insert rows into
+        rows_data : list
+            The request rows, with the row in ``json`` and an optional
+            ``insertId``
+        options : dict
+            Additional properties of the request bodies
+        chunks : list, optional
+            `rows_data` already split by `_split_insert_rows`
+        max_rows : int, optional
+            Maximum number of rows sent in one request
+        max_bytes : int, optional
+            Approximate maximum size of the rows sent in one request
+        workers : int, optional
+            Number of requests to send in parallel
+        max_retries : int, optional
+            Number of times rows with transient errors are sent again
+        retry_backoff : float, optional
+            Seconds to wait before the first retry, doubled for every
+            following retry
+
+        Returns
+        -------
+        list
+            The insert errors of the rows that could not be inserted, with
+            indices referring to `rows_data`.
+        """
+
+        if chunks is None:
+            chunks = self._split_insert_rows(rows_data, max_rows, max_bytes)
+
+        insert_errors = self._insert_chunks(table_data, dataset, table,
+                                            chunks, options, workers)
+
+        for attempt in range(max_retries):
+            positions = self._retryable_rows(insert_errors)
+            if not positions:
+                break
+
+            delay = retry_backoff * 2 ** attempt
+            logger.warning('Retrying %d of %d rows in %s seconds'
+                           % (len(positions), len(rows_data), delay))
+            sleep(delay)
+
+            retried = set(positions)
+            insert_errors = [error for error in insert_errors
+                             if error.get('index') not in retried]
+
+            chunks = self._split_insert_rows(
+                [rows_data[index] for index in positions],
+                max_rows, max_bytes)
+            for error in self._insert_chunks(table_data, dataset, table,
+                                             chunks, options, workers):
+                if 'index' in error:
+                    error['index'] = positions[error['index']]
+                insert_errors.append(error)
+
+            insert_errors.sort(key=lambda error: error.get('index', -1))
+
+        return insert_errors
+
+    def _retryable_rows(self, insert_errors):
+        """Return the sorted indices of the rows whose insert errors are all
+        transient.
+        """
+
+        failed = defaultdict(list)
+        for error in insert_errors:
+            failed[error.get('index')].append(error)
+
+        return sorted(
+            index for index, errors in failed.items()
+            if index is not None and
+            all(self._is_retryable_insert_error(e) for e in errors))
+
+    def _spool_failed_rows(self, dataset, table, rows_data, options,
+                           insert_errors):
+        """Write the rows that failed with a transient error to `spool`.
+
+        Returns
+        -------
+        list
+            The insert errors of the rows that were not spooled
+        """
+
+        positions = self._retryable_rows(insert_errors)
+        if not positions:
+            return insert_errors
+
+        logger.warning('Spooling %d rows that could not be inserted into '
+                       '%s.%s' % (len(positions), dataset, table))
+        self.spool.append(dataset, table,
+                          [rows_data[index] for index in positions], options)
+
+        spooled = set(positions)
+        return [error for error in insert_errors
+                if error.get('index') not in spooled]
+
+    def _insert_chunks(self, table_data, dataset, table, chunks, options,
+                       workers):
+        """Send one insertAll request per chunk of rows.
+
+        Parameters
+        ----------
+        table_data : object
+            The tabledata resource of the BigQuery service
+        dataset : str
+            The dataset to upload to
+        table : str
+            The name of the table to insert rows into
+        chunks : list
+            ``(offset, rows)`` tuples as returned by `_split_insert_rows`
+        options : dict
+            Additional properties of the request bodies
+        workers : int
+            Number of requests to send in parallel, if the client has a
+            ``service_factory``
+
+        Returns
+        -------
+        list
+            The insert errors of all requests, with indices relative to the
+            first chunk. Requests that raised an ``HttpError`` report an
+            ``httperror`` for each of their rows.
+        """
+
+        def insert_chunk(worker, chunk):
+            return worker._insert_all(worker.bigquery.tabledata(), dataset,
+                                      table, chunk[1], options, raw=True)
+
+        if workers > 1 and len(chunks) > 1 and \
+                self.service_factory is not None:
+            worker_clients = self._acquire_worker_clients(
+                min(workers, len(chunks)))
+            try:
+                responses = map_concurrently(insert_chunk, chunks,
+                                             worker_clients)
+            finally:
+                self._release_worker_clients(worker_clients)
+        else:
+            responses = [self._insert_all(table_data, dataset, table, chunk,
+                                          options, raw=True)
+                         for _, chunk in chunks]
+
+        insert_errors = []
+        for (offset, chunk), response in zip(chunks, responses):
+            if isinstance(response, HttpError):
+                insert_errors.extend({
+                    'index': offset + index,
+                    'errors': [{
+                        'reason': 'httperror',
+                        'message': response
+                    }]
+                } for index in range(len(chunk)))
+                continue
+
+            for error in response.get('insertErrors', []):
+                error = dict(error)
+                if 'index' in error:
+                    error['index'] += offset
+                insert_errors.append(error)
+
+        return insert_errors
+
+    def _is_retryable_insert_error(self, insert_error):
+        """Return True if every error reported for a row is transient, so
+        that inserting the row again may succeed.
+
+        Parameters
+        ----------
+        insert_error : dict
+            An element of the ``insertErrors`` of an insertAll response
+
+        Returns
+        -------
+        bool
+        """
+
+        errors = insert_error.get('errors')
+        if not errors:
+            return False
+
+        for error in errors:
+            reason = error.get('reason')
+            if reason == 'httperror':
+                response = getattr(error.get('message'), 'resp', None)
+                status = getattr(response, 'status', None)
+                if status not in INSERT_RETRY_STATUSES:
+                    return False
+            elif reason not in INSERT_RETRY_REASONS:
+                return False
+
+        return True
+
+    def _insert_all(self, table_data, dataset, table, rows_data, options,
+                    raw=False):
+        """Send one insertAll request.
+
+        Parameters
+        ----------
+        table_data : object
+            The tabledata resource of the BigQuery service
+        dataset : str
+            The dataset to upload to
+        table : str
+            The name of the table to insert rows into
+        rows_data : list
+            The request rows, with the row in ``json`` and an optional
+            ``insertId``
+        options : dict
+            Additional properties of the request body
+        raw : bool, optional
+            Return the response, or the ``HttpError`` that was raised,
+            without interpreting it.
+
+        Returns
+        -------
+        Union[bool, dict, HttpError]
+            The result as described in `push_rows`, or the raw outcome of the
+            request if `raw` is set.
+        """
+
+        data = {
+            "kind": "bigquery#tableDataInsertAllRequest",
+            "rows": rows_data
+        }
+        data.update(options)
 
         try:
             response = table_data.insertAll(
@@ -1237,6 +2447,9 @@ class BigQueryClient(object):
                 body=data
             ).execute()
 
+            if raw:
+                return response
+
             if response.get('insertErrors'):
                 logger.error('BigQuery insert errors: %s' % response)
                 if self.swallow_results:
@@ -1251,6 +2464,8 @@ class BigQueryClient(object):
 
         except HttpError as e:
             logger.exception('Problem with BigQuery insertAll')
+            if raw:
+                return e
             if self.swallow_results:
                 return False
             else:
@@ -1263,6 +2478,61 @@ class BigQueryClient(object):
                     }]
                 }
 
+    def _split_insert_rows(self, rows_data, max_rows, max_bytes):
+        """Split insertAll request rows into chunks that respect the row
+        count and size limits of a request.
+
+        Rows are sized by encoding them with the client's `serializer` if it
+        has one, and the chunks then hold the encoded rows so that they are
+        not encoded again for the request. Otherwise they are sized with the
+        standard library ``json`` module.
+
+        Parameters
+        ----------
+        rows_data : list
+            The request rows
+        max_rows : int
+            Maximum number of rows in a chunk
+        max_bytes : int
+            Approximate maximum serialized size of the rows in a chunk, or
+            None to only split by row count
+
+        Returns
+        -------
+        list
+            ``(offset, rows)`` tuples, where offset is the position of the
+            first row of the chunk in `rows_data`. There is always at least
+            one chunk.
+        """
+
+        # The size of a single row does not matter, it is sent on its own.
+        if max_bytes is None or len(rows_data) <= 1:
+            return [(start, rows_data[start:start + max_rows])
+                    for start in range(0, max(len(rows_data), 1), max_rows)]
+
+        if self.serializer is not None:
+            rows_data = [row if isinstance(row, JsonFragment)
+                         else self.serializer.fragment(row)
+                         for row in rows_data]
+
+        chunks = []
+        start = 0
+        size = 0
+
+        for index, row in enumerate(rows_data):
+            # Account for the separator between rows.
+            row_size = 2 + (len(row) if isinstance(row, JsonFragment)
+                            else len(json.dumps(row)))
+            count = index - start
+            if count and (count >= max_rows or size + row_size > max_bytes):
+                chunks.append((start, rows_data[start:index]))
+                start = index
+                size = 0
+            size += row_size
+
+        chunks.append((start, rows_data[start:]))
+        return chunks
+
     def get_all_tables(self, dataset_id):
         """Retrieve a list of tables for the dataset.
 
@@ -1500,7 +2770,9 @@ class BigQueryClient(object):
             timeoutMs=timeout * 1000).execute()
 
     def _transform_row(self, row, schema):
-        """Apply the given schema to the given BigQuery data row.
+        """Apply the given schema to the given BigQuery data row. Query
+        results are decoded with the equivalent, precompiled decoder returned
+        by `bigquery.decoder.compile_row_decoder`.
 
         Parameters
         ----------
@@ -0,0 +1,164 @@
+from __future__ import absolute_import
+
+import sys
+import threading
+
+import six
+from six.moves import queue
+
+__all__ = ['map_concurrently', 'prefetch_iterator']
+
+# How often (in seconds) a blocked producer checks whether the consumer went
+# away.
+_POLL_INTERVAL = 0.1
+
+_ITEM = 'item'
+_ERROR = 'error'
+_DONE = 'done'
+
+
+def prefetch_iterator(iterable, depth=1):
+    """Consume `iterable` in a background thread, keeping up to `depth` items
+    buffered ahead of the caller.
+
+    The producer thread starts immediately, so the next item is already being
+    produced while the caller works on the current one. Exceptions raised by
+    `iterable` are re-raised in the consuming thread. Closing the returned
+    iterator (or letting it be garbage collected) stops the producer, which
+    then closes `iterable` if it is a generator.
+
+    Parameters
+    ----------
+    iterable : iterable
+        The items to produce. It is only ever advanced from the background
+        thread.
+    depth : int, optional
+        Maximum number of items buffered ahead of the consumer (default 1).
+
+    Returns
+    -------
+    iterator
+        An iterator over the items of `iterable`, in order.
+    """
+
+    items = queue.Queue(maxsize=max(depth, 1))
+    stopped = threading.Event()
+
+    def put(entry):
+        while not stopped.is_set():
+            try:
+                items.put(entry, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((_ITEM, item)):
+                    return
+        except Exception:
+            put((_ERROR, sys.exc_info()))
+        else:
+            put((_DONE, None))
+        finally:
+            # Run the cleanup of generators in the thread that advanced them.
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=produce)
+    producer.daemon = True
+    producer.start()
+
+    return _PrefetchedIterator(items, stopped)
+
+
+class _PrefetchedIterator(six.Iterator):
+    """Iterator over the items put on a queue by a `prefetch_iterator`
+    producer. The producer is stopped once this iterator is exhausted, closed
+    or garbage collected.
+    """
+
+    def __init__(self, items, stopped):
+        self._items = items
+        self._stopped = stopped
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._stopped.is_set():
+            raise StopIteration
+
+        kind, value = self._items.get()
+        if kind == _ITEM:
+            return value
+
+        self.close()
+        if kind == _ERROR:
+            six.reraise(*value)
+        raise StopIteration
+
+    def close(self):
+        self._stopped.set()
+
+    def __del__(self):
+        self.close()
+
+
+def map_concurrently(func, items, workers):
+    """Apply `func` to every item using one thread per worker.
+
+    Each thread repeatedly takes the next pending item and calls
+    ``func(worker, item)`` with its own `worker`, which makes it possible to
+    give every thread a private, non thread-safe resource such as an HTTP
+    connection. If any call raises, the remaining items are skipped and the
+    first exception is re-raised once all threads have stopped.
+
+    Parameters
+    ----------
+    func : function
+        Binary function taking a worker and an item.
+    items : list
+        The items to process.
+    workers : list
+        One worker object per thread to start.
+
+    Returns
+    -------
+    list
+        The results of `func`, in the order of `items`.
+    """
+
+    items = list(items)
+    results = [None] * len(items)
+    errors = []
+    pending = queue.Queue()
+    for index, item in enumerate(items):
+        pending.put((index, item))
+
+    def work(worker):
+        while not errors:
+            try:
+                index, item = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results[index] = func(worker, item)
+            except Exception:
+                errors.append(sys.exc_info())
+
+    threads = [threading.Thread(target=work, args=(worker,))
+               for worker in workers[:max(len(items), 1)]]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        six.reraise(*errors[0])
+
+    return results
@@ -0,0 +1,536 @@
+from __future__ import absolute_import
+
+from array import array
+from collections import OrderedDict
+from operator import itemgetter
+
+import six
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+__all__ = ['ROW_TYPE_DICT', 'ROW_TYPE_LAZY', 'ROW_TYPE_RECORD',
+           'ROW_TYPE_TUPLE', 'LazyRow', 'ResultFrame', 'Row',
+           'compile_row_decoder', 'decode_columns', 'decode_frame',
+           'record_class', 'schema_fingerprint']
+
+ROW_TYPE_DICT = 'dict'
+ROW_TYPE_TUPLE = 'tuple'
+ROW_TYPE_RECORD = 'record'
+ROW_TYPE_LAZY = 'lazy'
+
+_ROW_TYPES = (ROW_TYPE_DICT, ROW_TYPE_TUPLE, ROW_TYPE_RECORD, ROW_TYPE_LAZY)
+
+# Maximum number of compiled decoders kept around before the cache is reset.
+DECODER_CACHE_SIZE = 256
+
+_BOOLEAN_TRUE = ('True', 'true', 'TRUE')
+
+# Casts applied to scalar cells, keyed by BigQuery column type. Types not
+# listed here (STRING, BYTES, DATE, ...) are passed through untouched.
+_SCALAR_CASTS = {
+    'INTEGER': int,
+    'FLOAT': float,
+    'TIMESTAMP': float,
+}
+
+try:
+    array('q')
+    _INTEGER_TYPECODE = 'q'
+except ValueError:
+    # Python 2 has no long long arrays
+    _INTEGER_TYPECODE = 'l'
+
+# array.array typecodes used for columns of a given type as long as they
+# contain no nulls.
+_COLUMN_TYPECODES = {
+    'INTEGER': _INTEGER_TYPECODE,
+    'FLOAT': 'd',
+    'TIMESTAMP': 'd',
+    'BOOLEAN': 'b',
+}
+
+_decoder_cache = {}
+
+
+def schema_fingerprint(fields):
+    """Return a hashable fingerprint for a list of schema fields.
+
+    Parameters
+    ----------
+    fields : list
+        The BigQuery schema, specifically the list of field dicts.
+
+    Returns
+    -------
+    tuple
+        A nested ``tuple`` of (name, type, mode, nested fingerprint) entries
+        which is equal for schemas that decode identically.
+    """
+
+    return tuple(
+        (field['name'], field['type'], field.get('mode'),
+         schema_fingerprint(field['fields'])
+         if field['type'] == 'RECORD' else None)
+        for field in fields)
+
+
+def compile_row_decoder(fields, row_type=ROW_TYPE_DICT):
+    """Compile a schema into a callable that transforms raw BigQuery rows.
+
+    With the default `row_type`, the returned decoder produces exactly what
+    ``BigQueryClient._transform_row`` does, but resolves the column types once
+    up front instead of for every cell. Decoders are cached by
+    `schema_fingerprint`, so compiling the same schema for every page of a
+    result set is cheap.
+
+    Parameters
+    ----------
+    fields : list
+        The BigQuery schema, specifically the list of field dicts.
+    row_type : str, optional
+        One of the ROW_TYPE_* constants. ``ROW_TYPE_DICT`` (default) decodes
+        rows into ``dict`` objects, ``ROW_TYPE_TUPLE`` into plain ``tuple``
+        objects in schema order, ``ROW_TYPE_RECORD`` into instances of the
+        schema's `record_class` and ``ROW_TYPE_LAZY`` into `LazyRow` objects
+        that only decode the cells which are read. Nested records use the
+        same row type.
+
+    Returns
+    -------
+    function
+        Unary function taking a raw ``{'f': [{'v': ...}]}`` row and returning
+        the decoded row. Its ``fields`` attribute is the ``tuple`` of column
+        names, shared by every row it decodes.
+    """
+
+    key = (schema_fingerprint(fields), row_type)
+    decoder = _decoder_cache.get(key)
+
+    if decoder is None:
+        if row_type not in _ROW_TYPES:
+            raise ValueError('Invalid row type: %s' % row_type)
+        if len(_decoder_cache) >= DECODER_CACHE_SIZE:
+            _decoder_cache.clear()
+        decoder = _build_decoder(fields, row_type)
+        _decoder_cache[key] = decoder
+
+    return decoder
+
+
+def record_class(fields):
+    """Return the row class used for `fields` by ``ROW_TYPE_RECORD``
+    decoders.
+
+    Rows are ``tuple`` subclasses without a per-instance ``__dict__``, so they
+    take no more memory than plain tuples. The column names are stored once,
+    as the ``_fields`` class attribute, and every column is readable as an
+    attribute unless its name clashes with a ``tuple`` method.
+
+    Parameters
+    ----------
+    fields : list
+        The BigQuery schema, specifically the list of field dicts.
+
+    Returns
+    -------
+    type
+        A ``Row`` class specific to the schema.
+    """
+
+    key = (schema_fingerprint(fields), '_class')
+    cls = _decoder_cache.get(key)
+
+    if cls is None:
+        names = tuple(field['name'] for field in fields)
+        namespace = {'__slots__': (), '_fields': names}
+        for index, name in enumerate(names):
+            if not hasattr(Row, name):
+                namespace[name] = property(itemgetter(index))
+        cls = type(str('Row'), (Row,), namespace)
+        _decoder_cache[key] = cls
+
+    return cls
+
+
+class Row(tuple):
+    """Base class of the schema specific classes returned by
+    `record_class`.
+    """
+
+    __slots__ = ()
+    _fields = ()
+
+    def _asdict(self):
+        """Return a ``dict`` mapping column names to values."""
+        return dict(zip(self._fields, self))
+
+    def __repr__(self):
+        return 'Row(%s)' % ', '.join(
+            '%s=%r' % item for item in zip(self._fields, self))
+
+
+def _build_decoder(fields, row_type):
+    """Generate the source of a decoder for `fields` and compile it."""
+
+    if row_type == ROW_TYPE_LAZY:
+        return _build_lazy_decoder(fields)
+
+    namespace = {'_BOOLEAN_TRUE': _BOOLEAN_TRUE}
+    lines = ['def decode(row):', '    cells = row["f"]']
+    items = []
+
+    for index, field in enumerate(fields):
+        value = 'v%d' % index
+        lines.append('    %s = cells[%d]["v"]' % (value, index))
+        expression = _cast_expression(field, value, index, namespace,
+                                      row_type)
+        if expression != value:
+            expression = 'None if %s is None else %s' % (value, expression)
+        if row_type == ROW_TYPE_DICT:
+            items.append('        %r: %s,' % (field['name'], expression))
+        else:
+            items.append('        %s,' % expression)
+
+    if row_type == ROW_TYPE_DICT:
+        lines.append('    return {')
+        lines.extend(items)
+        lines.append('    }')
+    else:
+        if row_type == ROW_TYPE_RECORD:
+            namespace['_Row'] = record_class(fields)
+            lines.append('    return _new(_Row, (')
+        else:
+            lines.append('    return _new(tuple, (')
+        namespace['_new'] = tuple.__new__
+        lines.extend(items)
+        lines.append('    ))')
+
+    six.exec_('\n'.join(lines), namespace)
+    decode = namespace['decode']
+    decode.fields = tuple(field['name'] for field in fields)
+    return decode
+
+
+def _cast_expression(field, value, index, namespace, row_type):
+    """Return the expression decoding the (non-null) cell named `value`."""
+
+    field_type = field['type']
+
+    if field_type == 'RECORD':
+        nested = '_nested%d' % index
+        namespace[nested] = _record_decoder(field, row_type)
+        return '%s(%s)' % (nested, value)
+
+    if field_type == 'BOOLEAN':
+        return '%s in _BOOLEAN_TRUE' % value
+
+    if field_type in _SCALAR_CASTS:
+        return '%s(%s)' % (_SCALAR_CASTS[field_type].__name__, value)
+
+    return value
+
+
+def _build_lazy_decoder(fields):
+    """Return a decoder wrapping rows of `fields` in `LazyRow` objects."""
+
+    schema = _LazySchema(fields)
+
+    def decode(row):
+        return LazyRow(row['f'], schema)
+
+    decode.fields = schema.names
+    return decode
+
+
+class _LazySchema(object):
+    """Column names, positions and casts shared by the `LazyRow` objects of
+    one schema.
+    """
+
+    __slots__ = ('names', 'positions', 'casts')
+
+    def __init__(self, fields):
+        self.names = tuple(field['name'] for field in fields)
+        self.positions = dict((name, index)
+                              for index, name in enumerate(self.names))
+        self.casts = [_field_cast(field, ROW_TYPE_LAZY) for field in fields]
+
+
+# Marks cells of a LazyRow that have not been decoded yet.
+_UNDECODED = object()
+
+
+class LazyRow(Mapping):
+    """A read-only mapping over a raw BigQuery row that decodes each cell
+    the first time it is read and remembers the result.
+
+    Rows compare equal to the ``dict`` that ``BigQueryClient._transform_row``
+    returns for the same row; use ``dict(row)`` to decode every cell at once.
+    """
+
+    __slots__ = ('_cells', '_schema', '_values')
+
+    def __init__(self, cells, schema):
+        self._cells = cells
+        self._schema = schema
+        self._values = None
+
+    def __getitem__(self, name):
+        index = self._schema.positions[name]
+
+        values = self._values
+        if values is None:
+            values = self._values = [_UNDECODED] * len(self._cells)
+
+        value = values[index]
+        if value is _UNDECODED:
+            value = self._cells[index]['v']
+            cast = self._schema.casts[index]
+            if value is not None and cast is not None:
+                value = cast(value)
+            values[index] = value
+
+        return value
+
+    def __iter__(self):
+        return iter(self._schema.names)
+
+    def __len__(self):
+        return len(self._schema.names)
+
+    def __contains__(self, name):
+        return name in self._schema.positions
+
+    def __repr__(self):
+        return 'LazyRow(%r)' % dict(self)
+
+
+def _record_decoder(field, row_type=ROW_TYPE_DICT):
+    """Return a function decoding the nested value of a RECORD column."""
+
+    decode = compile_row_decoder(field['fields'], row_type)
+
+    if field.get('mode') != 'REPEATED':
+        return decode
+
+    def decode_repeated(nested_value):
+        if isinstance(nested_value, list):
+            return [decode(record['v']) for record in nested_value]
+        return decode(nested_value)
+
+    return decode_repeated
+
+
+def decode_columns(fields, pages):
+    """Decode pages of raw BigQuery rows into one sequence per column.
+
+    INTEGER, FLOAT, TIMESTAMP and BOOLEAN columns are collected in typed
+    ``array.array`` buffers. Because arrays cannot hold nulls, such a column
+    is converted to a ``list`` as soon as a null is encountered in it. All
+    other columns are lists of values decoded like
+    ``BigQueryClient._transform_row`` would.
+
+    Parameters
+    ----------
+    fields : list
+        The BigQuery schema, specifically the list of field dicts.
+    pages : iterable
+        ``list`` objects of raw ``{'f': [{'v': ...}]}`` rows.
+
+    Returns
+    -------
+    OrderedDict
+        Column names, in schema order, mapped to their values.
+    """
+
+    casts = [_field_cast(field) for field in fields]
+    columns = [_new_column(field) for field in fields]
+
+    for rows in pages:
+        cells = [row['f'] for row in rows]
+        for index, cast in enumerate(casts):
+            values = [cell[index]['v'] for cell in cells]
+            column = columns[index]
+
+            if isinstance(column, array) and None in values:
+                column = columns[index] = list(column)
+
+            if cast is None:
+                column.extend(values)
+            elif isinstance(column, array):
+                column.extend(map(cast, values))
+            else:
+                column.extend(None if value is None else cast(value)
+                              for value in values)
+
+    return OrderedDict((field['name'], column)
+                       for field, column in zip(fields, columns))
+
+
+def _new_column(field):
+    """Return an empty buffer for the values of `field`."""
+
+    typecode = _COLUMN_TYPECODES.get(field['type'])
+    if typecode is None or field.get('mode') == 'REPEATED':
+        return []
+    return array(typecode)
+
+
+def _field_cast(field, row_type=ROW_TYPE_DICT):
+    """Return a function decoding a non-null cell of `field`, or None if the
+    cell is used as is.
+    """
+
+    field_type = field['type']
+
+    if field_type == 'RECORD':
+        return _record_decoder(field, row_type)
+
+    if field_type == 'BOOLEAN':
+        return _BOOLEAN_TRUE.__contains__
+
+    return _SCALAR_CASTS.get(field_type)
+
+
+class ResultFrame(object):
+    """Query results held as one NumPy array per column.
+
+    INTEGER columns are ``int64``, FLOAT and TIMESTAMP columns ``float64`` and
+    BOOLEAN columns ``bool`` arrays. Nulls in these columns are stored as 0,
+    NaN and False respectively and flagged in `masks`. All other columns are
+    ``object`` arrays holding the same values ``BigQueryClient._transform_row``
+    would produce.
+
+    Attributes
+    ----------
+    columns : OrderedDict
+        Column names, in schema order, mapped to ``numpy.ndarray`` objects.
+    masks : dict
+        Names of the columns containing nulls mapped to boolean arrays that
+        are True where the value is null.
+    """
+
+    def __init__(self, columns, masks):
+        self.columns = columns
+        self.masks = masks
+
+    @property
+    def names(self):
+        return list(self.columns)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __len__(self):
+        for column in self.columns.values():
+            return len(column)
+        return 0
+
+    def __repr__(self):
+        return '<ResultFrame %d rows x %d columns>' % (len(self),
+                                                       len(self.columns))
+
+
+def decode_frame(fields, pages):
+    """Decode pages of raw BigQuery rows into a `ResultFrame`.
+
+    The cells of every page are gathered per column and converted in a
+    single NumPy call, rather than cast one by one. Requires NumPy.
+
+    Parameters
+    ----------
+    fields : list
+        The BigQuery schema, specifically the list of field dicts.
+    pages : iterable
+        ``list`` objects of raw ``{'f': [{'v': ...}]}`` rows.
+
+    Returns
+    -------
+    ResultFrame
+        The decoded columns.
+    """
+
+    np = _numpy()
+    converters = [_frame_converter(np, field) for field in fields]
+    chunks = [[] for _ in fields]
+    null_chunks = [[] for _ in fields]
+
+    for rows in pages:
+        cells = [row['f'] for row in rows]
+        for index, (convert, fill) in enumerate(converters):
+            values = [cell[index]['v'] for cell in cells]
+            nulls = None
+            if fill is not None and None in values:
+                nulls = np.array([value is None for value in values])
+                values = [fill if value is None else value
+                          for value in values]
+            chunks[index].append(convert(values))
+            null_chunks[index].append(
+                np.zeros(len(values), dtype=bool) if nulls is None else nulls)
+
+    columns = OrderedDict()
+    masks = {}
+    for index, field in enumerate(fields):
+        name = field['name']
+        convert, _ = converters[index]
+        columns[name] = (np.concatenate(chunks[index]) if chunks[index]
+                         else convert([]))
+        if any(nulls.any() for nulls in null_chunks[index]):
+            masks[name] = np.concatenate(null_chunks[index])
+
+    return ResultFrame(columns, masks)
+
+
+def _numpy():
+    """Import and return the numpy module"""
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('NumPy is required to decode results into a '
+                          'ResultFrame')
+
+    return numpy
+
+
+def _frame_converter(np, field):
+    """Return a (convert, fill) pair for `field`. `convert` turns a list of
+    cells into an array. When `fill` is not None, nulls are replaced by it
+    before conversion and reported in the frame's masks.
+    """
+
+    field_type = field['type']
+
+    if field.get('mode') == 'REPEATED' or field_type == 'RECORD':
+        cast = _field_cast(field)
+        return (lambda values: _object_array(
+            np, [None if value is None else cast(value) for value in values]),
+            None)
+
+    if field_type == 'INTEGER':
+        return (lambda values: np.array(values, dtype=np.int64), '0')
+
+    if field_type in ('FLOAT', 'TIMESTAMP'):
+        return (lambda values: np.array(values, dtype=np.float64), 'nan')
+
+    if field_type == 'BOOLEAN':
+        return (lambda values: np.isin(np.asarray(values), _BOOLEAN_TRUE),
+                'false')
+
+    return (lambda values: np.array(values, dtype=object), None)
+
+
+def _object_array(np, values):
+    """Return a one dimensional object array of `values`, even if they are
+    themselves sequences.
+    """
+
+    column = np.empty(len(values), dtype=object)
+    for index, value in enumerate(values):
+        column[index] = value
+    return column
@@ -14,6 +14,10 @@ class JobExecutingException(Exception):
     pass
 
 
+class InsertQueueFullException(Exception):
+    pass
+
+
 class InvalidTypeException(Exception):
 
     def __init__(self, k, v):
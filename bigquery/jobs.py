@@ -0,0 +1,244 @@
+from __future__ import absolute_import
+
+import threading
+from concurrent.futures import Future
+from logging import getLogger
+from random import uniform
+from time import time
+
+from bigquery.client import (WAIT_BACKOFF_FACTOR, WAIT_INITIAL_INTERVAL,
+                             WAIT_JITTER, _is_transient_http_error)
+
+__all__ = ['BigQueryJobFuture', 'JobPoller']
+
+logger = getLogger(__name__)
+
+
+class BigQueryJobFuture(Future):
+    """A ``concurrent.futures.Future`` for a BigQuery job.
+
+    The future is resolved by the `JobPoller` of the client that created it
+    once the job is done. Its result is the final job resource; jobs that
+    fail raise ``JobExecutingException`` from `result`. Futures work with
+    ``concurrent.futures.wait`` and ``as_completed``.
+
+    Parameters
+    ----------
+    client : BigQueryClient
+        The client that submitted the job
+    job : dict or str
+        The job resource returned when the job was inserted, or a job id
+
+    Attributes
+    ----------
+    job_id : str
+        The id of the job
+    job_resource : dict
+        The most recent job resource, None if only the id is known yet
+    """
+
+    def __init__(self, client, job):
+        super(BigQueryJobFuture, self).__init__()
+        self.client = client
+        self.job_resource = job if isinstance(job, dict) else None
+        self.job_id = client._job_id(job)
+
+    def running(self):
+        """Return True if the job has not finished and was not cancelled."""
+        return not self.done()
+
+    def cancel(self):
+        """Request the cancellation of the job.
+
+        BigQuery cancels jobs on a best-effort basis, so the job may still
+        complete or have side effects.
+
+        Returns
+        -------
+        bool
+            False if the job was already done, True otherwise.
+        """
+
+        if self.done():
+            return False
+
+        self.client.bigquery.jobs().cancel(projectId=self.client.project_id,
+                                           jobId=self.job_id).execute()
+        return super(BigQueryJobFuture, self).cancel()
+
+    def _resolve(self, job_resource):
+        """Complete the future with the final resource of the job."""
+
+        self.job_resource = job_resource
+        try:
+            self.client._raise_executing_exception_if_error(job_resource)
+        except Exception as e:
+            self._complete(exception=e)
+        else:
+            self._complete(result=job_resource)
+
+    def _complete(self, result=None, exception=None):
+        """Set the outcome unless the future was cancelled meanwhile."""
+
+        # Futures are never marked running, so that cancel() works until the
+        # job is done.
+        if not self.set_running_or_notify_cancel():
+            return
+
+        if exception is not None:
+            self.set_exception(exception)
+        else:
+            self.set_result(result)
+
+
+class JobPoller(object):
+    """Resolve the futures of a client's jobs from a single background
+    thread.
+
+    The thread polls all outstanding jobs together, with batched
+    ``jobs().get`` requests, and stops when there are none left. The polling
+    interval starts at `initial_interval` seconds, whenever a job is added,
+    and grows up to `interval` seconds. Jobs whose request fails with a
+    server error or a rate limit are polled again; other request errors are
+    set on their futures.
+
+    Parameters
+    ----------
+    client : BigQueryClient
+        The client to poll jobs with. The thread uses a worker client of its
+        own, so the client needs a ``service_factory``, as ``get_client``
+        sets up.
+    interval : float, optional
+        Longest polling interval in seconds, default = 5
+    initial_interval : float, optional
+        First polling interval in seconds, default = 0.5
+
+    Raises
+    ------
+    ValueError
+        If the client has no ``service_factory``
+    """
+
+    def __init__(self, client, interval=5,
+                 initial_interval=WAIT_INITIAL_INTERVAL):
+        if client.service_factory is None:
+            raise ValueError('Polling jobs in the background needs a client '
+                             'with a service_factory')
+
+        self.client = client
+        self.interval = interval
+        self.initial_interval = initial_interval
+
+        self._futures = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._delay = initial_interval
+        self._woken = False
+
+    @property
+    def pending(self):
+        """Number of futures waiting for their job."""
+        return len(self._futures)
+
+    def submit(self, job):
+        """Return a future for a job, polled from the background thread.
+
+        Parameters
+        ----------
+        job : dict or str
+            The job resource returned when the job was inserted, or a job id
+
+        Returns
+        -------
+        BigQueryJobFuture
+        """
+
+        future = BigQueryJobFuture(self.client, job)
+
+        with self._condition:
+            self._futures.setdefault(future.job_id, []).append(future)
+            self._delay = self.initial_interval
+            self._woken = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify()
+
+        return future
+
+    def _run(self):
+        """Poll outstanding jobs until there are none left."""
+
+        worker, = self.client._acquire_worker_clients(1)
+        try:
+            while self._poll(worker):
+                pass
+        finally:
+            self.client._release_worker_clients([worker])
+
+    def _poll(self, worker):
+        """Poll the outstanding jobs once and wait for the next round.
+        Return False, stopping the thread, once there are no jobs left.
+        """
+
+        with self._condition:
+            for job_id, futures in list(self._futures.items()):
+                futures = [f for f in futures if not f.cancelled()]
+                if futures:
+                    self._futures[job_id] = futures
+                else:
+                    del self._futures[job_id]
+
+            if not self._futures:
+                self._thread = None
+                return False
+
+            job_ids = list(self._futures)
+            self._woken = False
+
+        requests = [worker.bigquery.jobs().get(projectId=worker.project_id,
+                                               jobId=job_id)
+                    for job_id in job_ids]
+        try:
+            responses = worker._execute_batch(requests)
+        except Exception:
+            logger.exception('Failed to poll BigQuery jobs')
+            responses = []
+
+        for job_id, (job_resource, exception) in zip(job_ids, responses):
+            if exception is None and \
+                    job_resource.get('status', {}).get('state') != u'DONE':
+                continue
+
+            # The job may still be running, poll it again in the next round.
+            if _is_transient_http_error(exception):
+                logger.warning('Failed to poll BigQuery job %s: %s'
+                               % (job_id, exception))
+                continue
+
+            with self._condition:
+                futures = self._futures.pop(job_id, [])
+
+            for future in futures:
+                if exception is not None:
+                    future._complete(exception=exception)
+                else:
+                    future._resolve(job_resource)
+
+        with self._condition:
+            delay = min(self._delay * uniform(1 - WAIT_JITTER,
+                                              1 + WAIT_JITTER),
+                        self.interval)
+            self._delay = min(self._delay * WAIT_BACKOFF_FACTOR,
+                              self.interval)
+
+            # New jobs wake the thread up to be polled right away.
+            deadline = time() + delay
+            while self._futures and not self._woken:
+                remaining = deadline - time()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+        return True
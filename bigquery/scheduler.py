@@ -0,0 +1,303 @@
+from __future__ import absolute_import
+
+import copy
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+from logging import getLogger
+from time import time
+
+from bigquery.client import (JOB_PRIORITY_BATCH, JOB_PRIORITY_INTERACTIVE,
+                             _http_error_reason)
+from googleapiclient.errors import HttpError
+
+__all__ = ['JobScheduler']
+
+logger = getLogger(__name__)
+
+# Order in which jobs of each priority are dispatched.
+_PRIORITY_RANKS = {JOB_PRIORITY_INTERACTIVE: 0, JOB_PRIORITY_BATCH: 1}
+
+# Error reasons of jobs, and of failed jobs().insert requests, after which a
+# job is queued again.
+SCHEDULER_RETRY_REASONS = frozenset(['rateLimitExceeded'])
+
+# Longest delay, in seconds, before a rate-limited job is dispatched again.
+SCHEDULER_MAX_BACKOFF = 60
+
+
+class JobScheduler(object):
+    """Queue of BigQuery jobs that keeps at most `max_jobs` of them running.
+
+    Jobs are inserted by a background thread, ``INTERACTIVE`` jobs ahead of
+    ``BATCH`` ones and in submission order otherwise. Jobs that BigQuery
+    rejects because of rate limits, either when they are inserted or when
+    they fail, are queued again after an exponential backoff instead of
+    failing. Jobs that are retried after failing are given a new job id,
+    the original one followed by ``_<attempt>``.
+
+    Parameters
+    ----------
+    client : BigQueryClient
+        The client of the project to run the jobs in. The thread inserts
+        jobs with a worker client of its own, so the client needs a
+        ``service_factory``, as ``get_client`` sets up.
+    max_jobs : int, optional
+        Maximum number of jobs running at once (default 10)
+    retry_backoff : float, optional
+        Delay, in seconds, before a rate-limited job is dispatched again. It
+        doubles with every attempt, up to a minute. Default 1.
+    max_requeues : int, optional
+        Number of times a job is queued again before its rate limit error is
+        raised. Jobs are queued again indefinitely by default.
+
+    Attributes
+    ----------
+    requeued : int
+        Number of times a job was queued again because of a rate limit
+
+    Raises
+    ------
+    ValueError
+        If the client has no ``service_factory``
+    """
+
+    def __init__(self, client, max_jobs=10, retry_backoff=1.0,
+                 max_requeues=None):
+        if client.service_factory is None:
+            raise ValueError('Scheduling jobs needs a client with a '
+                             'service_factory')
+
+        self.client = client
+        self.max_jobs = max_jobs
+        self.retry_backoff = retry_backoff
+        self.max_requeues = max_requeues
+        self.requeued = 0
+
+        self._queue = []
+        self._delayed = []
+        self._running = 0
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    @property
+    def pending(self):
+        """Number of jobs waiting to be dispatched."""
+        return len(self._queue) + len(self._delayed)
+
+    @property
+    def running(self):
+        """Number of dispatched jobs that are not done."""
+        return self._running
+
+    def submit(self, body, priority=None):
+        """Queue a job.
+
+        Parameters
+        ----------
+        body : dict
+            The job resource to insert, with a query, load, extract or copy
+            ``configuration``
+        priority : str, optional
+            One of the JOB_PRIORITY_* constants. Defaults to the priority of
+            a query job, and to ``JOB_PRIORITY_INTERACTIVE``. It is set on
+            query jobs that have no priority of their own; other jobs only
+            use it to order the queue.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            A future whose result is the final job resource. It raises
+            ``JobInsertException`` or ``JobExecutingException`` if the job
+            could not be inserted or failed, and can be cancelled until the
+            job is dispatched.
+
+        Raises
+        ------
+        ValueError
+            If `priority` is unknown or differs from the priority of the
+            query job
+        """
+
+        query = body.get('configuration', {}).get('query')
+        query_priority = query.get('priority') if query else None
+
+        if priority is None:
+            priority = query_priority or JOB_PRIORITY_INTERACTIVE
+        elif query_priority not in (None, priority):
+            raise ValueError('Job priority %s conflicts with the query '
+                             'priority %s' % (priority, query_priority))
+        elif query is not None and query_priority is None:
+            body = copy.deepcopy(body)
+            body['configuration']['query']['priority'] = priority
+
+        if priority not in _PRIORITY_RANKS:
+            raise ValueError('Unknown job priority: %s' % priority)
+
+        future = Future()
+        with self._condition:
+            heapq.heappush(self._queue, (_PRIORITY_RANKS[priority],
+                                         next(self._counter), body, 0,
+                                         future))
+            self._start()
+
+        return future
+
+    def _start(self):
+        """Start the dispatch thread if needed. Requires the condition."""
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+        self._condition.notify()
+
+    def _run(self):
+        """Dispatch queued jobs until there are none left."""
+
+        worker, = self.client._acquire_worker_clients(1)
+        try:
+            while True:
+                job = self._next_job()
+                if job is None:
+                    return
+                self._dispatch(worker, *job)
+        finally:
+            self.client._release_worker_clients([worker])
+
+    def _next_job(self):
+        """Wait until a job can be dispatched and return it, or return None
+        and stop the thread if the queue is empty.
+        """
+
+        with self._condition:
+            while True:
+                now = time()
+                while self._delayed and self._delayed[0][0] <= now:
+                    heapq.heappush(self._queue,
+                                   heapq.heappop(self._delayed)[1])
+
+                while self._queue and self._queue[0][-1].cancelled():
+                    heapq.heappop(self._queue)
+
+                if not self._queue and not self._delayed:
+                    self._thread = None
+                    return None
+
+                if self._queue and self._running < self.max_jobs:
+                    job = heapq.heappop(self._queue)
+                    # Futures of requeued jobs are already running.
+                    attempt, future = job[-2:]
+                    if attempt or future.set_running_or_notify_cancel():
+                        self._running += 1
+                        return job
+                    continue
+
+                timeout = self._delayed[0][0] - now if self._delayed \
+                    else None
+                self._condition.wait(timeout)
+
+    def _dispatch(self, worker, rank, sequence, body, attempt, future):
+        """Insert a job and have the client's job poller track it."""
+
+        job_resource = None
+        try:
+            job_resource = worker._insert_job(_job_attempt(body, attempt))
+            worker._raise_insert_exception_if_error(job_resource)
+        except Exception as e:
+            self._finish(rank, sequence, body, attempt, future, exception=e,
+                         reason=_insert_error_reason(e, job_resource))
+            return
+
+        job_future = self.client.job_future(job_resource)
+        job_future.add_done_callback(
+            lambda job_future: self._job_done(rank, sequence, body, attempt,
+                                              future, job_future))
+
+    def _job_done(self, rank, sequence, body, attempt, future, job_future):
+        """Resolve the future of a job once BigQuery reports it done."""
+
+        exception = job_future.exception()
+        if exception is None:
+            self._finish(rank, sequence, body, attempt, future,
+                         result=job_future.result())
+            return
+
+        # Only jobs that BigQuery reports as failed are retried. The job of
+        # a failed status request may still be running.
+        self._finish(rank, sequence, body, attempt, future,
+                     exception=exception,
+                     reason=_job_error_reason(job_future.job_resource))
+
+    def _finish(self, rank, sequence, body, attempt, future, result=None,
+                exception=None, reason=None):
+        """Release the slot of a job, and resolve its future unless it is
+        queued again.
+        """
+
+        requeue = reason in SCHEDULER_RETRY_REASONS and (
+            self.max_requeues is None or attempt < self.max_requeues)
+
+        with self._condition:
+            self._running -= 1
+            if requeue:
+                self.requeued += 1
+                delay = min(self.retry_backoff * 2 ** attempt,
+                            SCHEDULER_MAX_BACKOFF)
+                heapq.heappush(self._delayed, (
+                    time() + delay,
+                    (rank, sequence, body, attempt + 1, future)))
+                logger.warning('Job rate limited, retrying in %.1fs: %s'
+                               % (delay, exception))
+            if requeue or self._queue:
+                self._start()
+
+        if requeue:
+            return
+
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+
+def _insert_error_reason(exception, job_resource):
+    """Return the reason of the error that made the insert of a job fail, if
+    known.
+    """
+
+    if isinstance(exception, HttpError):
+        reason = _http_error_reason(exception)
+        if reason is None and exception.resp.status == 429:
+            return 'rateLimitExceeded'
+        return reason
+
+    status = (job_resource or {}).get('status') or {}
+    return (status.get('errorResult') or {}).get('reason')
+
+
+def _job_error_reason(job_resource):
+    """Return the reason of the error that made a job fail, if BigQuery
+    reports it done.
+    """
+
+    status = (job_resource or {}).get('status') or {}
+    if status.get('state') != u'DONE':
+        return None
+    return (status.get('errorResult') or {}).get('reason')
+
+
+def _job_attempt(body, attempt):
+    """Return the job resource to insert for an attempt. Job ids can not be
+    reused, even by jobs that failed, so retries get a new one.
+    """
+
+    job_id = (body.get('jobReference') or {}).get('jobId')
+    if not attempt or not job_id:
+        return body
+
+    body = copy.deepcopy(body)
+    body['jobReference']['jobId'] = '%s_%d' % (job_id, attempt)
+    return body
@@ -0,0 +1,248 @@
+from __future__ import absolute_import
+
+import json
+import threading
+import zlib
+
+from googleapiclient.model import JsonModel
+
+__all__ = ['JsonFragment', 'Serializer', 'SerializerModel']
+
+# Encoder libraries in order of preference.
+_LIBRARIES = ('orjson', 'ujson', 'json')
+
+
+def _stdlib_dumps(value):
+    return json.dumps(value).encode('utf-8')
+
+
+def _load_library(name):
+    """Return the ``(dumps, loads)`` functions of an encoder library, with
+    `dumps` returning UTF-8 encoded bytes. Raises ImportError if it is not
+    installed.
+    """
+
+    if name == 'json':
+        return _stdlib_dumps, json.loads
+
+    if name == 'orjson':
+        import orjson
+        return orjson.dumps, orjson.loads
+
+    if name == 'ujson':
+        import ujson
+
+        def dumps(value):
+            return ujson.dumps(value, ensure_ascii=False).encode('utf-8')
+
+        return dumps, ujson.loads
+
+    raise ValueError('Unknown JSON library: %s' % name)
+
+
+class JsonFragment(object):
+    """A JSON value that was serialized ahead of time. Request bodies copy
+    the bytes of a fragment as they are instead of encoding it again.
+
+    Parameters
+    ----------
+    data : bytes
+        The UTF-8 encoded JSON value
+    """
+
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def decode(self):
+        """Return the value of the fragment."""
+        return json.loads(self.data.decode('utf-8'))
+
+    def __len__(self):
+        return len(self.data)
+
+    def __eq__(self, other):
+        return isinstance(other, JsonFragment) and self.data == other.data
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'JsonFragment(%r)' % self.data
+
+
+class Serializer(object):
+    """JSON encoder for request bodies.
+
+    The fastest installed library among orjson, ujson and the standard
+    library ``json`` module is used unless `library` names one. Elements of
+    the top-level ``rows`` list of a body (as in insertAll requests) may be
+    `JsonFragment` objects, which are spliced into the output without being
+    encoded again.
+
+    Parameters
+    ----------
+    library : str, optional
+        ``'orjson'``, ``'ujson'`` or ``'json'``. Raises ImportError if the
+        library is not installed.
+    """
+
+    def __init__(self, library=None):
+        if library is None:
+            for library in _LIBRARIES:
+                try:
+                    self._dumps, self.loads = _load_library(library)
+                    break
+                except ImportError:
+                    continue
+        else:
+            self._dumps, self.loads = _load_library(library)
+
+        self.library = library
+
+    def dumps(self, value):
+        """Serialize `value`, splicing in the fragments of its ``rows``.
+
+        Parameters
+        ----------
+        value : object
+            The request body
+
+        Returns
+        -------
+        bytes
+            The UTF-8 encoded JSON
+        """
+
+        rows = value.get('rows') if isinstance(value, dict) else None
+        if not rows or not isinstance(rows, list) or \
+                not any(isinstance(row, JsonFragment) for row in rows):
+            return self._dumps(value)
+
+        dumps = self._dumps
+        head = dumps(dict((key, item) for key, item in value.items()
+                          if key != 'rows'))
+        separator = b',' if len(head) > 2 else b''
+        return b''.join([
+            head[:-1], separator, b'"rows":[',
+            b','.join([row.data if isinstance(row, JsonFragment)
+                       else dumps(row) for row in rows]),
+            b']}'])
+
+    def fragment(self, value):
+        """Serialize `value` ahead of time.
+
+        Returns
+        -------
+        JsonFragment
+        """
+
+        return JsonFragment(self._dumps(value))
+
+    def insert_row(self, row, insert_id=None):
+        """Serialize an insertAll request row ahead of time. The result can
+        be passed to `BigQueryClient.push_rows` in place of `row`.
+
+        Parameters
+        ----------
+        row : dict
+            The row to insert
+        insert_id : str, optional
+            The insertId of the row
+
+        Returns
+        -------
+        JsonFragment
+        """
+
+        each_row = {'json': row}
+        if insert_id is not None:
+            each_row['insertId'] = insert_id
+        return self.fragment(each_row)
+
+
+class SerializerModel(JsonModel):
+    """googleapiclient model that encodes and decodes JSON bodies with a
+    `Serializer`, optionally gzip-compressing large request bodies.
+
+    A model can be shared by several services, from several threads.
+
+    Parameters
+    ----------
+    serializer : Serializer
+        The serializer to use
+    gzip_threshold : int, optional
+        Request bodies of at least this many bytes are sent gzip-compressed
+        with ``Content-Encoding: gzip``. Bodies are not compressed by
+        default.
+    gzip_level : int, optional
+        zlib compression level, from 1 (fastest) to 9 (smallest). Default 6.
+    """
+
+    def __init__(self, serializer, gzip_threshold=None, gzip_level=6):
+        super(SerializerModel, self).__init__(data_wrapper=False)
+        self.serializer = serializer
+        self.gzip_threshold = gzip_threshold
+        self.gzip_level = gzip_level
+
+        self._requests = 0
+        self._compressed_requests = 0
+        self._body_bytes = 0
+        self._sent_bytes = 0
+        self._lock = threading.Lock()
+
+    def request(self, *args, **kwargs):
+        headers, path_params, query, body = super(
+            SerializerModel, self).request(*args, **kwargs)
+
+        if body is None:
+            return headers, path_params, query, body
+
+        size = len(body)
+        compressed = self.gzip_threshold is not None and \
+            size >= self.gzip_threshold
+        if compressed:
+            # A wbits offset of 16 writes a gzip header and trailer.
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED,
+                                          16 + zlib.MAX_WBITS)
+            body = compressor.compress(body) + compressor.flush()
+            headers['content-encoding'] = 'gzip'
+
+        with self._lock:
+            self._requests += 1
+            self._compressed_requests += compressed
+            self._body_bytes += size
+            self._sent_bytes += len(body)
+
+        return headers, path_params, query, body
+
+    def metrics(self):
+        """Return the request body counters.
+
+        Returns
+        -------
+        dict
+            ``requests`` and ``compressed_requests`` count the requests with
+            a body, ``body_bytes`` is the size of the encoded bodies,
+            ``sent_bytes`` their size on the wire and ``saved_bytes`` the
+            difference.
+        """
+
+        with self._lock:
+            return {
+                'requests': self._requests,
+                'compressed_requests': self._compressed_requests,
+                'body_bytes': self._body_bytes,
+                'sent_bytes': self._sent_bytes,
+                'saved_bytes': self._body_bytes - self._sent_bytes
+            }
+
+    def serialize(self, body_value):
+        return self.serializer.dumps(body_value)
+
+    def deserialize(self, content):
+        try:
+            return self.serializer.loads(content)
+        except ValueError:
+            return super(SerializerModel, self).deserialize(content)
@@ -0,0 +1,266 @@
+from __future__ import absolute_import
+
+import json
+import os
+import re
+import threading
+import uuid
+from logging import getLogger
+
+from bigquery.serializer import JsonFragment
+
+__all__ = ['InsertSpool']
+
+logger = getLogger(__name__)
+
+_SEGMENT = re.compile(r'^(\d{20})\.ndjson$')
+
+
+class InsertSpool(object):
+    """Append-only on-disk log of rows that could not be inserted.
+
+    Every spooled insertAll batch is written as one JSON line to the current
+    segment file in `directory`. A new segment is started once the current
+    one holds `segment_bytes` bytes, so that a large backlog is spread over
+    many files and can be replayed without reading it into memory. Writes
+    are fsynced after every `sync_every` batches, and on `sync` and
+    `close`.
+
+    Rows are given a random insertId when they are spooled without one, so
+    that BigQuery de-duplicates rows sent again by an interrupted `replay`.
+
+    Parameters
+    ----------
+    directory : str
+        Directory holding the segment files. It is created if needed.
+    segment_bytes : int, optional
+        Size, in bytes, after which a new segment is started (default 64MB).
+    sync_every : int, optional
+        Number of batches written between two fsyncs (default 100). Batches
+        written since the last fsync can be lost if the machine crashes.
+
+    Attributes
+    ----------
+    spooled_rows : int
+        Number of rows written to the spool
+    replayed_rows : int
+        Number of rows inserted by `replay`
+    discarded_rows : int
+        Number of rows dropped by `replay` because BigQuery rejected them
+        permanently
+    """
+
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024,
+                 sync_every=100):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.sync_every = sync_every
+
+        self.spooled_rows = 0
+        self.replayed_rows = 0
+        self.discarded_rows = 0
+
+        self._file = None
+        self._unsynced = 0
+        self._lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+
+        segments = self.segments()
+        self._next_segment = self._segment_number(segments[-1]) + 1 \
+            if segments else 0
+
+    def segments(self):
+        """Return the paths of the segment files, oldest first."""
+
+        names = sorted(name for name in os.listdir(self.directory)
+                       if _SEGMENT.match(name))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def append(self, dataset, table, rows_data, options=None):
+        """Write an insertAll batch to the spool.
+
+        Parameters
+        ----------
+        dataset : str
+            The dataset the rows belong to
+        table : str
+            The table the rows belong to
+        rows_data : list
+            The request rows, with the row in ``json`` and an optional
+            ``insertId``, or pre-serialized as ``JsonFragment`` objects
+        options : dict, optional
+            Additional properties of the insertAll request body
+        """
+
+        rows_data = [row.decode() if isinstance(row, JsonFragment) else row
+                     for row in rows_data]
+        rows_data = [row if 'insertId' in row else
+                     dict(row, insertId=uuid.uuid4().hex)
+                     for row in rows_data]
+        record = {
+            'dataset': dataset,
+            'table': table,
+            'options': options or {},
+            'rows': rows_data
+        }
+        line = (json.dumps(record, separators=(',', ':')) + '\n').encode(
+            'utf-8')
+
+        with self._lock:
+            if self._file is None or self._file.tell() >= self.segment_bytes:
+                self._open_segment()
+
+            self._file.write(line)
+            self.spooled_rows += len(rows_data)
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every:
+                self._sync()
+
+    def sync(self):
+        """Flush the current segment to disk."""
+
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        """Sync and close the current segment."""
+
+        with self._lock:
+            self._close_segment()
+
+    def replay(self, client):
+        """Insert the spooled batches in the order they were written.
+
+        Segments are deleted once all of their batches were inserted.
+        Replay stops at the first batch that fails with a transient error,
+        leaving it and the following batches in the spool for the next
+        replay. Rows that BigQuery rejects permanently are logged and
+        dropped.
+
+        Parameters
+        ----------
+        client : BigQueryClient
+            The client to insert the rows with
+
+        Returns
+        -------
+        bool
+            True if the spool was drained, False if replay stopped early.
+        """
+
+        with self._replay_lock:
+            # Batches appended from now on go to a new segment, which the
+            # next replay picks up.
+            with self._lock:
+                self._close_segment()
+                segments = self.segments()
+
+            for path in segments:
+                if not self._replay_segment(client, path):
+                    return False
+
+        return True
+
+    def __len__(self):
+        return len(self.segments())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _replay_segment(self, client, path):
+        """Insert the batches of a segment and delete it, returning False if
+        a batch must be retried. The position of the first batch that was not
+        inserted is kept in a checkpoint file, where the next replay resumes.
+        """
+
+        checkpoint = path + '.offset'
+        start = offset = 0
+        if os.path.exists(checkpoint):
+            with open(checkpoint) as checkpoint_file:
+                start = offset = int(checkpoint_file.read() or 0)
+
+        try:
+            with open(path, 'rb') as segment:
+                segment.seek(offset)
+                for line in segment:
+                    if not line.endswith(b'\n'):
+                        logger.warning('Skipping truncated record in %s'
+                                       % path)
+                        break
+
+                    record = json.loads(line.decode('utf-8'))
+                    if not self._replay_record(client, record):
+                        return False
+                    offset += len(line)
+
+                offset = None
+        finally:
+            if offset is not None and offset != start:
+                self._write_checkpoint(checkpoint, offset)
+
+        os.remove(path)
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        return True
+
+    def _write_checkpoint(self, checkpoint, offset):
+        """Atomically record the replay position of a segment."""
+
+        temporary = checkpoint + '.tmp'
+        with open(temporary, 'w') as checkpoint_file:
+            checkpoint_file.write(str(offset))
+        os.rename(temporary, checkpoint)
+
+    def _replay_record(self, client, record):
+        """Insert a spooled batch, returning False if it must be retried."""
+
+        rows_data = record['rows']
+        insert_errors = client._insert_rows_data(
+            client.bigquery.tabledata(), record['dataset'], record['table'],
+            rows_data, record['options'])
+
+        failed = dict((error.get('index'), error) for error in insert_errors)
+        if any(client._is_retryable_insert_error(error)
+               for error in failed.values()):
+            logger.warning('Stopped replaying spooled rows into %s.%s: %s'
+                           % (record['dataset'], record['table'],
+                              insert_errors))
+            return False
+
+        if failed:
+            logger.error('Discarding %d spooled rows rejected by %s.%s: %s'
+                         % (len(failed), record['dataset'], record['table'],
+                            insert_errors))
+
+        self.discarded_rows += len(failed)
+        self.replayed_rows += len(rows_data) - len(failed)
+        return True
+
+    def _open_segment(self):
+        self._close_segment()
+        path = os.path.join(self.directory,
+                            '%020d.ndjson' % self._next_segment)
+        self._next_segment += 1
+        self._file = open(path, 'ab')
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._file = None
+
+    def _sync(self):
+        if self._file is not None and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    @staticmethod
+    def _segment_number(path):
+        return int(_SEGMENT.match(os.path.basename(path)).group(1))
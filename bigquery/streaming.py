@@ -0,0 +1,637 @@
+from __future__ import absolute_import
+
+import atexit
+import json
+import threading
+from collections import OrderedDict, deque
+from logging import getLogger
+from time import time
+
+from bigquery.client import INSERT_MAX_BYTES
+from bigquery.errors import InsertQueueFullException
+
+__all__ = ['BackgroundInserter', 'RoutingInserter', 'StreamingInserter',
+           'QUEUE_BLOCK', 'QUEUE_DROP_OLDEST', 'QUEUE_RAISE']
+
+logger = getLogger(__name__)
+
+# What BackgroundInserter.insert does when the queue is full.
+QUEUE_BLOCK = 'block'
+QUEUE_DROP_OLDEST = 'drop_oldest'
+QUEUE_RAISE = 'raise'
+
+# Background inserters that are still running, flushed at interpreter exit.
+_running_inserters = set()
+
+
+class StreamingInserter(object):
+    """Buffer rows for a table and stream them to BigQuery in batches.
+
+    Rows are sent through `BigQueryClient.push_rows` as soon as the buffer
+    holds `max_rows` rows or `max_bytes` bytes of JSON, when a row is added
+    after the oldest buffered row has waited `max_row_age` seconds, and on
+    `close`. Inserters can be used as context managers, which closes them on
+    exit.
+
+    All thresholds are only checked when rows are added, so rows buffered
+    before traffic stops wait until the next insert or `close`. Use a
+    `BackgroundInserter` to send rows within a bounded latency.
+
+    Parameters
+    ----------
+    client : BigQueryClient
+        The client to insert rows with
+    dataset : str
+        The dataset to upload to
+    table : str
+        The name of the table to insert rows into
+    max_rows : int, optional
+        Number of buffered rows that triggers a flush (default 500).
+    max_bytes : int, optional
+        Approximate JSON size of the buffered rows, in bytes, that triggers a
+        flush (default 5MB).
+    max_row_age : float, optional
+        Age, in seconds, of the oldest buffered row above which adding a row
+        triggers a flush. By default rows wait until another threshold is
+        hit.
+    insert_id_key : str, optional
+        Key for insertId in row, see `BigQueryClient.push_rows`
+    skip_invalid_rows : bool, optional
+        See `BigQueryClient.push_rows`
+    ignore_unknown_values : bool, optional
+        See `BigQueryClient.push_rows`
+    template_suffix : str, optional
+        See `BigQueryClient.push_rows`
+    serializer : bigquery.serializer.Serializer, optional
+        Serialize rows as they are added, so that flushing only joins the
+        encoded rows. Defaults to the serializer of the client; a client
+        without one decodes the rows again. Rows are sized with the
+        standard library ``json`` module when there is no serializer.
+
+    Attributes
+    ----------
+    rows_flushed : int
+        Number of rows sent to BigQuery
+    flushes : int
+        Number of insertAll batches sent
+    failed_flushes : int
+        Number of batches that were not inserted successfully
+    flush_time : float
+        Total seconds spent sending batches
+    last_flush_latency : float
+        Seconds the most recent batch took to send
+    """
+
+    def __init__(self, client, dataset, table, max_rows=500,
+                 max_bytes=5 * 1024 * 1024, max_row_age=None,
+                 insert_id_key=None, skip_invalid_rows=None,
+                 ignore_unknown_values=None, template_suffix=None,
+                 serializer=None):
+        self.client = client
+        self.dataset = dataset
+        self.table = table
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_row_age = max_row_age
+        self.insert_id_key = insert_id_key
+        self.skip_invalid_rows = skip_invalid_rows
+        self.ignore_unknown_values = ignore_unknown_values
+        self.template_suffix = template_suffix
+        self.serializer = serializer if serializer is not None \
+            else getattr(client, 'serializer', None)
+
+        self.rows_flushed = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.flush_time = 0.0
+        self.last_flush_latency = 0.0
+
+        self._rows = []
+        self._bytes = 0
+        self._oldest = None
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        """Number of rows waiting to be flushed."""
+        return len(self._rows)
+
+    @property
+    def buffered_bytes(self):
+        """Approximate JSON size of the buffered rows, in bytes."""
+        return self._bytes
+
+    @property
+    def rows_per_second(self):
+        """Rows inserted per second spent flushing."""
+        if not self.flush_time:
+            return 0.0
+        return self.rows_flushed / self.flush_time
+
+    def insert(self, row):
+        """Add a row to the buffer, flushing it if a threshold is reached.
+
+        Parameters
+        ----------
+        row : dict
+            The row to insert
+
+        Returns
+        -------
+        Union[bool, dict, None]
+            The result of `BigQueryClient.push_rows` if the buffer was
+            flushed, else None.
+        """
+
+        return self.insert_rows([row])
+
+    def insert_rows(self, rows):
+        """Add rows to the buffer, flushing it if a threshold is reached.
+
+        Parameters
+        ----------
+        rows : list
+            A ``list`` of rows (``dict`` objects) to insert
+
+        Returns
+        -------
+        Union[bool, dict, None]
+            The result of the last `BigQueryClient.push_rows` call if the
+            buffer was flushed, else None.
+        """
+
+        result = None
+
+        for row in rows:
+            row, size = self._prepare(row)
+
+            with self._lock:
+                if self._oldest is None:
+                    self._oldest = time()
+                self._rows.append(row)
+                self._bytes += size
+                due = self._flush_due()
+
+            if due:
+                result = self.flush()
+
+        return result
+
+    def flush(self):
+        """Send all buffered rows to BigQuery.
+
+        Returns
+        -------
+        Union[bool, dict, None]
+            The result of `BigQueryClient.push_rows`, or None if there was
+            nothing to send.
+        """
+
+        with self._lock:
+            rows = self._rows
+            size = self._bytes
+            self._rows = []
+            self._bytes = 0
+            self._oldest = None
+
+        if not rows:
+            return None
+
+        return self._push(rows, size)
+
+    def close(self):
+        """Flush the remaining rows."""
+        return self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _flush_due(self):
+        """Return True if the buffer has reached a flush threshold."""
+
+        if self.max_rows and len(self._rows) >= self.max_rows:
+            return True
+
+        if self.max_bytes and self._bytes >= self.max_bytes:
+            return True
+
+        return self.max_row_age is not None and \
+            time() - self._oldest >= self.max_row_age
+
+    def _prepare(self, row):
+        """Return the row to buffer, pre-serialized if the inserter has a
+        serializer, and its approximate serialized size in bytes.
+        """
+
+        if self.serializer is None:
+            return row, len(json.dumps(row))
+
+        insert_id = row[self.insert_id_key] \
+            if self.insert_id_key in row else None
+        row = self.serializer.insert_row(row, insert_id)
+        return row, len(row)
+
+    def _push(self, rows, size):
+        """Insert `rows`, of approximately `size` bytes, and record the flush
+        statistics.
+        """
+
+        # The rows were sized as they were buffered, so push_rows need not
+        # encode them again to find out whether they fit in one request.
+        max_bytes = None if size <= INSERT_MAX_BYTES else INSERT_MAX_BYTES
+
+        start = time()
+        result = self.client.push_rows(
+            self.dataset, self.table, rows,
+            insert_id_key=self.insert_id_key,
+            skip_invalid_rows=self.skip_invalid_rows,
+            ignore_unknown_values=self.ignore_unknown_values,
+            template_suffix=self.template_suffix,
+            max_bytes_per_request=max_bytes)
+        latency = time() - start
+        failed = result is False or (isinstance(result, dict) and
+                                     bool(result.get('insertErrors')))
+
+        with self._lock:
+            self.flushes += 1
+            self.rows_flushed += len(rows)
+            self.flush_time += latency
+            self.last_flush_latency = latency
+            if failed:
+                self.failed_flushes += 1
+
+        if failed:
+            logger.error('Failed to stream %d rows to %s.%s', len(rows),
+                         self.dataset, self.table)
+
+        logger.debug('Streamed %d rows to %s.%s in %.3fs', len(rows),
+                     self.dataset, self.table, latency)
+
+        return result
+
+
+class RoutingInserter(object):
+    """Stream rows to many tables, choosing the table of every row with a
+    routing function.
+
+    Every destination gets its own `StreamingInserter`, which flushes on its
+    own thresholds. Buffers are kept in least recently used order; the least
+    recently used ones are flushed and dropped when there are more than
+    `max_buffers`, when all buffers together exceed `max_total_bytes`, or
+    when they have not received a row for `max_idle` seconds.
+
+    Parameters
+    ----------
+    client : BigQueryClient
+        The client to insert rows with
+    route : function
+        Function taking a row and returning a ``(dataset, table,
+        template_suffix)`` tuple, where template_suffix may be None.
+    max_buffers : int, optional
+        Maximum number of destinations buffered at once (default 100).
+    max_total_bytes : int, optional
+        Approximate JSON size of the rows buffered for all destinations, in
+        bytes, above which buffers are flushed (default 64MB).
+    max_idle : float, optional
+        Seconds after which a buffer that received no rows is flushed and
+        dropped. Checked whenever rows are added. By default buffers are
+        kept until one of the other limits is hit.
+    **kwargs
+        Thresholds and insert options of every buffer, see
+        `StreamingInserter`
+
+    Attributes
+    ----------
+    evictions : int
+        Number of buffers flushed and dropped to respect the limits
+    """
+
+    def __init__(self, client, route, max_buffers=100,
+                 max_total_bytes=64 * 1024 * 1024, max_idle=None, **kwargs):
+        self.client = client
+        self.route = route
+        self.max_buffers = max_buffers
+        self.max_total_bytes = max_total_bytes
+        self.max_idle = max_idle
+        self.options = kwargs
+        self.evictions = 0
+
+        # (dataset, table, suffix) -> (inserter, last use), least recently
+        # used first.
+        self._buffers = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+    @property
+    def buffered_bytes(self):
+        """Approximate JSON size of the rows buffered for all destinations,
+        in bytes.
+        """
+        return self._bytes
+
+    @property
+    def destinations(self):
+        """The ``(dataset, table, template_suffix)`` tuples currently
+        buffered, least recently used first.
+        """
+        return list(self._buffers)
+
+    def insert(self, row):
+        """Route a row to the buffer of its destination.
+
+        Parameters
+        ----------
+        row : dict
+            The row to insert
+        """
+
+        self.insert_rows([row])
+
+    def insert_rows(self, rows):
+        """Route rows to the buffers of their destinations.
+
+        Parameters
+        ----------
+        rows : list
+            A ``list`` of rows (``dict`` objects) to insert
+        """
+
+        with self._lock:
+            for row in rows:
+                destination = self.route(row)
+                inserter = self._buffer(destination)
+
+                before = inserter.buffered_bytes
+                inserter.insert(row)
+                self._bytes += inserter.buffered_bytes - before
+
+                while self._buffers and (
+                        len(self._buffers) > self.max_buffers or
+                        self._bytes > self.max_total_bytes):
+                    self._evict()
+
+            if self.max_idle is not None:
+                idle = time() - self.max_idle
+                while self._buffers and \
+                        next(iter(self._buffers.values()))[1] <= idle:
+                    self._evict()
+
+    def flush(self):
+        """Flush the buffers of all destinations."""
+
+        with self._lock:
+            for inserter, _ in self._buffers.values():
+                inserter.flush()
+            self._bytes = 0
+
+    def close(self):
+        """Flush and drop the buffers of all destinations."""
+
+        with self._lock:
+            self.flush()
+            self._buffers.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _buffer(self, destination):
+        """Return the inserter of a destination, marking it as the most
+        recently used.
+        """
+
+        entry = self._buffers.pop(destination, None)
+        if entry is None:
+            dataset, table, template_suffix = destination
+            inserter = StreamingInserter(
+                self.client, dataset, table, template_suffix=template_suffix,
+                **self.options)
+        else:
+            inserter = entry[0]
+
+        self._buffers[destination] = (inserter, time())
+        return inserter
+
+    def _evict(self):
+        """Flush and drop the least recently used buffer."""
+
+        destination = next(iter(self._buffers))
+        inserter, _ = self._buffers.pop(destination)
+        self._bytes -= inserter.buffered_bytes
+        inserter.flush()
+        self.evictions += 1
+
+
+class BackgroundInserter(StreamingInserter):
+    """Queue rows for a table and stream them to BigQuery from a background
+    thread, so that adding rows never waits for the network.
+
+    A daemon thread takes batches of up to `max_rows` rows or `max_bytes`
+    bytes off the queue and sends them through `BigQueryClient.push_rows`.
+    A batch is sent once it is full, or once its oldest row has waited
+    `max_latency` seconds. The queue holds at most `max_queue_bytes` bytes of
+    rows; `full_policy` decides what happens when a row does not fit. Rows
+    still queued are flushed on `close`, and at interpreter exit for
+    inserters that were not closed.
+
+    Parameters
+    ----------
+    client : BigQueryClient
+        The client to insert rows with. It is only used from the background
+        thread.
+    dataset : str
+        The dataset to upload to
+    table : str
+        The name of the table to insert rows into
+    max_latency : float, optional
+        Seconds a queued row may wait before it is sent (default 1).
+    max_queue_bytes : int, optional
+        Approximate JSON size of the queued rows, in bytes, above which the
+        queue is full (default 64MB).
+    full_policy : str, optional
+        ``QUEUE_BLOCK`` to wait for room in the queue (the default),
+        ``QUEUE_DROP_OLDEST`` to discard the oldest queued rows, or
+        ``QUEUE_RAISE`` to raise ``InsertQueueFullException``.
+    **kwargs
+        Batch size and insert options, see `StreamingInserter`
+
+    Attributes
+    ----------
+    dropped_rows : int
+        Number of rows discarded because the queue was full
+    """
+
+    def __init__(self, client, dataset, table, max_latency=1.0,
+                 max_queue_bytes=64 * 1024 * 1024, full_policy=QUEUE_BLOCK,
+                 **kwargs):
+        if full_policy not in (QUEUE_BLOCK, QUEUE_DROP_OLDEST, QUEUE_RAISE):
+            raise ValueError('Unknown full_policy: %s' % full_policy)
+
+        super(BackgroundInserter, self).__init__(client, dataset, table,
+                                                 **kwargs)
+        self.max_latency = max_latency
+        self.max_queue_bytes = max_queue_bytes
+        self.full_policy = full_policy
+        self.dropped_rows = 0
+
+        self._queue = deque()
+        self._condition = threading.Condition(self._lock)
+        self._sending = False
+        self._flushing = 0
+        self._blocked = 0
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        _running_inserters.add(self)
+
+    @property
+    def pending(self):
+        """Number of queued rows, including a batch being sent."""
+        return len(self._queue) + len(self._rows)
+
+    @property
+    def queued_bytes(self):
+        """Approximate JSON size of the queued rows, in bytes."""
+        return self._bytes
+
+    def insert_rows(self, rows):
+        """Queue rows to be inserted.
+
+        Parameters
+        ----------
+        rows : list
+            A ``list`` of rows (``dict`` objects) to insert
+
+        Raises
+        ------
+        InsertQueueFullException
+            If the queue is full and `full_policy` is ``QUEUE_RAISE``.
+        """
+
+        for row in rows:
+            row, size = self._prepare(row)
+
+            with self._condition:
+                if self._closed:
+                    raise ValueError('Insert into a closed inserter')
+
+                while self._queue and self._bytes + size > \
+                        self.max_queue_bytes:
+                    if self.full_policy == QUEUE_RAISE:
+                        raise InsertQueueFullException()
+                    if self.full_policy == QUEUE_DROP_OLDEST:
+                        self._bytes -= self._queue.popleft()[1]
+                        self.dropped_rows += 1
+                    else:
+                        self._blocked += 1
+                        self._condition.notify_all()
+                        self._condition.wait()
+                        self._blocked -= 1
+
+                self._queue.append((time(), size, row))
+                self._bytes += size
+                self._condition.notify_all()
+
+    def flush(self):
+        """Wait until every row queued so far has been sent."""
+
+        with self._condition:
+            self._flushing += 1
+            self._condition.notify_all()
+            try:
+                while self._queue or self._sending:
+                    self._condition.wait()
+            finally:
+                self._flushing -= 1
+
+    def close(self):
+        """Send the queued rows and stop the background thread."""
+
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+
+        self._thread.join()
+        _running_inserters.discard(self)
+
+    def _run(self):
+        """Send batches of queued rows until the inserter is closed."""
+
+        while True:
+            with self._condition:
+                while not self._batch_due():
+                    if self._closed and not self._queue:
+                        return
+                    self._condition.wait(self._time_to_batch())
+
+                rows = self._rows = []
+                size = 0
+                while self._queue and len(rows) < (self.max_rows or
+                                                   len(self._queue)):
+                    row_size = self._queue[0][1]
+                    if rows and self.max_bytes and \
+                            size + row_size > self.max_bytes:
+                        break
+                    rows.append(self._queue.popleft()[2])
+                    size += row_size
+
+                self._bytes -= size
+                self._sending = True
+                self._condition.notify_all()
+
+            try:
+                self._push(rows, size)
+            except Exception:
+                logger.exception('Failed to stream %d rows to %s.%s',
+                                 len(rows), self.dataset, self.table)
+                with self._condition:
+                    self.failed_flushes += 1
+            finally:
+                with self._condition:
+                    self._rows = []
+                    self._sending = False
+                    self._condition.notify_all()
+
+    def _batch_due(self):
+        """Return True if a batch should be taken off the queue."""
+
+        if not self._queue:
+            return False
+
+        if self._closed or self._flushing or self._blocked:
+            return True
+
+        if self.max_rows and len(self._queue) >= self.max_rows:
+            return True
+
+        if self.max_bytes and self._bytes >= self.max_bytes:
+            return True
+
+        return self._time_to_batch() == 0
+
+    def _time_to_batch(self):
+        """Return the seconds until the oldest queued row is due, or None to
+        wait for the next notification.
+        """
+
+        if not self._queue or self.max_latency is None:
+            return None
+
+        return max(self._queue[0][0] + self.max_latency - time(), 0)
+
+
+@atexit.register
+def _close_running_inserters():
+    """Flush the rows of background inserters that were not closed."""
+
+    for inserter in list(_running_inserters):
+        inserter.close()
@@ -0,0 +1,91 @@
+import threading
+from collections import defaultdict
+from time import sleep, time
+
+import mock
+from googleapiclient.errors import HttpError
+
+
+def wait_until(condition, timeout=5):
+    """Block until `condition()` is true, failing the test after `timeout`
+    seconds.
+    """
+
+    deadline = time() + timeout
+    while not condition():
+        if time() > deadline:
+            raise AssertionError('Timed out waiting for condition')
+        sleep(0.001)
+
+
+class FakeBatch(object):
+    """Stand-in for googleapiclient's BatchHttpRequest that executes the
+    requests added to it one by one.
+    """
+
+    def __init__(self, callback, batches):
+        self.callback = callback
+        self.requests = []
+        batches.append(self)
+
+    def add(self, request, callback=None, request_id=None):
+        self.requests.append((request, callback, request_id))
+
+    def execute(self):
+        for request, callback, request_id in self.requests:
+            try:
+                response, exception = request.execute(), None
+            except HttpError as e:
+                response, exception = None, e
+            (callback or self.callback)(request_id, response, exception)
+
+
+def fake_batches(service):
+    """Make a mock service create `FakeBatch` batch requests, and return the
+    list the batches are added to.
+    """
+
+    batches = []
+    service.new_batch_http_request.side_effect = \
+        lambda callback=None: FakeBatch(callback, batches)
+    return batches
+
+
+def fake_request(execute, *args):
+    """Return a mock API request whose execute() returns the result of
+    calling `execute` with `args`.
+    """
+
+    request = mock.Mock()
+    request.execute.side_effect = lambda: execute(*args)
+    return request
+
+
+class FakeJobs(object):
+    """Job states served by the jobs().get requests of a mock service.
+
+    `jobs` maps job ids to the number of polls after which the job is done
+    and its final status, or an exception to raise when it is polled.
+    `errors` maps job ids to exceptions raised by their next polls, one per
+    poll. `polls` counts the polls of every job.
+    """
+
+    def __init__(self, service):
+        self.jobs = {}
+        self.errors = defaultdict(list)
+        self.polls = defaultdict(int)
+        self._lock = threading.Lock()
+        service.jobs.return_value.get.side_effect = \
+            lambda projectId, jobId: fake_request(self._get, jobId)
+
+    def _get(self, job_id):
+        with self._lock:
+            self.polls[job_id] += 1
+            if self.errors[job_id]:
+                raise self.errors[job_id].pop(0)
+            polls, status = self.jobs[job_id]
+            if isinstance(status, Exception):
+                raise status
+            if self.polls[job_id] < polls:
+                status = {'state': u'RUNNING'}
+            return {'jobReference': {'jobId': job_id}, 'status': status}
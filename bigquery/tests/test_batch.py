@@ -0,0 +1,162 @@
+import unittest
+
+import mock
+from bigquery import client
+from bigquery.batch import MetadataBatch
+from bigquery.client import BATCH_MAX_REQUESTS
+from bigquery.tests.helpers import fake_batches, fake_request
+from googleapiclient.errors import HttpError
+from httplib2 import Response
+
+
+def http_error(status):
+    return HttpError(Response({'status': status}), b'There was an error')
+
+
+class TestMetadataBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.api_mock = mock.Mock()
+        self.batches = fake_batches(self.api_mock)
+        self.client = client.BigQueryClient(self.api_mock, 'project')
+
+        # Existing tables and datasets, and the status of failing requests.
+        self.tables = {('dataset', 'table'): {
+            'id': 'table', 'schema': {'fields': [{'name': 'foo'}]}}}
+        self.datasets = {'dataset': {'id': 'dataset'}}
+        self.errors = {}
+
+        tables = self.api_mock.tables.return_value
+        tables.get.side_effect = \
+            lambda projectId, datasetId, tableId: fake_request(
+                self.get, (datasetId, tableId), self.tables)
+        tables.delete.side_effect = \
+            lambda projectId, datasetId, tableId: fake_request(
+                self.get, (datasetId, tableId),
+                dict((key, {}) for key in self.tables))
+        self.api_mock.datasets.return_value.get.side_effect = \
+            lambda projectId, datasetId: fake_request(
+                self.get, datasetId, self.datasets)
+
+    def get(self, key, resources):
+        if key in self.errors:
+            raise http_error(self.errors[key])
+        if key not in resources:
+            raise http_error(404)
+        return resources[key]
+
+    def test_results(self):
+        """Ensure calls give the results of the client methods, in a single
+        batch request.
+        """
+
+        with self.client.batch() as batch:
+            self.assertIsInstance(batch, MetadataBatch)
+            futures = [
+                batch.get_table('dataset', 'table'),
+                batch.get_table('dataset', 'missing'),
+                batch.check_table('dataset', 'table'),
+                batch.check_table('dataset', 'missing'),
+                batch.get_table_schema('dataset', 'table'),
+                batch.get_table_schema('dataset', 'missing'),
+                batch.get_dataset('dataset'),
+                batch.get_dataset('missing'),
+                batch.check_dataset('dataset'),
+                batch.check_dataset('missing'),
+                batch.delete_table('dataset', 'table'),
+                batch.delete_table('dataset', 'missing')
+            ]
+            self.assertFalse(any(future.done() for future in futures))
+
+        self.assertEqual([future.result() for future in futures], [
+            self.tables[('dataset', 'table')], {},
+            True, False,
+            [{'name': 'foo'}], None,
+            {'id': 'dataset'}, {},
+            True, False,
+            True, False
+        ])
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual(len(self.batches[0].requests), len(futures))
+
+    def test_results_match_client(self):
+        """Ensure batched calls agree with the client methods."""
+
+        calls = [
+            ('get_table', ('dataset', 'table')),
+            ('get_table', ('dataset', 'missing')),
+            ('check_table', ('dataset', 'missing')),
+            ('get_dataset', ('missing',)),
+            ('check_dataset', ('dataset',)),
+        ]
+
+        with self.client.batch() as batch:
+            futures = [getattr(batch, name)(*args) for name, args in calls]
+
+        for (name, args), future in zip(calls, futures):
+            self.assertEqual(future.result(),
+                             getattr(self.client, name)(*args))
+
+    def test_delete_table_without_swallowing_results(self):
+        """Ensure delete_table gives the response, or an empty dict, when
+        the client does not swallow results.
+        """
+
+        self.client.swallow_results = False
+
+        with self.client.batch() as batch:
+            deleted = batch.delete_table('dataset', 'table')
+            missing = batch.delete_table('dataset', 'missing')
+
+        self.assertEqual(deleted.result(), {})
+        self.assertEqual(missing.result(), {})
+
+    def test_get_table_schema_raises_other_errors(self):
+        """Ensure get_table_schema raises errors other than 404."""
+
+        self.errors[('dataset', 'table')] = 500
+
+        with self.client.batch() as batch:
+            future = batch.get_table_schema('dataset', 'table')
+
+        self.assertIsInstance(future.exception(), HttpError)
+
+    def test_batch_size_limit(self):
+        """Ensure calls are split into batch requests of the maximum size."""
+
+        with self.client.batch() as batch:
+            futures = [batch.check_table('dataset', 'table%d' % i)
+                       for i in range(BATCH_MAX_REQUESTS + 1)]
+
+        self.assertEqual([len(b.requests) for b in self.batches],
+                         [BATCH_MAX_REQUESTS, 1])
+        self.assertFalse(any(future.result() for future in futures))
+
+    def test_exception_in_block_cancels_calls(self):
+        """Ensure nothing is sent if the with block raises."""
+
+        future = None
+        try:
+            with self.client.batch() as batch:
+                future = batch.check_table('dataset', 'table')
+                raise ValueError()
+        except ValueError:
+            pass
+
+        self.assertTrue(future.cancelled())
+        self.assertFalse(self.batches)
+
+    def test_execute_error_is_set_on_futures(self):
+        """Ensure errors sending the batch request fail every call."""
+
+        error = IOError('connection reset')
+        self.api_mock.new_batch_http_request.side_effect = error
+
+        batch = self.client.batch()
+        futures = [batch.check_table('dataset', 'table'),
+                   batch.check_dataset('dataset')]
+
+        self.assertRaises(IOError, batch.execute)
+        self.assertEqual([future.exception() for future in futures],
+                         [error, error])
+        self.assertEqual(len(batch), 0)
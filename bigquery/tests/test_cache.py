@@ -0,0 +1,208 @@
+import json
+import threading
+import unittest
+
+import mock
+from bigquery.cache import QueryCache, SingleFlight, normalize_query
+from bigquery.tests.helpers import wait_until
+
+
+class TestNormalizeQuery(unittest.TestCase):
+
+    def test_whitespace_collapsed(self):
+        """Ensure formatting whitespace does not matter."""
+
+        self.assertEqual(normalize_query('  SELECT a,\n\tb  FROM t\n'),
+                         'SELECT a, b FROM t')
+
+    def test_literals_untouched(self):
+        """Ensure whitespace inside quotes is preserved."""
+
+        self.assertEqual(
+            normalize_query("SELECT  'a  b',\n\"c\\\"  d\"  FROM `my  t`"),
+            "SELECT 'a  b', \"c\\\"  d\" FROM `my  t`")
+
+    def test_comments_keep_newlines(self):
+        """Ensure the newline ending a line comment is kept, so that code
+        after it is not commented out.
+        """
+
+        self.assertEqual(normalize_query('SELECT 1  -- c\n  FROM t'),
+                         'SELECT 1 -- c\n FROM t')
+        self.assertEqual(normalize_query('SELECT 1 # c\nFROM t'),
+                         'SELECT 1 # c\nFROM t')
+        self.assertNotEqual(normalize_query('SELECT 1 -- c\nFROM t'),
+                            normalize_query('SELECT 1 -- c FROM t'))
+        self.assertEqual(normalize_query("SELECT '--  a'  FROM t"),
+                         "SELECT '--  a' FROM t")
+
+
+@mock.patch('bigquery.cache.time')
+class TestQueryCache(unittest.TestCase):
+
+    def test_hit_and_miss_counters(self, mock_time):
+        """Ensure lookups are counted."""
+
+        mock_time.return_value = 0
+        cache = QueryCache()
+
+        self.assertIsNone(cache.get('key'))
+        cache.set('key', 'value', 10)
+        self.assertEqual(cache.get('key'), 'value')
+
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_ttl(self, mock_time):
+        """Ensure entries expire after the ttl."""
+
+        cache = QueryCache(ttl=10)
+        mock_time.return_value = 100
+        cache.set('key', 'value', 10)
+
+        mock_time.return_value = 109
+        self.assertEqual(cache.get('key'), 'value')
+
+        mock_time.return_value = 110
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.size, 0)
+
+    def test_lru_eviction_by_size(self, mock_time):
+        """Ensure the least recently used entries are evicted first once the
+        size limit is exceeded.
+        """
+
+        mock_time.return_value = 0
+        cache = QueryCache(max_bytes=100)
+
+        cache.set('a', 1, 40)
+        cache.set('b', 2, 40)
+        cache.get('a')
+        cache.set('c', 3, 40)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.size, 80)
+
+        cache.set('huge', 4, 101)
+        self.assertIsNone(cache.get('huge'))
+
+    def test_key(self, mock_time):
+        """Ensure keys depend on the query text and every other property of
+        the request but its timeout.
+        """
+
+        key = QueryCache.make_key({'query': 'SELECT 1', 'maxResults': None})
+
+        self.assertEqual(
+            key, QueryCache.make_key({'query': ' SELECT\n1 ',
+                                      'timeoutMs': 1000}))
+        self.assertNotEqual(
+            key, QueryCache.make_key({'query': 'SELECT 1',
+                                      'useLegacySql': False}))
+        self.assertNotEqual(
+            key, QueryCache.make_key({'query': 'SELECT 1',
+                                      'maxResults': 10}))
+        self.assertNotEqual(
+            key, QueryCache.make_key({'query': 'SELECT 1'}, 'tuple'))
+        self.assertNotEqual(
+            key, QueryCache.make_key({'query': 'SELECT 1',
+                                      'defaultDataset': {'datasetId': 'd'}}))
+        self.assertNotEqual(
+            QueryCache.make_key({'query': 'SELECT @n', 'queryParameters': [
+                {'name': 'n', 'parameterValue': {'value': '1'}}]}),
+            QueryCache.make_key({'query': 'SELECT @n', 'queryParameters': [
+                {'name': 'n', 'parameterValue': {'value': '2'}}]}))
+
+    def test_estimate_size(self, mock_time):
+        """Ensure sizes are extrapolated from a sample of the rows."""
+
+        row = {'f': [{'v': 'x' * 10}]}
+        size = len(json.dumps([row]))
+
+        self.assertEqual(QueryCache.estimate_size([]), 0)
+        self.assertEqual(QueryCache.estimate_size([row] * 3),
+                         len(json.dumps([row] * 3)))
+
+        with mock.patch('bigquery.cache.json.dumps',
+                        wraps=json.dumps) as mock_dumps:
+            estimate = QueryCache.estimate_size([row] * 1000, sample=10)
+
+        self.assertEqual(len(mock_dumps.call_args[0][0]), 10)
+        self.assertAlmostEqual(estimate, size * 1000, delta=size * 10)
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def _run_concurrently(self, flight, key, func, count):
+        """Call flight.do(key, func) from `count` threads and return the
+        threads along with the list their results are appended to.
+        """
+
+        results = []
+
+        def call():
+            try:
+                results.append(flight.do(key, func))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def test_waiters_share_result(self):
+        """Ensure callers arriving during a call get its result instead of
+        calling again.
+        """
+
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return 'result'
+
+        leader = threading.Thread(target=flight.do, args=('key', slow))
+        leader.start()
+        self.assertTrue(started.wait(5))
+
+        func = mock.Mock(return_value='other')
+        threads, results = self._run_concurrently(flight, 'key', func, 3)
+        wait_until(lambda: flight.shared == 3)
+        release.set()
+        for thread in threads + [leader]:
+            thread.join()
+
+        self.assertEqual(results, ['result'] * 3)
+        self.assertFalse(func.called)
+        self.assertEqual(flight.do('key', lambda: 'again'), 'again')
+
+    def test_exception_shared(self):
+        """Ensure waiters receive the leader's exception."""
+
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def fail():
+            started.set()
+            release.wait(5)
+            raise ValueError('boom')
+
+        threads, results = self._run_concurrently(flight, 'key', fail, 1)
+        self.assertTrue(started.wait(5))
+        waiters, waiter_results = self._run_concurrently(
+            flight, 'key', mock.Mock(), 2)
+        wait_until(lambda: flight.shared == 2)
+        release.set()
+        for thread in threads + waiters:
+            thread.join()
+
+        for result in results + waiter_results:
+            self.assertIsInstance(result, ValueError)
@@ -1,12 +1,18 @@
+import socket
+import threading
 import unittest
+from time import sleep, time
 
 import mock
 import six
 from bigquery import client
+from bigquery.cache import QueryCache
 from bigquery.errors import (
     JobInsertException, JobExecutingException,
     BigQueryTimeoutException
 )
+from bigquery.serializer import Serializer, SerializerModel
+from bigquery.tests.helpers import FakeJobs, fake_batches
 from googleapiclient.errors import HttpError
 from nose.tools import raises
 
@@ -72,6 +78,56 @@ class TestGetClient(unittest.TestCase):
         self.assertEquals(mock_bq, bq_client.bigquery)
         self.assertEquals(project_id, bq_client.project_id)
 
+    @mock.patch('bigquery.client._credentials')
+    @mock.patch('bigquery.client.build')
+    def test_initialize_serializer(self, mock_build, mock_return_cred):
+        """Ensure services are built with a model using the serializer."""
+
+        mock_cred = mock.Mock()
+        mock_return_cred.return_value = mock_cred
+        serializer = Serializer('json')
+
+        bq_client = client.get_client(
+            'project', service_account='account', private_key='key',
+            serializer=serializer)
+        bq_client.service_factory()
+
+        self.assertEqual(mock_build.call_count, 2)
+        for call in mock_build.call_args_list:
+            self.assertIs(call[1]['model'].serializer, serializer)
+        self.assertIs(bq_client.serializer, serializer)
+
+    @mock.patch('bigquery.client._credentials')
+    @mock.patch('bigquery.client.build')
+    def test_initialize_gzip(self, mock_build, mock_return_cred):
+        """Ensure a gzip_threshold builds services sharing one compressing
+        model, whose counters are reported by the client.
+        """
+
+        mock_return_cred.return_value = mock.Mock()
+
+        bq_client = client.get_client(
+            'project', service_account='account', private_key='key',
+            gzip_threshold=1024)
+        bq_client.service_factory()
+
+        models = [call[1]['model'] for call in mock_build.call_args_list]
+        self.assertIs(models[0], models[1])
+        self.assertEqual(models[0].gzip_threshold, 1024)
+        self.assertEqual(bq_client.serializer.library, 'json')
+
+        models[0].request({}, {}, {}, {'rows': ['x' * 2048]})
+        metrics = bq_client.metrics()
+        self.assertEqual(metrics['compressed_requests'], 1)
+        self.assertGreater(metrics['saved_bytes'], 0)
+
+    def test_metrics_without_model(self):
+        """Ensure a client without a model reports no requests."""
+
+        bq_client = client.BigQueryClient(mock.Mock(), 'project')
+
+        self.assertEqual(bq_client.metrics()['requests'], 0)
+
     @mock.patch('bigquery.client._credentials')
     @mock.patch('bigquery.client.build')
     def test_initialize_read_write(self, mock_build, mock_return_cred):
@@ -444,6 +500,131 @@ class TestQuery(unittest.TestCase):
         self.assertEquals(results, [])
 
 
+class TestQueryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_bq_service = mock.Mock()
+        self.mock_job_collection = mock.Mock()
+        self.mock_bq_service.jobs.return_value = self.mock_job_collection
+
+        self.query_cache = QueryCache()
+        self.client = client.BigQueryClient(self.mock_bq_service, 'project',
+                                            query_cache=self.query_cache)
+
+        self.reply = _query_page([1, 2])
+        self.reply['jobReference'] = {'jobId': 'spiderman'}
+        self.mock_job_collection.query.return_value.execute.return_value = \
+            self.reply
+
+    def test_repeated_query_served_from_cache(self):
+        """Ensure an identical query is not submitted again."""
+
+        first = self.client.query('SELECT n FROM t', timeout=10)
+        second = self.client.query('SELECT  n\nFROM t', timeout=10)
+
+        self.assertEqual(first, ('spiderman', [{'n': 1}, {'n': 2}]))
+        self.assertEqual(second, first)
+        self.assertEqual(self.mock_job_collection.query.call_count, 1)
+        self.assertEqual(self.query_cache.hits, 1)
+        self.assertEqual(self.query_cache.misses, 1)
+
+    def test_incomplete_not_cached(self):
+        """Ensure results of unfinished async queries are not cached."""
+
+        self.reply['jobComplete'] = False
+
+        self.client.query('SELECT n FROM t')
+        self.client.query('SELECT n FROM t')
+
+        self.assertEqual(self.mock_job_collection.query.call_count, 2)
+        self.assertEqual(len(self.query_cache), 0)
+
+    def test_dry_run_not_cached(self):
+        """Ensure dry runs bypass the cache."""
+
+        self.client.query('SELECT n FROM t', dry_run=True)
+        self.client.query('SELECT n FROM t', dry_run=True)
+
+        self.assertEqual(self.mock_job_collection.query.call_count, 2)
+        self.assertEqual(self.query_cache.misses, 0)
+
+    def test_use_query_cache_false_not_cached(self):
+        """Ensure queries asking not to use cached results bypass the
+        cache.
+        """
+
+        query_data = {'query': 'SELECT n FROM t', 'useQueryCache': False}
+        self.client._submit_query_job(query_data)
+        self.client._submit_query_job(query_data)
+
+        self.assertEqual(self.mock_job_collection.query.call_count, 2)
+        self.assertEqual(len(self.query_cache), 0)
+        self.assertEqual(self.query_cache.misses, 0)
+
+    def test_query_parameters_in_key(self):
+        """Ensure queries differing only in their parameters or default
+        dataset do not share results.
+        """
+
+        base = {'query': 'SELECT n FROM t WHERE n = @n',
+                'useLegacySql': False, 'parameterMode': 'NAMED'}
+        for query_data in [
+                dict(base, queryParameters=[{'name': 'n', 'parameterValue':
+                                             {'value': '1'}}]),
+                dict(base, queryParameters=[{'name': 'n', 'parameterValue':
+                                             {'value': '2'}}]),
+                dict(base, defaultDataset={'datasetId': 'other'})]:
+            self.client._submit_query_job(query_data)
+
+        self.assertEqual(self.mock_job_collection.query.call_count, 3)
+        self.assertEqual(self.query_cache.hits, 0)
+
+
+class TestQuerySingleFlight(unittest.TestCase):
+
+    def test_concurrent_identical_queries_share_job(self):
+        """Ensure identical queries issued concurrently submit one job."""
+
+        mock_bq_service = mock.Mock()
+        started = threading.Event()
+        release = threading.Event()
+        reply = _query_page([1])
+        reply['jobReference'] = {'jobId': 'spiderman'}
+
+        def execute():
+            started.set()
+            release.wait(5)
+            return reply
+
+        mock_bq_service.jobs.return_value.query.return_value.execute = \
+            execute
+        bq = client.BigQueryClient(mock_bq_service, 'project',
+                                   single_flight=True)
+
+        results = []
+
+        def query():
+            results.append(bq.query('SELECT n FROM t', timeout=10))
+
+        leader = threading.Thread(target=query)
+        leader.start()
+        self.assertTrue(started.wait(5))
+
+        followers = [threading.Thread(target=query) for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        deadline = time() + 5
+        while bq.single_flight.shared < 3 and time() < deadline:
+            sleep(.001)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+
+        self.assertEqual(results, [('spiderman', [{'n': 1}])] * 4)
+        self.assertEqual(mock_bq_service.jobs.return_value.query.call_count,
+                         1)
+
+
 class TestGetQueryResults(unittest.TestCase):
 
     def setUp(self):
@@ -729,6 +910,200 @@ class TestWaitForJob(unittest.TestCase):
         self.assertEqual(self.api_mock.jobs().get().execute.call_count, 2)
         self.assertIsInstance(job_resource, dict)
 
+    @mock.patch('bigquery.client.uniform', return_value=1)
+    @mock.patch('bigquery.client.time')
+    @mock.patch('bigquery.client.sleep')
+    def test_adaptive_polling(self, mock_sleep, mock_time, mock_uniform):
+        """Ensure the job is polled immediately, then with exponentially
+        growing intervals up to the interval cap, and that the poll
+        statistics are reported.
+        """
+
+        clock = [1000.0]
+        mock_time.side_effect = lambda: clock[0]
+        mock_sleep.side_effect = lambda seconds: clock.__setitem__(
+            0, clock[0] + seconds)
+
+        running = {'status': {'state': u'RUNNING'}}
+        done = {'status': {'state': u'DONE'},
+                'statistics': {'endTime': str(int((1000 + 9) * 1000))}}
+        self.api_mock.jobs().get().execute.side_effect = \
+            [running] * 5 + [done]
+
+        job_resource = self.client.wait_for_job('testJob', interval=4,
+                                                timeout=60)
+
+        self.assertEqual([c[0][0] for c in mock_sleep.call_args_list],
+                         [0.5, 1, 2, 4, 4])
+        self.assertEqual(job_resource['pollStatistics'], {
+            'polls': 6, 'waitedSeconds': 11.5, 'wastedSeconds': 2.5})
+
+    @mock.patch('bigquery.client.uniform', return_value=1)
+    @mock.patch('bigquery.client.time')
+    @mock.patch('bigquery.client.sleep')
+    def test_polling_respects_timeout(self, mock_sleep, mock_time,
+                                      mock_uniform):
+        """Ensure the last wait is shortened to poll when timeout expires."""
+
+        clock = [1000.0]
+        mock_time.side_effect = lambda: clock[0]
+        mock_sleep.side_effect = lambda seconds: clock.__setitem__(
+            0, clock[0] + seconds)
+        self.api_mock.jobs().get().execute.return_value = {
+            'status': {'state': u'RUNNING'}}
+
+        self.assertRaises(BigQueryTimeoutException, self.client.wait_for_job,
+                          'testJob', interval=5, timeout=2)
+
+        self.assertEqual([c[0][0] for c in mock_sleep.call_args_list],
+                         [0.5, 1, 0.5])
+        self.assertEqual(self.api_mock.jobs().get().execute.call_count, 4)
+
+
+class TestWaitForJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.api_mock = mock.Mock()
+        self.batches = fake_batches(self.api_mock)
+        self.client = client.BigQueryClient(self.api_mock, 'project')
+        self.fake_jobs = FakeJobs(self.api_mock)
+
+        sleep_patcher = mock.patch('bigquery.client.sleep')
+        self.mock_sleep = sleep_patcher.start()
+        self.addCleanup(sleep_patcher.stop)
+
+    def test_iter_completed_jobs(self):
+        """Ensure jobs are yielded as they complete and only running jobs
+        are polled, in one batch per poll.
+        """
+
+        done = {'state': u'DONE'}
+        self.fake_jobs.jobs = {'a': (3, done), 'b': (1, done),
+                               'c': (2, done)}
+
+        completed = [job['jobReference']['jobId'] for job in
+                     self.client.iter_completed_jobs(
+                         ['a', {'jobReference': {'jobId': 'b'}}, 'c'])]
+
+        self.assertEqual(completed, ['b', 'c', 'a'])
+        self.assertEqual(dict(self.fake_jobs.polls),
+                         {'a': 3, 'b': 1, 'c': 2})
+        self.assertEqual([len(batch.requests) for batch in self.batches],
+                         [3, 2, 1])
+        self.assertEqual(self.mock_sleep.call_count, 2)
+
+    def test_wait_for_all_jobs(self):
+        """Ensure failed jobs are returned with the completed ones."""
+
+        failed = {'state': u'DONE', 'errorResult': {'reason': 'invalid'}}
+        self.fake_jobs.jobs = {'a': (2, {'state': u'DONE'}),
+                               'b': (1, failed)}
+
+        done, pending = self.client.wait_for_jobs(['a', 'b'])
+
+        self.assertEqual([job['status'] for job in done],
+                         [failed, {'state': u'DONE'}])
+        self.assertEqual(pending, [])
+
+    def test_wait_for_first_job(self):
+        """Ensure FIRST_COMPLETED and FIRST_EXCEPTION return early."""
+
+        failed = {'state': u'DONE', 'errorResult': {'reason': 'invalid'}}
+        self.fake_jobs.jobs = {'a': (1, {'state': u'DONE'}),
+                               'b': (2, failed),
+                               'c': (5, {'state': u'DONE'})}
+
+        done, pending = self.client.wait_for_jobs(
+            ['a', 'b', 'c'], return_when=client.WAIT_FIRST_COMPLETED)
+        self.assertEqual([job['jobReference']['jobId'] for job in done],
+                         ['a'])
+        self.assertEqual(pending, ['b', 'c'])
+
+        self.fake_jobs.polls.clear()
+        done, pending = self.client.wait_for_jobs(
+            ['a', 'b', 'c'], return_when=client.WAIT_FIRST_EXCEPTION)
+        self.assertEqual([job['jobReference']['jobId'] for job in done],
+                         ['a', 'b'])
+        self.assertEqual(pending, ['c'])
+
+    @mock.patch('bigquery.client.time')
+    def test_wait_for_jobs_timeout(self, mock_time):
+        """Ensure jobs still running at the timeout are pending."""
+
+        clock = [0]
+        mock_time.side_effect = lambda: clock[0]
+        self.mock_sleep.side_effect = lambda seconds: clock.__setitem__(
+            0, clock[0] + seconds)
+        self.fake_jobs.jobs = {'a': (1, {'state': u'DONE'}),
+                               'b': (100, {'state': u'DONE'})}
+
+        done, pending = self.client.wait_for_jobs(['a', 'b'], timeout=10)
+
+        self.assertEqual(len(done), 1)
+        self.assertEqual(pending, ['b'])
+        self.assertRaises(BigQueryTimeoutException, list,
+                          self.client.iter_completed_jobs(['b'], timeout=10))
+
+    def test_batches_limited(self):
+        """Ensure no batch holds more than BATCH_MAX_REQUESTS requests."""
+
+        self.fake_jobs.jobs = dict((str(n), (1, {'state': u'DONE'}))
+                                   for n in range(5))
+
+        with mock.patch('bigquery.client.BATCH_MAX_REQUESTS', 2):
+            done, pending = self.client.wait_for_jobs(
+                list(self.fake_jobs.jobs))
+
+        self.assertEqual(len(done), 5)
+        self.assertEqual([len(batch.requests) for batch in self.batches],
+                         [2, 2, 1])
+
+    def test_request_error(self):
+        """Ensure a failed jobs().get request is reported as a failed job
+        without ending the polling of the other jobs.
+        """
+
+        e = HttpError(HttpResponse(404), 'Not found'.encode('utf8'))
+        self.fake_jobs.jobs = {'a': (1, {'state': u'DONE'}), 'b': (1, e),
+                               'c': (2, {'state': u'DONE'})}
+
+        done, pending = self.client.wait_for_jobs(['a', 'b', 'c'])
+
+        self.assertEqual([job['jobReference']['jobId'] for job in done],
+                         ['a', 'b', 'c'])
+        self.assertEqual(done[1]['status'], {
+            'state': u'DONE',
+            'errorResult': {'reason': 'httperror', 'message': str(e)}})
+        self.assertEqual(pending, [])
+        self.assertEqual(self.fake_jobs.polls['b'], 1)
+
+    def test_transient_request_error(self):
+        """Ensure jobs whose jobs().get request failed with a server error
+        or a rate limit are polled again rather than reported as failed.
+        """
+
+        self.fake_jobs.jobs = {'a': (1, {'state': u'DONE'}),
+                               'b': (1, {'state': u'DONE'})}
+        self.fake_jobs.errors['a'] = [
+            HttpError(HttpResponse(503), 'Unavailable'.encode('utf8'))]
+        self.fake_jobs.errors['b'] = [HttpError(
+            HttpResponse(403),
+            b'{"error": {"errors": [{"reason": "rateLimitExceeded"}]}}')]
+
+        done, pending = self.client.wait_for_jobs(
+            ['a', 'b'], return_when=client.WAIT_FIRST_EXCEPTION)
+
+        self.assertEqual([job['status'] for job in done],
+                         [{'state': u'DONE'}, {'state': u'DONE'}])
+        self.assertEqual(pending, [])
+        self.assertEqual(dict(self.fake_jobs.polls), {'a': 2, 'b': 2})
+
+    def test_invalid_return_when(self):
+        """Ensure an unknown return_when is rejected."""
+
+        self.assertRaises(ValueError, self.client.wait_for_jobs, ['a'],
+                          return_when='ANY')
+
 
 class TestImportDataFromURIs(unittest.TestCase):
 
@@ -1537,6 +1912,259 @@ class TestGetQueryRows(unittest.TestCase):
                           job_id=123, offset=0, limit=0)
 
 
+def _query_page(values, page_token=None, job_complete=True):
+    """Build a getQueryResults reply with a single INTEGER column."""
+
+    reply = {
+        'jobComplete': job_complete,
+        'rows': [{'f': [{'v': str(value)}]} for value in values],
+        'schema': {'fields': [{'name': 'n', 'type': 'INTEGER'}]},
+    }
+    if page_token:
+        reply['pageToken'] = page_token
+    return reply
+
+
+@mock.patch('bigquery.client.BigQueryClient.get_query_results')
+class TestIterQueryRows(unittest.TestCase):
+
+    def setUp(self):
+        self.client = client.BigQueryClient(mock.Mock(), 'project')
+
+    def test_pages_fetched_lazily(self, get_query_mock):
+        """Ensure the next page is only requested once the current page has
+        been consumed.
+        """
+
+        get_query_mock.side_effect = [_query_page([1, 2], 'TOKEN'),
+                                      _query_page([3])]
+
+        rows = self.client.iter_query_rows(job_id=123)
+
+        self.assertEqual(next(rows), {'n': 1})
+        self.assertEqual(next(rows), {'n': 2})
+        self.assertEqual(get_query_mock.call_count, 1)
+
+        self.assertEqual(list(rows), [{'n': 3}])
+        self.assertEqual(get_query_mock.call_count, 2)
+        get_query_mock.assert_called_with(123, offset=None, limit=None,
+                                          page_token='TOKEN', timeout=0)
+
+    def test_limit_stops_paging(self, get_query_mock):
+        """Ensure no further pages are requested once limit is reached."""
+
+        get_query_mock.side_effect = [_query_page([1, 2], 'TOKEN2'),
+                                      _query_page([3, 4], 'TOKEN3'),
+                                      _query_page([5, 6])]
+
+        rows = list(self.client.iter_query_rows(job_id=123, offset=0,
+                                                limit=3))
+
+        self.assertEqual(rows, [{'n': 1}, {'n': 2}, {'n': 3}])
+        self.assertEqual(get_query_mock.call_count, 2)
+
+    def test_prefetch(self, get_query_mock):
+        """Ensure prefetching returns the same rows as sequential paging,
+        requesting the following pages from a worker client that is
+        released afterwards.
+        """
+
+        services = []
+
+        def service_factory():
+            services.append(mock.Mock())
+            return services[-1]
+
+        get_query_mock.side_effect = [_query_page([1, 2], 'TOKEN2'),
+                                      _query_page([3, 4], 'TOKEN3'),
+                                      _query_page([5])]
+        self.client.service_factory = service_factory
+
+        rows = self.client.get_query_rows(job_id=123, prefetch=2)
+
+        self.assertEqual(rows, [{'n': n} for n in range(1, 6)])
+        self.assertEqual(get_query_mock.call_count, 3)
+        self.assertEqual(len(services), 1)
+        self.assertEqual([worker.bigquery for worker
+                          in self.client._worker_clients], services)
+
+    @mock.patch('bigquery.client.prefetch_iterator')
+    def test_prefetch_without_service_factory(self, prefetch_mock,
+                                              get_query_mock):
+        """Ensure pages are fetched sequentially, from the caller's thread,
+        when no worker client can be created.
+        """
+
+        get_query_mock.side_effect = [_query_page([1], 'TOKEN2'),
+                                      _query_page([2])]
+
+        rows = self.client.get_query_rows(job_id=123, prefetch=2)
+
+        self.assertEqual(rows, [{'n': 1}, {'n': 2}])
+        self.assertFalse(prefetch_mock.called)
+
+    def test_row_type(self, get_query_mock):
+        """Ensure rows are decoded into the requested row type."""
+
+        get_query_mock.return_value = _query_page([1, 2])
+
+        rows = self.client.get_query_rows(job_id=123,
+                                          row_type=client.ROW_TYPE_TUPLE)
+
+        self.assertEqual(rows, [(1,), (2,)])
+
+    def test_query_incomplete(self, get_query_mock):
+        """Ensure an unfinished query raises before iteration starts."""
+
+        get_query_mock.return_value = _query_page([1], job_complete=False)
+
+        self.assertRaises(client.UnfinishedQueryException,
+                          self.client.iter_query_rows, job_id=123)
+
+
+@mock.patch('bigquery.client.BigQueryClient.get_query_results')
+class TestGetQueryColumns(unittest.TestCase):
+
+    def test_columns_across_pages(self, get_query_mock):
+        """Ensure every page is decoded into the same columns."""
+
+        get_query_mock.side_effect = [_query_page([1, 2], 'TOKEN'),
+                                      _query_page([3])]
+
+        bq = client.BigQueryClient(mock.Mock(), 'project')
+        columns = bq.get_query_columns(job_id=123)
+
+        self.assertEqual(list(columns), ['n'])
+        self.assertEqual(list(columns['n']), [1, 2, 3])
+
+    def test_query_incomplete(self, get_query_mock):
+        """Ensure an unfinished query raises UnfinishedQueryException."""
+
+        get_query_mock.return_value = _query_page([], job_complete=False)
+
+        bq = client.BigQueryClient(mock.Mock(), 'project')
+        self.assertRaises(client.UnfinishedQueryException,
+                          bq.get_query_columns, job_id=123)
+
+
+class TestGetQueryRowsParallel(unittest.TestCase):
+
+    def setUp(self):
+        self.services = []
+
+        def service_factory():
+            service = mock.Mock()
+            self.services.append(service)
+            return service
+
+        self.client = client.BigQueryClient(mock.Mock(), 'project',
+                                            service_factory=service_factory)
+
+    def _get_query_results(self, total_rows, page_size):
+        """Return a fake get_query_results serving `total_rows` rows in pages
+        of at most `page_size`.
+        """
+
+        calls = []
+
+        def get_query_results(bq, job_id, offset=None, limit=None,
+                              page_token=None, timeout=0):
+            calls.append((bq.bigquery, offset, limit, page_token))
+            start = int(page_token) if page_token else offset
+            count = min(page_size, limit, total_rows - start)
+            reply = _query_page(range(start, start + count))
+            reply['totalRows'] = str(total_rows)
+            if limit and count < limit and start + count < total_rows:
+                reply['pageToken'] = str(start + count)
+            return reply
+
+        return get_query_results, calls
+
+    def test_rows_reassembled_in_order(self):
+        """Ensure every range is fetched from its own service and the rows
+        are returned in order.
+        """
+
+        fake, calls = self._get_query_results(total_rows=103, page_size=10)
+
+        with mock.patch.object(client.BigQueryClient, 'get_query_results',
+                               autospec=True, side_effect=fake):
+            rows = self.client.get_query_rows_parallel(123, workers=4)
+
+        self.assertEqual(rows, [{'n': n} for n in range(103)])
+        self.assertEqual(len(self.services), 4)
+
+        window_starts = set(offset for _, offset, limit, page_token in calls
+                            if limit and not page_token)
+        self.assertEqual(window_starts, set([0, 26, 52, 78]))
+        window_services = set(service for service, _, limit, _ in calls
+                              if limit)
+        self.assertTrue(window_services.issubset(set(self.services)))
+
+    def test_offset_and_limit(self):
+        """Ensure offset and limit narrow the downloaded range."""
+
+        fake, calls = self._get_query_results(total_rows=100, page_size=50)
+
+        with mock.patch.object(client.BigQueryClient, 'get_query_results',
+                               autospec=True, side_effect=fake):
+            rows = self.client.get_query_rows_parallel(123, offset=10,
+                                                       limit=15, workers=2)
+
+        self.assertEqual(rows, [{'n': n} for n in range(10, 25)])
+
+    def test_worker_clients_reused(self):
+        """Ensure service objects are pooled between calls."""
+
+        fake, calls = self._get_query_results(total_rows=10, page_size=10)
+
+        with mock.patch.object(client.BigQueryClient, 'get_query_results',
+                               autospec=True, side_effect=fake):
+            self.client.get_query_rows_parallel(123, workers=2)
+            self.client.get_query_rows_parallel(123, workers=2)
+
+        self.assertEqual(len(self.services), 2)
+
+    def test_without_service_factory(self):
+        """Ensure ranges are downloaded one after another, never using the
+        client's service from two threads at once, without a factory.
+        """
+
+        fake, calls = self._get_query_results(total_rows=40, page_size=5)
+        in_flight = []
+        overlaps = []
+        lock = threading.Lock()
+
+        def exclusive(bq, *args, **kwargs):
+            with lock:
+                if bq.bigquery in in_flight:
+                    overlaps.append(bq.bigquery)
+                in_flight.append(bq.bigquery)
+            try:
+                sleep(0.005)
+                return fake(bq, *args, **kwargs)
+            finally:
+                with lock:
+                    in_flight.remove(bq.bigquery)
+
+        bq = client.BigQueryClient(mock.Mock(), 'project')
+        with mock.patch.object(client.BigQueryClient, 'get_query_results',
+                               autospec=True, side_effect=exclusive):
+            rows = bq.get_query_rows_parallel(123, workers=4)
+
+        self.assertEqual(rows, [{'n': n} for n in range(40)])
+        self.assertEqual(overlaps, [])
+
+    @mock.patch('bigquery.client.BigQueryClient.get_query_results')
+    def test_query_incomplete(self, get_query_mock):
+        """Ensure an unfinished query raises UnfinishedQueryException."""
+
+        get_query_mock.return_value = _query_page([], job_complete=False)
+
+        self.assertRaises(client.UnfinishedQueryException,
+                          self.client.get_query_rows_parallel, 123)
+
+
 class TestCheckTable(unittest.TestCase):
 
     def setUp(self):
@@ -2222,6 +2850,393 @@ class TestPushRows(unittest.TestCase):
             tableId=self.table,
             body=expected_body)
 
+    def test_push_split_by_row_count(self):
+        """Ensure rows are sent in several requests when there are more than
+        max_rows_per_request.
+        """
+
+        self.mock_table_data.insertAll.return_value.execute.return_value = {
+            'kind': 'bigquery#tableDataInsertAllResponse'}
+
+        actual = self.client.push_rows(self.dataset, self.table, self.rows,
+                                       'one', max_rows_per_request=2)
+
+        self.assertTrue(actual)
+
+        bodies = [c[1]['body'] for c in
+                  self.mock_table_data.insertAll.call_args_list]
+        self.assertEqual([b['rows'] for b in bodies],
+                         [self.data['rows'][:2], self.data['rows'][2:]])
+        for body in bodies:
+            self.assertEqual(body['kind'],
+                             'bigquery#tableDataInsertAllRequest')
+
+    def test_push_split_by_size(self):
+        """Ensure rows are sent in several requests when they exceed
+        max_bytes_per_request, with options repeated on every request.
+        """
+
+        self.mock_table_data.insertAll.return_value.execute.return_value = {}
+        rows = [{'value': 'x' * 100} for _ in range(5)]
+
+        self.client.push_rows(self.dataset, self.table, rows,
+                              skip_invalid_rows=True,
+                              max_bytes_per_request=250)
+
+        bodies = [c[1]['body'] for c in
+                  self.mock_table_data.insertAll.call_args_list]
+        self.assertEqual([len(b['rows']) for b in bodies], [2, 2, 1])
+        for body in bodies:
+            self.assertTrue(body['skipInvalidRows'])
+
+    def test_push_split_oversized_row(self):
+        """Ensure a row larger than max_bytes_per_request is sent alone."""
+
+        self.mock_table_data.insertAll.return_value.execute.return_value = {}
+        rows = [{'a': 1}, {'a': 'x' * 100}, {'a': 2}]
+
+        self.client.push_rows(self.dataset, self.table, rows,
+                              max_bytes_per_request=50)
+
+        bodies = [c[1]['body'] for c in
+                  self.mock_table_data.insertAll.call_args_list]
+        self.assertEqual([len(b['rows']) for b in bodies], [1, 1, 1])
+
+    @mock.patch('bigquery.client.json.dumps')
+    def test_push_without_size_limit(self, mock_dumps):
+        """Ensure rows are only split by count, without estimating their
+        size, when max_bytes_per_request is None.
+        """
+
+        self.mock_table_data.insertAll.return_value.execute.return_value = {}
+        rows = [{'a': 'x' * 100} for _ in range(5)]
+
+        self.client.push_rows(self.dataset, self.table, rows,
+                              max_rows_per_request=2,
+                              max_bytes_per_request=None)
+
+        bodies = [c[1]['body'] for c in
+                  self.mock_table_data.insertAll.call_args_list]
+        self.assertEqual([len(b['rows']) for b in bodies], [2, 2, 1])
+        self.assertFalse(mock_dumps.called)
+
+    def test_push_split_merges_errors(self):
+        """Ensure insert errors of every request are merged with indices
+        referring to the original rows.
+        """
+
+        e = HttpError(HttpResponse(500), 'There was an error'.encode('utf8'))
+        error = {'reason': 'invalid', 'message': 'no such field'}
+        self.mock_table_data.insertAll.return_value.execute.side_effect = [
+            {'insertErrors': [{'index': 1, 'errors': [error]}]},
+            e,
+            {}]
+        rows = [{'n': n} for n in range(5)]
+        self.client.swallow_results = False
+
+        actual = self.client.push_rows(self.dataset, self.table, rows,
+                                       max_rows_per_request=2)
+
+        self.client.swallow_results = True
+
+        httperror = [{'reason': 'httperror', 'message': e}]
+        self.assertEqual(actual, {
+            'kind': 'bigquery#tableDataInsertAllResponse',
+            'insertErrors': [
+                {'index': 1, 'errors': [error]},
+                {'index': 2, 'errors': httperror},
+                {'index': 3, 'errors': httperror}]})
+        self.assertEqual(self.mock_table_data.insertAll.call_count, 3)
+
+    def test_push_split_failed(self):
+        """Ensure False is returned if any request of a split insert
+        fails.
+        """
+
+        self.mock_table_data.insertAll.return_value.execute.side_effect = [
+            {}, {'insertErrors': [{'index': 0, 'errors': []}]}]
+
+        actual = self.client.push_rows(self.dataset, self.table, self.rows,
+                                       max_rows_per_request=2)
+
+        self.assertFalse(actual)
+
+    def test_push_concurrent(self):
+        """Ensure split requests are sent from worker clients, each with its
+        own service, and their errors merged in row order.
+        """
+
+        services = []
+        lock = threading.Lock()
+
+        def service_factory():
+            service = mock.Mock()
+            service.tabledata.return_value.insertAll.side_effect = insert_all
+            with lock:
+                services.append(service)
+            return service
+
+        def insert_all(projectId, datasetId, tableId, body):
+            request = mock.Mock()
+            request.execute.return_value = {'insertErrors': [
+                {'index': 0, 'errors': [{'reason': 'invalid'}]}]}
+            if body['rows'][0]['json']['n'] == 0:
+                request.execute.return_value = {}
+            return request
+
+        bq = client.BigQueryClient(self.mock_bq_service, self.project,
+                                   swallow_results=False,
+                                   service_factory=service_factory)
+        rows = [{'n': n} for n in range(10)]
+
+        actual = bq.push_rows(self.dataset, self.table, rows,
+                              max_rows_per_request=3, workers=2)
+
+        self.assertEqual([e['index'] for e in actual['insertErrors']],
+                         [3, 6, 9])
+        self.assertLessEqual(len(services), 2)
+        self.assertFalse(self.mock_table_data.insertAll.called)
+        sent = sorted(row['json']['n'] for service in services
+                      for c in service.tabledata.return_value.insertAll
+                      .call_args_list
+                      for row in c[1]['body']['rows'])
+        self.assertEqual(sent, list(range(10)))
+
+    @mock.patch('bigquery.client.map_concurrently')
+    def test_push_concurrent_without_service_factory(self, mock_map):
+        """Ensure split requests are sent one after another on the client's
+        own service when it has no service_factory.
+        """
+
+        self.mock_table_data.insertAll.return_value.execute.return_value = {}
+        rows = [{'n': n} for n in range(10)]
+
+        self.client.push_rows(self.dataset, self.table, rows,
+                              max_rows_per_request=3, workers=4)
+
+        self.assertFalse(mock_map.called)
+        self.assertEqual(self.mock_table_data.insertAll.call_count, 4)
+
+    @mock.patch('bigquery.client.sleep')
+    def test_push_retries_failed_rows(self, mock_sleep):
+        """Ensure only rows with transient errors are sent again, with
+        exponential backoff, and permanent errors are reported.
+        """
+
+        def errors(*reasons):
+            return [{'index': index, 'errors': [{'reason': reason}]}
+                    for index, reason in reasons]
+
+        invalid = {'reason': 'invalid'}
+        self.mock_table_data.insertAll.return_value.execute.side_effect = [
+            {'insertErrors': errors((0, 'backendError'), (1, 'invalid'),
+                                    (2, 'stopped'))},
+            {'insertErrors': errors((1, 'timeout'))},
+            {}]
+        self.client.swallow_results = False
+
+        actual = self.client.push_rows(self.dataset, self.table, self.rows,
+                                       'one', max_retries=3,
+                                       retry_backoff=0.5)
+
+        self.client.swallow_results = True
+
+        self.assertEqual(actual, {
+            'kind': 'bigquery#tableDataInsertAllResponse',
+            'insertErrors': [{'index': 1, 'errors': [invalid]}]})
+
+        bodies = [c[1]['body'] for c in
+                  self.mock_table_data.insertAll.call_args_list]
+        rows = self.data['rows']
+        self.assertEqual([b['rows'] for b in bodies],
+                         [rows, [rows[0], rows[2]], [rows[2]]])
+        self.assertEqual(mock_sleep.call_args_list,
+                         [mock.call(0.5), mock.call(1.0)])
+
+    @mock.patch('bigquery.client.sleep')
+    def test_push_retries_exhausted(self, mock_sleep):
+        """Ensure rows still failing after max_retries are reported, and
+        that requests failing with a server error are retried.
+        """
+
+        e = HttpError(HttpResponse(503), 'Unavailable'.encode('utf8'))
+        self.mock_table_data.insertAll.return_value.execute.side_effect = e
+
+        actual = self.client.push_rows(self.dataset, self.table, self.rows,
+                                       max_retries=2)
+
+        self.assertFalse(actual)
+        self.assertEqual(self.mock_table_data.insertAll.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    @mock.patch('bigquery.client.sleep')
+    def test_push_no_retry_of_client_errors(self, mock_sleep):
+        """Ensure requests rejected with a client error are not retried."""
+
+        e = HttpError(HttpResponse(400), 'Bad request'.encode('utf8'))
+        self.mock_table_data.insertAll.return_value.execute.side_effect = e
+
+        actual = self.client.push_rows(self.dataset, self.table, self.rows,
+                                       max_retries=2)
+
+        self.assertFalse(actual)
+        self.assertEqual(self.mock_table_data.insertAll.call_count, 1)
+        self.assertFalse(mock_sleep.called)
+
+    def test_push_spools_failed_rows(self):
+        """Ensure rows failing with a transient error are written to the
+        spool and rows with permanent errors are reported.
+        """
+
+        spool = mock.Mock()
+        self.client.spool = spool
+        self.mock_table_data.insertAll.return_value.execute.return_value = {
+            'insertErrors': [
+                {'index': 0, 'errors': [{'reason': 'backendError'}]},
+                {'index': 1, 'errors': [{'reason': 'invalid'}]}]}
+        self.client.swallow_results = False
+
+        actual = self.client.push_rows(self.dataset, self.table, self.rows,
+                                       'one', skip_invalid_rows=True)
+
+        self.client.swallow_results = True
+        self.client.spool = None
+
+        self.assertEqual(actual['insertErrors'],
+                         [{'index': 1, 'errors': [{'reason': 'invalid'}]}])
+        spool.append.assert_called_once_with(
+            self.dataset, self.table, [self.data['rows'][0]],
+            {'skipInvalidRows': True})
+
+    def test_push_spools_on_connection_error(self):
+        """Ensure all rows are spooled if BigQuery cannot be reached."""
+
+        spool = mock.Mock()
+        self.client.spool = spool
+        self.mock_table_data.insertAll.return_value.execute.side_effect = \
+            IOError('connection refused')
+
+        actual = self.client.push_rows(self.dataset, self.table, self.rows,
+                                       'one')
+
+        self.client.spool = None
+
+        self.assertTrue(actual)
+        spooled = spool.append.call_args[0][2]
+        self.assertEqual(spooled[:2], self.data['rows'][:2])
+        self.assertEqual(spooled[2]['json'], self.data['rows'][2]['json'])
+        self.assertIn('insertId', spooled[2])
+
+    def test_push_spools_sent_rows_with_their_insert_ids(self):
+        """Ensure rows spooled after a connection error keep the insertId
+        they were sent with, so that replaying them does not duplicate the
+        rows that were inserted.
+        """
+
+        spool = mock.Mock()
+        self.client.spool = spool
+        sent = []
+
+        def insert_all(projectId, datasetId, tableId, body):
+            sent.extend(body['rows'])
+            request = mock.Mock()
+            request.execute.return_value = {}
+            if len(sent) > 2:
+                request.execute.side_effect = socket.timeout()
+            return request
+
+        self.mock_table_data.insertAll.side_effect = insert_all
+        rows = [{'n': n} for n in range(4)]
+
+        actual = self.client.push_rows(self.dataset, self.table, rows,
+                                       max_rows_per_request=2)
+
+        self.client.spool = None
+
+        self.assertTrue(actual)
+        spooled = spool.append.call_args[0][2]
+        self.assertEqual(spooled, sent)
+        self.assertEqual(len(set(row['insertId'] for row in spooled)), 4)
+
+    def test_push_auto_insert_id(self):
+        """Ensure rows without insert_id_key get a content hash insertId
+        that is the same for equal rows, regardless of key order.
+        """
+
+        self.mock_table_data.insertAll.return_value.execute.return_value = {}
+        rows = [{'one': 'uno', 'two': 'dos'}, {'two': 'dos', 'one': 'uno'},
+                {'two': 'kiwi'}]
+
+        self.client.push_rows(self.dataset, self.table, rows, 'id',
+                              auto_insert_id=True)
+        self.client.push_rows(self.dataset, self.table,
+                              [dict(rows[2], id='given')], 'id',
+                              auto_insert_id=True)
+
+        calls = self.mock_table_data.insertAll.call_args_list
+        ids = [row['insertId'] for row in calls[0][1]['body']['rows']]
+        self.assertEqual(ids[0], ids[1])
+        self.assertNotEqual(ids[0], ids[2])
+        self.assertEqual(ids, client.make_insert_ids(rows))
+        self.assertEqual(calls[1][1]['body']['rows'][0]['insertId'], 'given')
+
+    def test_push_auto_insert_id_fields(self):
+        """Ensure only the given fields are hashed."""
+
+        self.mock_table_data.insertAll.return_value.execute.return_value = {}
+        rows = [{'id': 1, 'seen': 'now'}, {'id': 1, 'seen': 'later'},
+                {'id': 2, 'seen': 'now'}]
+
+        self.client.push_rows(self.dataset, self.table, rows,
+                              auto_insert_id=['id'])
+
+        body = self.mock_table_data.insertAll.call_args[1]['body']
+        ids = [row['insertId'] for row in body['rows']]
+        self.assertEqual(ids[0], ids[1])
+        self.assertNotEqual(ids[0], ids[2])
+
+    def test_push_serialized_rows(self):
+        """Ensure pre-serialized rows are passed on to the service, or
+        decoded if the client has no serializer.
+        """
+
+        serializer = Serializer('json')
+        rows = [serializer.insert_row({'one': 'uno'}, 'uno'), self.rows[2]]
+
+        self.client.push_rows(self.dataset, self.table, rows, 'one')
+        body = self.mock_table_data.insertAll.call_args[1]['body']
+        self.assertEqual(body['rows'], [
+            {'json': {'one': 'uno'}, 'insertId': 'uno'},
+            {'json': {'two': 'kiwi'}}])
+
+        bq = client.BigQueryClient(self.mock_bq_service, self.project,
+                                   model=SerializerModel(serializer))
+        bq.push_rows(self.dataset, self.table, rows, 'one')
+        body = self.mock_table_data.insertAll.call_args[1]['body']
+        self.assertEqual(body['rows'], [
+            rows[0], serializer.fragment({'json': {'two': 'kiwi'}})])
+
+    def test_push_split_with_serializer(self):
+        """Ensure rows are sized with the client's serializer and sent as
+        the fragments it encoded.
+        """
+
+        serializer = mock.Mock(wraps=Serializer('json'))
+        bq = client.BigQueryClient(self.mock_bq_service, self.project,
+                                   model=SerializerModel(serializer))
+        self.mock_table_data.insertAll.return_value.execute.return_value = {}
+        rows = [{'value': 'x' * 100} for _ in range(5)]
+
+        bq.push_rows(self.dataset, self.table, rows,
+                     max_bytes_per_request=250)
+
+        self.assertEqual(serializer.fragment.call_count, 5)
+        bodies = [c[1]['body'] for c in
+                  self.mock_table_data.insertAll.call_args_list]
+        self.assertEqual([len(b['rows']) for b in bodies], [2, 2, 1])
+        self.assertEqual(bodies[0]['rows'][0],
+                         Serializer('json').fragment({'json': rows[0]}))
+
 
 class TestGetAllTables(unittest.TestCase):
 
@@ -0,0 +1,101 @@
+import threading
+import unittest
+
+from bigquery.concurrency import map_concurrently, prefetch_iterator
+
+
+class TestPrefetchIterator(unittest.TestCase):
+
+    def test_items_in_order(self):
+        """Ensure every item is produced once and in order."""
+
+        self.assertEqual(list(prefetch_iterator(range(50), depth=3)),
+                         list(range(50)))
+
+    def test_produced_in_background(self):
+        """Ensure the producer runs in another thread and stays ahead of the
+        consumer.
+        """
+
+        produced = []
+        ready = threading.Event()
+
+        def items():
+            for item in range(3):
+                produced.append(threading.current_thread())
+                if item == 1:
+                    ready.set()
+                yield item
+
+        iterator = prefetch_iterator(items(), depth=1)
+
+        self.assertEqual(next(iterator), 0)
+        self.assertTrue(ready.wait(5))
+        self.assertNotIn(threading.current_thread(), produced)
+        self.assertEqual(list(iterator), [1, 2])
+
+    def test_exception_propagated(self):
+        """Ensure exceptions raised by the producer reach the consumer."""
+
+        def items():
+            yield 1
+            raise ValueError('boom')
+
+        iterator = prefetch_iterator(items())
+
+        self.assertEqual(next(iterator), 1)
+        self.assertRaises(ValueError, next, iterator)
+
+    def test_close_stops_producer(self):
+        """Ensure closing the iterator releases a blocked producer, which
+        closes the generator from its own thread.
+        """
+
+        finished = threading.Event()
+        closed_from = []
+
+        def items():
+            try:
+                for item in range(100):
+                    yield item
+            finally:
+                closed_from.append(threading.current_thread())
+                finished.set()
+
+        generator = items()
+        iterator = prefetch_iterator(generator, depth=1)
+        iterator.close()
+
+        self.assertTrue(finished.wait(5))
+        self.assertNotIn(threading.current_thread(), closed_from)
+
+
+class TestMapConcurrently(unittest.TestCase):
+
+    def test_results_in_order(self):
+        """Ensure results come back in item order and every worker is used
+        from its own thread.
+        """
+
+        seen = {}
+
+        def square(worker, item):
+            seen.setdefault(worker, set()).add(threading.current_thread())
+            return item * item
+
+        results = map_concurrently(square, range(20), ['a', 'b', 'c'])
+
+        self.assertEqual(results, [i * i for i in range(20)])
+        for threads in seen.values():
+            self.assertEqual(len(threads), 1)
+
+    def test_exception_reraised(self):
+        """Ensure the first failure is re-raised to the caller."""
+
+        def fail(worker, item):
+            if item == 3:
+                raise ValueError(item)
+            return item
+
+        self.assertRaises(ValueError, map_concurrently, fail, range(10),
+                          ['a', 'b'])
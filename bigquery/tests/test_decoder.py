@@ -0,0 +1,312 @@
+import unittest
+from array import array
+
+import mock
+from bigquery import client
+from bigquery.decoder import (ROW_TYPE_LAZY, ROW_TYPE_RECORD, ROW_TYPE_TUPLE,
+                              compile_row_decoder, decode_columns,
+                              decode_frame, record_class, schema_fingerprint,
+                              LazyRow, _LazySchema)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestCompileRowDecoder(unittest.TestCase):
+
+    def setUp(self):
+        self.client = client.BigQueryClient(mock.Mock(), 'project')
+
+    def test_decode_scalars(self):
+        """Ensure scalar columns are cast like _transform_row does."""
+
+        schema = [{'name': 'foo', 'type': 'INTEGER'},
+                  {'name': 'bar', 'type': 'FLOAT'},
+                  {'name': 'baz', 'type': 'STRING'},
+                  {'name': 'qux', 'type': 'BOOLEAN'},
+                  {'name': 'timestamp', 'type': 'TIMESTAMP'}]
+
+        row = {'f': [{'v': '42'}, {'v': None}, {'v': 'batman'},
+                     {'v': 'True'}, {'v': '1.371145650319132E9'}]}
+
+        expected = {'foo': 42, 'bar': None, 'baz': 'batman', 'qux': True,
+                    'timestamp': 1371145650.319132}
+
+        actual = compile_row_decoder(schema)(row)
+
+        self.assertEqual(actual, expected)
+        self.assertEqual(actual, self.client._transform_row(row, schema))
+
+    def test_decode_nested_repeated(self):
+        """Ensure nested and repeated records match _transform_row."""
+
+        schema = [{'name': 'foo', 'type': 'INTEGER'},
+                  {'name': 'rec', 'type': 'RECORD', 'mode': 'NULLABLE',
+                   'fields': [{'name': 'a', 'type': 'BOOLEAN'},
+                              {'name': 'b', 'type': 'STRING'}]},
+                  {'name': 'qux', 'type': 'RECORD', 'mode': 'REPEATED',
+                   'fields': [{'name': 'foobar', 'type': 'INTEGER'},
+                              {'name': 'bazqux', 'type': 'STRING'}]}]
+
+        rows = [
+            {'f': [{'v': '42'}, {'v': {'f': [{'v': 'false'}, {'v': 'x'}]}},
+                   {'v': [{'v': {'f': [{'v': '120'}, {'v': 'robin'}]}},
+                          {'v': {'f': [{'v': None}, {'v': 'joker'}]}}]}]},
+            {'f': [{'v': None}, {'v': None}, {'v': []}]},
+        ]
+
+        decode = compile_row_decoder(schema)
+
+        for row in rows:
+            self.assertEqual(decode(row),
+                             self.client._transform_row(row, schema))
+
+        self.assertEqual(decode(rows[0])['qux'],
+                         [{'foobar': 120, 'bazqux': 'robin'},
+                          {'foobar': None, 'bazqux': 'joker'}])
+
+    def test_decoder_cached_by_fingerprint(self):
+        """Ensure equal schemas share a single compiled decoder."""
+
+        schema = [{'name': 'foo', 'type': 'INTEGER'}]
+        same_schema = [{'name': 'foo', 'type': 'INTEGER'}]
+        other_schema = [{'name': 'foo', 'type': 'FLOAT'}]
+
+        self.assertEqual(schema_fingerprint(schema),
+                         schema_fingerprint(same_schema))
+        self.assertIs(compile_row_decoder(schema),
+                      compile_row_decoder(same_schema))
+        self.assertIsNot(compile_row_decoder(schema),
+                         compile_row_decoder(other_schema))
+
+    def test_unusual_column_names(self):
+        """Ensure column names are not interpreted as code."""
+
+        schema = [{'name': "it's", 'type': 'STRING'},
+                  {'name': 'a"b', 'type': 'INTEGER'}]
+        row = {'f': [{'v': 'x'}, {'v': '1'}]}
+
+        self.assertEqual(compile_row_decoder(schema)(row),
+                         {"it's": 'x', 'a"b': 1})
+
+
+class TestCompactRows(unittest.TestCase):
+
+    def setUp(self):
+        self.schema = [{'name': 'foo', 'type': 'INTEGER'},
+                       {'name': 'count', 'type': 'STRING'},
+                       {'name': 'qux', 'type': 'RECORD', 'mode': 'REPEATED',
+                        'fields': [{'name': 'foobar', 'type': 'INTEGER'},
+                                   {'name': 'bazqux', 'type': 'STRING'}]}]
+        self.row = {'f': [{'v': '42'}, {'v': 'batman'},
+                          {'v': [{'v': {'f': [{'v': '120'},
+                                              {'v': 'robin'}]}}]}]}
+
+    def test_tuple_rows(self):
+        """Ensure tuple rows hold the values in schema order, nested records
+        included.
+        """
+
+        decode = compile_row_decoder(self.schema, ROW_TYPE_TUPLE)
+
+        self.assertEqual(decode(self.row), (42, 'batman', [(120, 'robin')]))
+        self.assertIs(type(decode(self.row)), tuple)
+        self.assertEqual(decode.fields, ('foo', 'count', 'qux'))
+
+    def test_record_rows(self):
+        """Ensure record rows share one class per schema and expose the
+        columns as attributes.
+        """
+
+        decode = compile_row_decoder(self.schema, ROW_TYPE_RECORD)
+        row = decode(self.row)
+
+        self.assertIs(type(row), record_class(self.schema))
+        self.assertEqual(row, (42, 'batman', [(120, 'robin')]))
+        self.assertEqual(row.foo, 42)
+        self.assertEqual(row.qux[0].bazqux, 'robin')
+        self.assertEqual(row._fields, ('foo', 'count', 'qux'))
+        self.assertEqual(row._asdict()['count'], 'batman')
+        self.assertFalse(hasattr(row, '__dict__'))
+
+    def test_row_types_match_dict_rows(self):
+        """Ensure every row type decodes the same values."""
+
+        dict_row = compile_row_decoder(self.schema)(self.row)
+        record_row = compile_row_decoder(self.schema, ROW_TYPE_RECORD)(
+            self.row)
+
+        self.assertEqual(record_row._asdict()['foo'], dict_row['foo'])
+        self.assertEqual(record_row.qux[0]._asdict(), dict_row['qux'][0])
+
+    def test_invalid_row_type(self):
+        """Ensure unknown row types are rejected."""
+
+        self.assertRaises(ValueError, compile_row_decoder, self.schema,
+                          'frame')
+
+
+class TestLazyRows(unittest.TestCase):
+
+    def setUp(self):
+        self.client = client.BigQueryClient(mock.Mock(), 'project')
+        self.schema = [{'name': 'foo', 'type': 'INTEGER'},
+                       {'name': 'bar', 'type': 'FLOAT'},
+                       {'name': 'qux', 'type': 'RECORD', 'mode': 'REPEATED',
+                        'fields': [{'name': 'foobar', 'type': 'INTEGER'}]}]
+        self.row = {'f': [{'v': '42'}, {'v': None},
+                          {'v': [{'v': {'f': [{'v': '120'}]}}]}]}
+
+    def test_mapping_protocol(self):
+        """Ensure lazy rows behave like the decoded dict."""
+
+        row = compile_row_decoder(self.schema, ROW_TYPE_LAZY)(self.row)
+
+        self.assertEqual(row, self.client._transform_row(self.row,
+                                                         self.schema))
+        self.assertEqual(list(row), ['foo', 'bar', 'qux'])
+        self.assertEqual(len(row), 3)
+        self.assertIn('foo', row)
+        self.assertEqual(row.get('missing', 'default'), 'default')
+        self.assertRaises(KeyError, lambda: row['missing'])
+        self.assertEqual(row['qux'][0]['foobar'], 120)
+
+    def test_cells_decoded_once_on_access(self):
+        """Ensure only the cells that are read get decoded, once each."""
+
+        schema = _LazySchema(self.schema)
+        schema.casts = [mock.Mock(side_effect=int), mock.Mock(), mock.Mock()]
+        row = LazyRow(self.row['f'], schema)
+
+        self.assertEqual(row['foo'], 42)
+        self.assertEqual(row['foo'], 42)
+        self.assertIsNone(row['bar'])
+
+        schema.casts[0].assert_called_once_with('42')
+        self.assertFalse(schema.casts[1].called)
+        self.assertFalse(schema.casts[2].called)
+
+
+class TestDecodeColumns(unittest.TestCase):
+
+    def setUp(self):
+        self.schema = [{'name': 'i', 'type': 'INTEGER'},
+                       {'name': 'f', 'type': 'FLOAT'},
+                       {'name': 'b', 'type': 'BOOLEAN'},
+                       {'name': 's', 'type': 'STRING'},
+                       {'name': 'r', 'type': 'RECORD', 'mode': 'REPEATED',
+                        'fields': [{'name': 'x', 'type': 'INTEGER'}]}]
+
+    def _row(self, i, f, b, s, r):
+        return {'f': [{'v': i}, {'v': f}, {'v': b}, {'v': s},
+                      {'v': [{'v': {'f': [{'v': x}]}} for x in r]}]}
+
+    def test_typed_columns(self):
+        """Ensure columns without nulls are typed arrays."""
+
+        pages = [[self._row('1', '1.5', 'true', 'a', ['7'])],
+                 [self._row('2', '2.5', 'false', 'b', [])]]
+
+        columns = decode_columns(self.schema, pages)
+
+        self.assertEqual(list(columns), ['i', 'f', 'b', 's', 'r'])
+        self.assertIsInstance(columns['i'], array)
+        self.assertEqual(list(columns['i']), [1, 2])
+        self.assertEqual(columns['f'].typecode, 'd')
+        self.assertEqual(list(columns['f']), [1.5, 2.5])
+        self.assertEqual(list(columns['b']), [1, 0])
+        self.assertEqual(columns['s'], ['a', 'b'])
+        self.assertEqual(columns['r'], [[{'x': 7}], []])
+
+    def test_nulls_fall_back_to_lists(self):
+        """Ensure a null turns a typed column into a list."""
+
+        pages = [[self._row('1', '1.5', 'true', 'a', [])],
+                 [self._row(None, '2.5', None, None, [])]]
+
+        columns = decode_columns(self.schema, pages)
+
+        self.assertEqual(columns['i'], [1, None])
+        self.assertEqual(columns['b'], [True, None])
+        self.assertEqual(columns['s'], ['a', None])
+        self.assertIsInstance(columns['f'], array)
+
+    def test_matches_row_decoder(self):
+        """Ensure columns hold the same values as decoded rows."""
+
+        rows = [self._row(str(n), None if n % 3 else '0.5', 'TRUE', str(n),
+                          [str(n)]) for n in range(10)]
+
+        columns = decode_columns(self.schema, [rows[:4], rows[4:]])
+        decode = compile_row_decoder(self.schema)
+
+        for index, row in enumerate(rows):
+            self.assertEqual(
+                dict((name, column[index])
+                     for name, column in columns.items()),
+                decode(row))
+
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class TestDecodeFrame(unittest.TestCase):
+
+    def setUp(self):
+        self.schema = [{'name': 'i', 'type': 'INTEGER'},
+                       {'name': 'f', 'type': 'FLOAT'},
+                       {'name': 'b', 'type': 'BOOLEAN'},
+                       {'name': 's', 'type': 'STRING'},
+                       {'name': 'r', 'type': 'RECORD', 'mode': 'REPEATED',
+                        'fields': [{'name': 'x', 'type': 'INTEGER'}]}]
+
+    def _row(self, i, f, b, s, r):
+        return {'f': [{'v': i}, {'v': f}, {'v': b}, {'v': s},
+                      {'v': [{'v': {'f': [{'v': x}]}} for x in r]}]}
+
+    def test_vectorized_types(self):
+        """Ensure numeric columns are cast to typed NumPy arrays."""
+
+        pages = [[self._row('1', '1.5', 'true', 'a', ['7']),
+                  self._row('-2', '1E3', 'False', 'b', [])],
+                 [self._row('3', '0', 'TRUE', 'c', ['8', '9'])]]
+
+        frame = decode_frame(self.schema, pages)
+
+        self.assertEqual(len(frame), 3)
+        self.assertEqual(frame.names, ['i', 'f', 'b', 's', 'r'])
+        self.assertEqual(frame['i'].dtype, numpy.int64)
+        self.assertEqual(frame['i'].tolist(), [1, -2, 3])
+        self.assertEqual(frame['f'].dtype, numpy.float64)
+        self.assertEqual(frame['f'].tolist(), [1.5, 1000.0, 0.0])
+        self.assertEqual(frame['b'].dtype, numpy.bool_)
+        self.assertEqual(frame['b'].tolist(), [True, False, True])
+        self.assertEqual(frame['s'].tolist(), ['a', 'b', 'c'])
+        self.assertEqual(frame['r'].tolist(),
+                         [[{'x': 7}], [], [{'x': 8}, {'x': 9}]])
+        self.assertEqual(frame.masks, {})
+
+    def test_null_masks(self):
+        """Ensure nulls are filled and reported in the masks."""
+
+        pages = [[self._row('1', None, 'true', None, [])],
+                 [self._row(None, '2.5', None, 'x', [])]]
+
+        frame = decode_frame(self.schema, pages)
+
+        self.assertEqual(frame['i'].tolist(), [1, 0])
+        self.assertEqual(frame.masks['i'].tolist(), [False, True])
+        self.assertTrue(numpy.isnan(frame['f'][0]))
+        self.assertEqual(frame.masks['f'].tolist(), [True, False])
+        self.assertEqual(frame['b'].tolist(), [True, False])
+        self.assertEqual(frame.masks['b'].tolist(), [False, True])
+        self.assertEqual(frame['s'].tolist(), [None, 'x'])
+        self.assertNotIn('s', frame.masks)
+
+    def test_empty_result(self):
+        """Ensure an empty result produces empty columns."""
+
+        frame = decode_frame(self.schema, [])
+
+        self.assertEqual(len(frame), 0)
+        self.assertEqual(frame['i'].dtype, numpy.int64)
@@ -0,0 +1,194 @@
+import unittest
+from concurrent.futures import ALL_COMPLETED, wait
+
+import mock
+from bigquery import client
+from bigquery.errors import JobExecutingException
+from bigquery.jobs import BigQueryJobFuture, JobPoller
+from bigquery.tests.helpers import FakeJobs, fake_batches
+from googleapiclient.errors import HttpError
+
+
+class TestJobPoller(unittest.TestCase):
+
+    def setUp(self):
+        self.api_mock = mock.Mock()
+        self.batches = fake_batches(self.api_mock)
+        self.client = client.BigQueryClient(
+            self.api_mock, 'project', service_factory=lambda: self.api_mock)
+        self.poller = JobPoller(self.client, interval=0.01,
+                                initial_interval=0.001)
+        self.fake_jobs = FakeJobs(self.api_mock)
+
+    def test_futures_resolve_when_jobs_are_done(self):
+        """Ensure futures get the final job resource and work with
+        concurrent.futures.wait.
+        """
+
+        done = {'state': u'DONE'}
+        self.fake_jobs.jobs = {'a': (3, done), 'b': (1, done)}
+
+        futures = [self.poller.submit('a'),
+                   self.poller.submit({'jobReference': {'jobId': 'b'}})]
+        finished, not_done = wait(futures, timeout=5,
+                                  return_when=ALL_COMPLETED)
+
+        self.assertEqual(len(finished), 2)
+        self.assertFalse(not_done)
+        self.assertEqual([f.result()['jobReference']['jobId']
+                          for f in futures], ['a', 'b'])
+        self.assertEqual(self.fake_jobs.polls['a'], 3)
+        self.assertEqual(self.fake_jobs.polls['b'], 1)
+        self.assertTrue(all(isinstance(f, BigQueryJobFuture)
+                            for f in futures))
+
+    def test_jobs_are_polled_in_batches(self):
+        """Ensure outstanding jobs share one batch request per poll."""
+
+        done = {'state': u'DONE'}
+        self.fake_jobs.jobs = dict((str(i), (2, done)) for i in range(5))
+
+        with self.poller._condition:
+            futures = [self.poller.submit(job_id)
+                       for job_id in self.fake_jobs.jobs]
+
+        for future in futures:
+            future.result(timeout=5)
+
+        self.assertEqual([len(batch.requests) for batch in self.batches],
+                         [5, 5])
+
+    def test_failed_job_raises_from_result(self):
+        """Ensure the future of a job that failed raises
+        JobExecutingException.
+        """
+
+        failed = {'state': u'DONE',
+                  'errorResult': {'reason': 'invalid', 'message': 'Bad query'}}
+        self.fake_jobs.jobs = {'a': (1, failed)}
+
+        future = self.poller.submit('a')
+
+        self.assertRaises(JobExecutingException, future.result, 5)
+        self.assertEqual(future.job_resource['status']['state'], u'DONE')
+
+    def test_http_error_raises_from_result(self):
+        """Ensure errors polling a job are set on its future."""
+
+        error = HttpError(mock.Mock(status=404), b'not found')
+        self.fake_jobs.jobs = {'a': (1, error)}
+
+        future = self.poller.submit('a')
+
+        self.assertIs(future.exception(timeout=5), error)
+
+    def test_transient_errors_are_polled_again(self):
+        """Ensure server errors and rate limits polling a job do not fail
+        its future.
+        """
+
+        self.fake_jobs.jobs = {'a': (1, {'state': u'DONE'})}
+        self.fake_jobs.errors['a'] = [
+            HttpError(mock.Mock(status=503), b'unavailable'),
+            HttpError(mock.Mock(status=429), b'too many requests')]
+
+        future = self.poller.submit('a')
+
+        self.assertEqual(future.result(timeout=5)['status'],
+                         {'state': u'DONE'})
+        self.assertEqual(self.fake_jobs.polls['a'], 3)
+
+    def test_cancel(self):
+        """Ensure cancelling a future cancels the job and stops polling it."""
+
+        self.fake_jobs.jobs = {'a': (1000000, {'state': u'DONE'})}
+
+        with self.poller._condition:
+            future = self.poller.submit('a')
+            self.assertTrue(future.running())
+            self.assertTrue(future.cancel())
+            thread = self.poller._thread
+
+        self.api_mock.jobs.return_value.cancel.assert_called_once_with(
+            projectId='project', jobId='a')
+        self.assertTrue(future.cancelled())
+        self.assertFalse(future.running())
+
+        thread.join(5)
+        self.assertEqual(self.poller.pending, 0)
+        self.assertIsNone(self.poller._thread)
+
+    def test_cancel_done_future(self):
+        """Ensure futures of finished jobs can not be cancelled."""
+
+        self.fake_jobs.jobs = {'a': (1, {'state': u'DONE'})}
+
+        future = self.poller.submit('a')
+        future.result(timeout=5)
+
+        self.assertFalse(future.cancel())
+        self.assertFalse(self.api_mock.jobs.return_value.cancel.called)
+
+    def test_thread_stops_and_restarts(self):
+        """Ensure the polling thread stops when no job is left and starts
+        again for new jobs.
+        """
+
+        done = {'state': u'DONE'}
+        self.fake_jobs.jobs = {'a': (1, done), 'b': (1, done)}
+
+        self.poller.submit('a').result(timeout=5)
+        thread = self.poller._thread
+        if thread is not None:
+            thread.join(5)
+        self.assertIsNone(self.poller._thread)
+
+        self.poller.submit('b').result(timeout=5)
+
+    def test_requires_service_factory(self):
+        """Ensure the poller does not share the service of a client without
+        a service_factory with its thread.
+        """
+
+        self.client.service_factory = None
+
+        self.assertRaises(ValueError, JobPoller, self.client)
+        self.assertRaises(ValueError, self.client.job_future, 'a')
+
+
+class TestJobFuture(unittest.TestCase):
+
+    def setUp(self):
+        self.api_mock = mock.Mock()
+        self.client = client.BigQueryClient(
+            self.api_mock, 'project', service_factory=lambda: self.api_mock)
+        self.job = {'jobReference': {'jobId': 'job'},
+                    'status': {'state': u'RUNNING'}}
+        self.api_mock.jobs.return_value.insert.return_value.execute\
+            .return_value = self.job
+
+    @mock.patch('bigquery.jobs.JobPoller.submit')
+    def test_write_to_table_as_future(self, mock_submit):
+        """Ensure as_future returns a future from the client's poller."""
+
+        result = self.client.write_to_table('SELECT 1', as_future=True)
+
+        self.assertEqual(result, mock_submit.return_value)
+        mock_submit.assert_called_once_with(self.job)
+
+    @mock.patch('bigquery.jobs.JobPoller.submit')
+    def test_job_future_shares_poller(self, mock_submit):
+        """Ensure a client creates a single poller."""
+
+        self.client.job_future('a')
+        poller = self.client._job_poller
+        self.client.job_future('b')
+
+        self.assertIs(self.client._job_poller, poller)
+        self.assertEqual(mock_submit.call_count, 2)
+
+    def test_write_to_table_returns_resource(self):
+        """Ensure the job resource is still returned by default."""
+
+        self.assertEqual(self.client.write_to_table('SELECT 1'), self.job)
+        self.assertIsNone(self.client._job_poller)
@@ -0,0 +1,233 @@
+import json
+import threading
+import unittest
+from concurrent.futures import Future
+
+import mock
+from bigquery import client
+from bigquery.client import JOB_PRIORITY_BATCH, JOB_PRIORITY_INTERACTIVE
+from bigquery.errors import JobExecutingException
+from bigquery.scheduler import JobScheduler
+from bigquery.tests.helpers import fake_request, wait_until
+from googleapiclient.errors import HttpError
+
+
+def rate_limit_error():
+    content = {'error': {'errors': [{'reason': 'rateLimitExceeded'}]}}
+    return HttpError(mock.Mock(status=403), json.dumps(content).encode())
+
+
+class TestJobScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.api_mock = mock.Mock()
+        self.client = client.BigQueryClient(
+            self.api_mock, 'project', service_factory=lambda: self.api_mock)
+
+        # Bodies of the inserted jobs, and errors to raise on insert.
+        self.inserted = []
+        self.insert_errors = []
+        self.lock = threading.Lock()
+        self.api_mock.jobs.return_value.insert.side_effect = \
+            lambda projectId, body: fake_request(self.insert, body)
+
+        # Futures returned by the client's job poller, by job id.
+        self.job_futures = {}
+
+        def job_future(job_resource):
+            future = Future()
+            future.job_resource = job_resource
+            self.job_futures[job_resource['jobReference']['jobId']] = future
+            return future
+
+        self.client.job_future = mock.Mock(side_effect=job_future)
+
+    def insert(self, body):
+        with self.lock:
+            self.inserted.append(body)
+            if self.insert_errors:
+                raise self.insert_errors.pop(0)
+        return {'jobReference': body['jobReference'],
+                'status': {'state': u'RUNNING'}}
+
+    def body(self, job_id, priority=None):
+        configuration = {'query': 'SELECT 1'}
+        if priority:
+            configuration['priority'] = priority
+        return {'configuration': {'query': configuration},
+                'jobReference': {'projectId': 'project', 'jobId': job_id}}
+
+    def finish(self, job_id, error_result=None):
+        future = self.job_futures[job_id]
+        status = {'state': u'DONE'}
+        if error_result:
+            status['errorResult'] = error_result
+        future.job_resource = {'jobReference': {'jobId': job_id},
+                               'status': status}
+        if error_result:
+            future.set_exception(JobExecutingException(error_result))
+        else:
+            future.set_result(future.job_resource)
+
+    def test_max_jobs(self):
+        """Ensure at most max_jobs jobs run at once."""
+
+        scheduler = JobScheduler(self.client, max_jobs=2)
+        futures = [scheduler.submit(self.body(job_id))
+                   for job_id in ['a', 'b', 'c']]
+
+        # The third job waits for a slot until one of the first two is done.
+        wait_until(lambda: len(self.job_futures) == 2)
+        self.assertEqual(len(self.inserted), 2)
+        self.assertEqual(scheduler.running, 2)
+        self.assertEqual(scheduler.pending, 1)
+
+        self.finish('a')
+        wait_until(lambda: len(self.job_futures) == 3)
+        self.finish('b')
+        self.finish('c')
+
+        self.assertEqual([f.result(5)['jobReference']['jobId']
+                          for f in futures], ['a', 'b', 'c'])
+        self.assertEqual(scheduler.running, 0)
+
+    def test_interactive_jobs_first(self):
+        """Ensure INTERACTIVE jobs are dispatched ahead of BATCH jobs, in
+        submission order otherwise.
+        """
+
+        scheduler = JobScheduler(self.client, max_jobs=1)
+        with scheduler._condition:
+            scheduler.submit(self.body('b1', JOB_PRIORITY_BATCH))
+            scheduler.submit(self.body('i1', JOB_PRIORITY_INTERACTIVE))
+            scheduler.submit(self.body('b2'), priority=JOB_PRIORITY_BATCH)
+            scheduler.submit(self.body('i2'))
+
+        for job_id in ['i1', 'i2', 'b1', 'b2']:
+            wait_until(lambda: job_id in self.job_futures)
+            self.finish(job_id)
+
+        self.assertEqual([body['jobReference']['jobId']
+                          for body in self.inserted],
+                         ['i1', 'i2', 'b1', 'b2'])
+
+    def test_priority_set_on_query(self):
+        """Ensure the priority is set on query jobs that have none, and
+        that conflicting or unknown priorities are rejected.
+        """
+
+        scheduler = JobScheduler(self.client)
+        body = self.body('a')
+
+        scheduler.submit(body, priority=JOB_PRIORITY_BATCH)
+        wait_until(lambda: 'a' in self.job_futures)
+        self.finish('a')
+
+        self.assertEqual(
+            self.inserted[0]['configuration']['query']['priority'],
+            JOB_PRIORITY_BATCH)
+        self.assertNotIn('priority', body['configuration']['query'])
+
+        self.assertRaises(ValueError, scheduler.submit,
+                          self.body('b', JOB_PRIORITY_INTERACTIVE),
+                          priority=JOB_PRIORITY_BATCH)
+        self.assertRaises(ValueError, scheduler.submit, self.body('c'),
+                          priority='LOW')
+
+    def test_requires_service_factory(self):
+        """Ensure the dispatch thread never shares the client's service."""
+
+        self.client.service_factory = None
+
+        self.assertRaises(ValueError, JobScheduler, self.client)
+
+    def test_requeue_rate_limited_insert(self):
+        """Ensure jobs rejected by rate limits on insert are queued again."""
+
+        self.insert_errors = [rate_limit_error()]
+        scheduler = JobScheduler(self.client, retry_backoff=0)
+
+        future = scheduler.submit(self.body('a'))
+        wait_until(lambda: 'a_1' in self.job_futures)
+        self.finish('a_1')
+
+        self.assertEqual(future.result(5)['jobReference']['jobId'], 'a_1')
+        self.assertEqual(len(self.inserted), 2)
+        self.assertEqual(scheduler.requeued, 1)
+
+    def test_requeue_rate_limited_job(self):
+        """Ensure jobs that fail because of rate limits are retried with a
+        new job id.
+        """
+
+        scheduler = JobScheduler(self.client, retry_backoff=0)
+
+        future = scheduler.submit(self.body('a'))
+        wait_until(lambda: 'a' in self.job_futures)
+        self.finish('a', {'reason': 'rateLimitExceeded'})
+        wait_until(lambda: 'a_1' in self.job_futures)
+        self.finish('a_1')
+
+        self.assertEqual(future.result(5)['jobReference']['jobId'], 'a_1')
+        self.assertEqual(scheduler.requeued, 1)
+
+    def test_failed_status_request_is_not_requeued(self):
+        """Ensure a job whose status could not be retrieved is not inserted
+        again, as it may still be running.
+        """
+
+        scheduler = JobScheduler(self.client, retry_backoff=0)
+
+        future = scheduler.submit(self.body('a'))
+        wait_until(lambda: 'a' in self.job_futures)
+        error = rate_limit_error()
+        self.job_futures['a'].set_exception(error)
+
+        self.assertIs(future.exception(5), error)
+        self.assertEqual(scheduler.requeued, 0)
+        self.assertEqual([body['jobReference']['jobId']
+                          for body in self.inserted], ['a'])
+
+    def test_max_requeues(self):
+        """Ensure rate limit errors are raised after max_requeues."""
+
+        self.insert_errors = [rate_limit_error(), rate_limit_error()]
+        scheduler = JobScheduler(self.client, retry_backoff=0,
+                                 max_requeues=1)
+
+        future = scheduler.submit(self.body('a'))
+
+        self.assertIsInstance(future.exception(5), HttpError)
+        self.assertEqual(len(self.inserted), 2)
+        self.assertEqual(scheduler.running, 0)
+
+    def test_other_errors_are_raised(self):
+        """Ensure jobs failing for other reasons are not retried."""
+
+        scheduler = JobScheduler(self.client, retry_backoff=0)
+
+        future = scheduler.submit(self.body('a'))
+        wait_until(lambda: 'a' in self.job_futures)
+        self.finish('a', {'reason': 'invalidQuery'})
+
+        self.assertIsInstance(future.exception(5), JobExecutingException)
+        self.assertEqual(scheduler.requeued, 0)
+        self.assertEqual(len(self.inserted), 1)
+
+    def test_cancel_queued_job(self):
+        """Ensure cancelled jobs are never inserted."""
+
+        scheduler = JobScheduler(self.client, max_jobs=1)
+        with scheduler._condition:
+            scheduler.submit(self.body('a'))
+            self.assertTrue(scheduler.submit(self.body('b')).cancel())
+            last = scheduler.submit(self.body('c'))
+
+        wait_until(lambda: 'a' in self.job_futures)
+        self.finish('a')
+        wait_until(lambda: 'c' in self.job_futures)
+        self.finish('c')
+        last.result(5)
+
+        self.assertEqual([body['jobReference']['jobId']
+                          for body in self.inserted], ['a', 'c'])
@@ -0,0 +1,108 @@
+import json
+import unittest
+import zlib
+
+import mock
+from bigquery.serializer import JsonFragment, Serializer, SerializerModel
+
+
+class TestSerializer(unittest.TestCase):
+
+    def test_fastest_library(self):
+        """Ensure the first installed library is used."""
+
+        def load(name):
+            if name != 'json':
+                raise ImportError(name)
+            return json.dumps, json.loads
+
+        with mock.patch('bigquery.serializer._load_library',
+                        side_effect=load):
+            self.assertEqual(Serializer().library, 'json')
+
+    def test_unknown_library(self):
+        """Ensure an unknown library is rejected."""
+
+        self.assertRaises(ValueError, Serializer, 'yaml')
+
+    def test_dumps(self):
+        """Ensure bodies are encoded to UTF-8 JSON."""
+
+        body = {'kind': 'k', 'rows': [{'json': {'name': u'caf\xe9'}}]}
+
+        for library in ('json', None):
+            serializer = Serializer(library)
+            actual = serializer.dumps(body)
+            self.assertIsInstance(actual, bytes)
+            self.assertEqual(json.loads(actual.decode('utf-8')), body)
+
+    def test_fragments_spliced(self):
+        """Ensure pre-serialized rows are copied into the body as is."""
+
+        serializer = Serializer('json')
+        rows = [serializer.insert_row({'a': 1}, 'id1'),
+                {'json': {'a': 2}},
+                serializer.insert_row({'a': 3})]
+        body = {'kind': 'k', 'skipInvalidRows': True, 'rows': rows}
+
+        actual = json.loads(serializer.dumps(body).decode('utf-8'))
+
+        self.assertEqual(actual, {
+            'kind': 'k', 'skipInvalidRows': True,
+            'rows': [{'json': {'a': 1}, 'insertId': 'id1'},
+                     {'json': {'a': 2}}, {'json': {'a': 3}}]})
+        self.assertEqual(
+            json.loads(serializer.dumps({'rows': rows[:1]}).decode('utf-8')),
+            {'rows': [{'json': {'a': 1}, 'insertId': 'id1'}]})
+
+    def test_fragment(self):
+        """Ensure fragments know their size and value."""
+
+        fragment = Serializer('json').fragment({'a': [1, 2]})
+
+        self.assertEqual(len(fragment), len(fragment.data))
+        self.assertEqual(fragment.decode(), {'a': [1, 2]})
+        self.assertEqual(fragment, JsonFragment(fragment.data))
+
+
+class TestSerializerModel(unittest.TestCase):
+
+    def test_serialize(self):
+        """Ensure the model encodes and decodes with the serializer."""
+
+        model = SerializerModel(Serializer('json'))
+        headers, _, _, body = model.request({}, {}, {}, {'a': 1})
+
+        self.assertEqual(json.loads(body.decode('utf-8')), {'a': 1})
+        self.assertEqual(headers['content-type'], 'application/json')
+        self.assertEqual(model.deserialize(b'{"a": 1}'), {'a': 1})
+        self.assertEqual(model.deserialize(b'not json'), 'not json')
+
+    def test_gzip(self):
+        """Ensure bodies of at least gzip_threshold bytes are compressed and
+        counted.
+        """
+
+        model = SerializerModel(Serializer('json'), gzip_threshold=100)
+        large = {'rows': [{'json': {'value': 'x' * 10}}] * 50}
+
+        headers, _, _, body = model.request({}, {}, {}, large)
+        self.assertEqual(headers['content-encoding'], 'gzip')
+        self.assertEqual(
+            json.loads(zlib.decompress(body, 16 + zlib.MAX_WBITS).decode(
+                'utf-8')), large)
+
+        headers, _, _, small = model.request({}, {}, {}, {'a': 1})
+        self.assertNotIn('content-encoding', headers)
+
+        model.request({}, {}, {}, None)
+
+        metrics = model.metrics()
+        self.assertEqual(metrics['requests'], 2)
+        self.assertEqual(metrics['compressed_requests'], 1)
+        self.assertEqual(metrics['body_bytes'],
+                         len(Serializer('json').dumps(large)) + len(small))
+        self.assertEqual(metrics['sent_bytes'], len(body) + len(small))
+        self.assertEqual(metrics['saved_bytes'],
+                         metrics['body_bytes'] - metrics['sent_bytes'])
+        self.assertGreater(metrics['saved_bytes'], 0)
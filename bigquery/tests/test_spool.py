@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+from bigquery import client
+from bigquery.spool import InsertSpool
+
+
+class TestInsertSpool(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.mock_bq_service = mock.Mock()
+        self.mock_table_data = self.mock_bq_service.tabledata.return_value
+        self.execute = self.mock_table_data.insertAll.return_value.execute
+        self.execute.return_value = {}
+        self.client = client.BigQueryClient(self.mock_bq_service, 'project')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def sent_rows(self):
+        return [c[1]['body']['rows'] for c in
+                self.mock_table_data.insertAll.call_args_list]
+
+    def test_append_and_replay(self):
+        """Ensure spooled batches are replayed in order with their options
+        and the spool is emptied.
+        """
+
+        spool = InsertSpool(self.directory)
+        spool.append('dataset', 'table', [{'json': {'a': 1}, 'insertId': 'x'}],
+                     {'skipInvalidRows': True})
+        spool.append('dataset', 'other', [{'json': {'a': 2}}])
+
+        self.assertTrue(spool.replay(self.client))
+
+        calls = self.mock_table_data.insertAll.call_args_list
+        self.assertEqual([c[1]['tableId'] for c in calls], ['table', 'other'])
+        self.assertTrue(calls[0][1]['body']['skipInvalidRows'])
+        self.assertEqual(self.sent_rows()[0],
+                         [{'json': {'a': 1}, 'insertId': 'x'}])
+        self.assertTrue(self.sent_rows()[1][0]['insertId'])
+        self.assertEqual(spool.spooled_rows, 2)
+        self.assertEqual(spool.replayed_rows, 2)
+        self.assertEqual(len(spool), 0)
+
+    def test_segments_rolled(self):
+        """Ensure a new segment is started once segment_bytes is reached,
+        and that a reopened spool continues after the existing segments.
+        """
+
+        spool = InsertSpool(self.directory, segment_bytes=10)
+        spool.append('dataset', 'table', [{'json': {'a': 1}}])
+        spool.append('dataset', 'table', [{'json': {'a': 2}}])
+        spool.close()
+        self.assertEqual(len(spool), 2)
+
+        spool = InsertSpool(self.directory, segment_bytes=10)
+        spool.append('dataset', 'table', [{'json': {'a': 3}}])
+        spool.close()
+
+        self.assertTrue(spool.replay(self.client))
+        self.assertEqual([rows[0]['json']['a'] for rows in self.sent_rows()],
+                         [1, 2, 3])
+
+    @mock.patch('os.fsync')
+    def test_fsync_batching(self, mock_fsync):
+        """Ensure the segment is fsynced every sync_every batches."""
+
+        spool = InsertSpool(self.directory, sync_every=2)
+        for _ in range(5):
+            spool.append('dataset', 'table', [{'json': {'a': 1}}])
+        self.assertEqual(mock_fsync.call_count, 2)
+
+        spool.close()
+        self.assertEqual(mock_fsync.call_count, 3)
+
+    def test_replay_resumes_after_transient_error(self):
+        """Ensure replay stops at a batch failing with a transient error and
+        resumes from it.
+        """
+
+        spool = InsertSpool(self.directory)
+        for value in range(3):
+            spool.append('dataset', 'table', [{'json': {'a': value}}])
+
+        self.execute.side_effect = [
+            {}, {'insertErrors': [{'index': 0, 'errors': [
+                {'reason': 'backendError'}]}]}]
+        self.assertFalse(spool.replay(self.client))
+        self.assertEqual(spool.replayed_rows, 1)
+        self.assertEqual(len(spool), 1)
+
+        self.execute.side_effect = None
+        self.assertTrue(spool.replay(self.client))
+        self.assertEqual([rows[0]['json']['a'] for rows in self.sent_rows()],
+                         [0, 1, 1, 2])
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_replay_discards_invalid_rows(self):
+        """Ensure rows rejected permanently are dropped."""
+
+        spool = InsertSpool(self.directory)
+        spool.append('dataset', 'table', [{'json': {'a': 1}},
+                                          {'json': {'a': 2}}])
+        self.execute.return_value = {'insertErrors': [
+            {'index': 1, 'errors': [{'reason': 'invalid'}]}]}
+
+        self.assertTrue(spool.replay(self.client))
+        self.assertEqual(spool.replayed_rows, 1)
+        self.assertEqual(spool.discarded_rows, 1)
+
+    def test_truncated_record_skipped(self):
+        """Ensure a partially written last record is ignored."""
+
+        spool = InsertSpool(self.directory)
+        spool.append('dataset', 'table', [{'json': {'a': 1}}])
+        spool.close()
+        with open(spool.segments()[0], 'ab') as segment:
+            segment.write(b'{"dataset":')
+
+        self.assertTrue(spool.replay(self.client))
+        self.assertEqual(len(self.sent_rows()), 1)
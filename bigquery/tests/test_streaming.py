@@ -0,0 +1,309 @@
+import threading
+import unittest
+
+import mock
+from bigquery.client import INSERT_MAX_BYTES
+from bigquery.errors import InsertQueueFullException
+from bigquery.serializer import Serializer
+from bigquery.streaming import (BackgroundInserter, QUEUE_DROP_OLDEST,
+                                QUEUE_RAISE, RoutingInserter,
+                                StreamingInserter)
+
+
+class TestStreamingInserter(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.client.serializer = None
+        self.client.push_rows.return_value = True
+
+    def test_flush_on_max_rows(self):
+        """Ensure a batch is pushed as soon as max_rows rows are buffered."""
+
+        inserter = StreamingInserter(self.client, 'dataset', 'table',
+                                     max_rows=2, insert_id_key='id')
+
+        self.assertIsNone(inserter.insert({'id': 1}))
+        self.assertFalse(self.client.push_rows.called)
+        self.assertTrue(inserter.insert({'id': 2}))
+
+        self.client.push_rows.assert_called_once_with(
+            'dataset', 'table', [{'id': 1}, {'id': 2}], insert_id_key='id',
+            skip_invalid_rows=None, ignore_unknown_values=None,
+            template_suffix=None, max_bytes_per_request=None)
+        self.assertEqual(inserter.pending, 0)
+
+    def test_flush_on_max_bytes(self):
+        """Ensure a batch is pushed once the buffered rows are large."""
+
+        inserter = StreamingInserter(self.client, 'dataset', 'table',
+                                     max_rows=100, max_bytes=30)
+
+        inserter.insert_rows([{'a': 'x' * 10}, {'a': 'y' * 10}])
+
+        self.assertEqual(self.client.push_rows.call_count, 1)
+
+    def test_large_flush_is_split_by_size(self):
+        """Ensure rows larger than a request together are still split by
+        size.
+        """
+
+        inserter = StreamingInserter(self.client, 'dataset', 'table',
+                                     max_rows=2, max_bytes=None)
+
+        inserter.insert_rows([{'a': 'x' * INSERT_MAX_BYTES}, {'a': 'y'}])
+
+        self.assertEqual(
+            self.client.push_rows.call_args[1]['max_bytes_per_request'],
+            INSERT_MAX_BYTES)
+
+    @mock.patch('bigquery.streaming.time')
+    def test_flush_on_max_row_age(self, mock_time):
+        """Ensure rows are pushed when a row is added after the oldest has
+        waited max_row_age.
+        """
+
+        inserter = StreamingInserter(self.client, 'dataset', 'table',
+                                     max_row_age=5)
+
+        mock_time.return_value = 100
+        inserter.insert({'a': 1})
+        mock_time.return_value = 104
+        inserter.insert({'a': 2})
+        self.assertFalse(self.client.push_rows.called)
+
+        mock_time.return_value = 105
+        inserter.insert({'a': 3})
+        self.assertEqual(self.client.push_rows.call_args[0][2],
+                         [{'a': 1}, {'a': 2}, {'a': 3}])
+
+    def test_context_manager_flushes(self):
+        """Ensure remaining rows are pushed on exit."""
+
+        with StreamingInserter(self.client, 'dataset', 'table',
+                               template_suffix='_x') as inserter:
+            inserter.insert({'a': 1})
+
+        self.client.push_rows.assert_called_once_with(
+            'dataset', 'table', [{'a': 1}], insert_id_key=None,
+            skip_invalid_rows=None, ignore_unknown_values=None,
+            template_suffix='_x', max_bytes_per_request=None)
+        self.assertIsNone(inserter.flush())
+
+    def test_statistics(self):
+        """Ensure flushes are counted and failures recorded."""
+
+        self.client.push_rows.side_effect = [True, False]
+        inserter = StreamingInserter(self.client, 'dataset', 'table',
+                                     max_rows=2)
+
+        inserter.insert_rows([{'a': n} for n in range(3)])
+        inserter.close()
+
+        self.assertEqual(inserter.flushes, 2)
+        self.assertEqual(inserter.rows_flushed, 3)
+        self.assertEqual(inserter.failed_flushes, 1)
+        self.assertGreaterEqual(inserter.rows_per_second, 0)
+
+    def test_serializer(self):
+        """Ensure rows are pre-serialized when a serializer is given."""
+
+        serializer = Serializer('json')
+        inserter = StreamingInserter(self.client, 'dataset', 'table',
+                                     insert_id_key='id',
+                                     serializer=serializer)
+
+        inserter.insert_rows([{'id': 'a'}, {'b': 1}])
+        inserter.close()
+
+        self.assertEqual(self.client.push_rows.call_args[0][2], [
+            serializer.insert_row({'id': 'a'}, 'a'),
+            serializer.insert_row({'b': 1})])
+
+    def test_client_serializer(self):
+        """Ensure rows are pre-serialized with the client's serializer by
+        default.
+        """
+
+        self.client.serializer = Serializer('json')
+        inserter = StreamingInserter(self.client, 'dataset', 'table')
+
+        inserter.insert({'a': 1})
+        inserter.close()
+
+        self.assertEqual(self.client.push_rows.call_args[0][2],
+                         [self.client.serializer.insert_row({'a': 1})])
+
+
+class TestRoutingInserter(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.client.serializer = None
+        self.client.push_rows.return_value = True
+
+    def route(self, row):
+        return 'dataset', 'events', row.get('day')
+
+    def pushed(self):
+        return [(c[0][1], c[1]['template_suffix'], c[0][2])
+                for c in self.client.push_rows.call_args_list]
+
+    def test_rows_routed(self):
+        """Ensure every destination has its own buffer and thresholds."""
+
+        with RoutingInserter(self.client, self.route, max_rows=2,
+                             insert_id_key='id') as router:
+            router.insert_rows([{'day': '1'}, {'day': '2'}, {'day': '1'},
+                                {'day': '2'}, {'day': '2'}])
+            self.assertEqual(self.pushed(), [
+                ('events', '1', [{'day': '1'}, {'day': '1'}]),
+                ('events', '2', [{'day': '2'}, {'day': '2'}])])
+            self.assertEqual(router.destinations,
+                             [('dataset', 'events', '1'),
+                              ('dataset', 'events', '2')])
+            self.assertGreater(router.buffered_bytes, 0)
+
+        self.assertEqual(self.pushed()[-1], ('events', '2', [{'day': '2'}]))
+        self.assertEqual(
+            self.client.push_rows.call_args[1]['insert_id_key'], 'id')
+        self.assertEqual(router.destinations, [])
+
+    def test_max_buffers(self):
+        """Ensure the least recently used buffer is evicted."""
+
+        router = RoutingInserter(self.client, self.route, max_buffers=2)
+        router.insert_rows([{'day': '1'}, {'day': '2'}, {'day': '1'},
+                            {'day': '3'}])
+
+        self.assertEqual(self.pushed(), [('events', '2', [{'day': '2'}])])
+        self.assertEqual(router.evictions, 1)
+        self.assertEqual(router.destinations, [('dataset', 'events', '1'),
+                                               ('dataset', 'events', '3')])
+
+    def test_max_total_bytes(self):
+        """Ensure buffers are evicted once they are too large together."""
+
+        router = RoutingInserter(self.client, self.route,
+                                 max_total_bytes=20)
+        router.insert_rows([{'day': '1'}, {'day': '2'}])
+
+        self.assertEqual(self.pushed(), [('events', '1', [{'day': '1'}])])
+        self.assertEqual(router.buffered_bytes, len('{"day": "2"}'))
+
+    @mock.patch('bigquery.streaming.time')
+    def test_max_idle(self, mock_time):
+        """Ensure buffers that received no rows for max_idle are evicted."""
+
+        router = RoutingInserter(self.client, self.route, max_idle=10)
+        mock_time.return_value = 100
+        router.insert({'day': '1'})
+        mock_time.return_value = 105
+        router.insert({'day': '2'})
+        self.assertFalse(self.client.push_rows.called)
+
+        mock_time.return_value = 110
+        router.insert({'day': '2'})
+        self.assertEqual(self.pushed(), [('events', '1', [{'day': '1'}])])
+        self.assertEqual(router.destinations, [('dataset', 'events', '2')])
+
+
+class TestBackgroundInserter(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.client.serializer = None
+        self.client.push_rows.return_value = True
+
+    def pushed_rows(self):
+        return [row for c in self.client.push_rows.call_args_list
+                for row in c[0][2]]
+
+    def test_rows_sent_in_background(self):
+        """Ensure queued rows are sent in batches by the background thread
+        and flushed on close.
+        """
+
+        inserter = BackgroundInserter(self.client, 'dataset', 'table',
+                                      max_rows=2, max_latency=None)
+        inserter.insert_rows([{'a': n} for n in range(5)])
+        inserter.close()
+
+        self.assertEqual(self.pushed_rows(), [{'a': n} for n in range(5)])
+        self.assertEqual(inserter.rows_flushed, 5)
+        self.assertEqual(inserter.pending, 0)
+        self.assertEqual(inserter.queued_bytes, 0)
+        self.assertTrue(all(len(c[0][2]) <= 2 for c in
+                            self.client.push_rows.call_args_list))
+
+    def test_max_latency(self):
+        """Ensure rows are sent once they waited max_latency seconds."""
+
+        sent = threading.Event()
+        self.client.push_rows.side_effect = lambda *a, **k: sent.set()
+
+        with BackgroundInserter(self.client, 'dataset', 'table',
+                                max_latency=0.01) as inserter:
+            inserter.insert({'a': 1})
+            self.assertTrue(sent.wait(5))
+
+    def test_flush(self):
+        """Ensure flush waits until the queued rows were sent."""
+
+        with BackgroundInserter(self.client, 'dataset', 'table',
+                                max_latency=None) as inserter:
+            inserter.insert({'a': 1})
+            inserter.flush()
+            self.assertEqual(self.pushed_rows(), [{'a': 1}])
+
+    def test_full_policies(self):
+        """Ensure a full queue raises or drops the oldest rows."""
+
+        release = threading.Event()
+        self.client.push_rows.side_effect = lambda *a, **k: release.wait(5)
+
+        inserter = BackgroundInserter(self.client, 'dataset', 'table',
+                                      max_latency=None, max_queue_bytes=20,
+                                      full_policy=QUEUE_RAISE)
+        inserter.insert({'a': 1})
+        inserter.insert({'a': 2})
+        self.assertRaises(InsertQueueFullException, inserter.insert,
+                          {'a': 3})
+        release.set()
+        inserter.close()
+
+        release.clear()
+        inserter = BackgroundInserter(self.client, 'dataset', 'table',
+                                      max_latency=None, max_queue_bytes=20,
+                                      full_policy=QUEUE_DROP_OLDEST)
+        inserter.insert_rows([{'a': 1}, {'a': 2}, {'a': 3}])
+        self.assertEqual(inserter.dropped_rows, 1)
+        release.set()
+        inserter.close()
+        self.assertEqual(self.pushed_rows()[-2:], [{'a': 2}, {'a': 3}])
+
+    def test_block_until_sent(self):
+        """Ensure a blocked producer resumes once queued rows are sent."""
+
+        inserter = BackgroundInserter(self.client, 'dataset', 'table',
+                                      max_latency=None, max_queue_bytes=20)
+        inserter.insert_rows([{'a': n} for n in range(10)])
+        inserter.close()
+
+        self.assertEqual(self.pushed_rows(), [{'a': n} for n in range(10)])
+        self.assertEqual(inserter.dropped_rows, 0)
+
+    def test_push_exception(self):
+        """Ensure the thread survives a batch that raises."""
+
+        self.client.push_rows.side_effect = [Exception('boom'), True]
+
+        with BackgroundInserter(self.client, 'dataset', 'table',
+                                max_latency=None) as inserter:
+            inserter.insert({'a': 1})
+            inserter.flush()
+            inserter.insert({'a': 2})
+            inserter.flush()
+
+        self.assertEqual(inserter.failed_flushes, 1)
+        self.assertEqual(self.client.push_rows.call_count, 2)
@@ -17,6 +17,7 @@ setup_args = dict(
     include_package_data=True,
     install_requires=[
         'google-api-python-client',
+        'futures; python_version < "3.2"',
         'httplib2',
         'python-dateutil'
     ],